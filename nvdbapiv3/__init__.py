@@ -1,2 +1,3 @@
 from .nvdbapiv3 import *
 from .apiforbindelse import apiforbindelse
+from .apiforbindelse_async import apiforbindelse_async
@@ -13,11 +13,18 @@ import requests
 import json
 import copy 
 import pdb
-from time import sleep
+from time import sleep, perf_counter
 from requests.exceptions import SSLError, ChunkedEncodingError,  ConnectionError
 from urllib3.exceptions import ProtocolError 
 from http.client import RemoteDisconnected
 
+from .mellomlager import mellomlager
+from .forsok import forsoksregel
+from .struping import struping
+from .jsondekoder import dekodjson
+from .opptak import opptak
+from .maaling import maaling
+
 class apiforbindelse( ):
     """
     Håndterer innlogging og kommunikasjon mot NVDB api LES og SKRIV .
@@ -51,6 +58,11 @@ class apiforbindelse( ):
         if miljo:
             self.velgmiljo( miljo=miljo)
         self.proxies = None
+        self.mellomlager = None
+        self.forsoksregel = forsoksregel()  # Nye forsøk ved feil, se forsok.py 
+        self.struping = None                # Begrensning på kall per sekund og samtidige kall, se metoden strup
+        self.opptak = None                  # Opptak og avspilling av trafikk mot NVDB api, se metodene taopp og spillav
+        self.maaling = None                 # Tidsbruk og tellere, se metoden maal
         # self.proxies =  {  "http": "http://proxy.vegvesen.no:8080", "https": "http://proxy.vegvesen.no:8080" }
 
     def velgmiljo( self, miljo='utvles'):
@@ -59,6 +71,7 @@ class apiforbindelse( ):
 
         Lovlige verdier: NVDB api les v3: stm-utvles, utvles, testles, prodles
                          NVDB api SKRIV v3: utvskriv, testskriv, prodskriv
+                         Eller URL til tjeneste som oppfører seg som NVDB api LES, f.eks 'http://localhost:8080'
         """ 
         self.miljo = miljo
 
@@ -103,8 +116,12 @@ class apiforbindelse( ):
             self.headers['Accept'] = 'application/json'
             self.headers['Content-Type'] = 'application/json'
             
+        elif miljo and miljo[0:4] == 'http': 
+            # Egendefinert adresse, f.eks lokal erstatning for NVDB api LES (se lokalserver.py)
+            self.apiurl = miljo.rstrip( '/' )
+
         else:
-            print( 'Miljø finnes ikke! stm-utvles, utvles, utvskriv, testles, testskriv, prodles, prodskriv')
+            print( 'Miljø finnes ikke! stm-utvles, utvles, utvskriv, testles, testskriv, prodles, prodskriv, eller URL som starter med http')
 
                               
     def login(self, miljo=None, username='jajens', pw=None, klient=None, realm='EMPLOYEE', user_type='employee'): 
@@ -258,6 +275,27 @@ class apiforbindelse( ):
         
         return headers
     
+    def tilkoblingspool( self, antall=10 ): 
+        """
+        Dimensjonerer http-tilkoblingspoolen til requests-sesjonen for parallelle spørringer 
+
+        Når flere tråder (f.eks fra nvdbFagdata.to_records_parallell) deler samme apiforbindelse så 
+        deler de også requests-sesjonen. Med en pool på minst like mange tilkoblinger som tråder 
+        slipper vi at trådene venter på hverandre, eller at tilkoblinger kastes og gjenopprettes. 
+
+        Arguments: 
+            None 
+
+        Keywords: 
+            antall : int, default 10. Maksimalt antall samtidige tilkoblinger per tjener 
+
+        Returns: 
+            None 
+        """
+        adapter = requests.adapters.HTTPAdapter( pool_connections=antall, pool_maxsize=antall )
+        self.requestsession.mount( 'https://', adapter )
+        self.requestsession.mount( 'http://', adapter )
+
     def klientinfo( self, klientinfo):
         """
         Få bedre sporbarhet / enklere søk i skriveapi-GUI! 
@@ -325,23 +363,211 @@ class apiforbindelse( ):
         # Kopierer self.headers og angitte headers over i ny dictionary. 
         myheaders = { **self.headers, **headers}
 
-        """Leser data fra NVDB api"""
-        try:
-            r = self.requestsession.get( url=url, 
-                                       proxies=self.proxies,
-                                       headers=myheaders, 
-                                       **kwargs)
-        except (SSLError, ChunkedEncodingError, ConnectionError, RemoteDisconnected, ProtocolError, RemoteDisconnected) as e:
-            venteperiode = 5
-            print( 'Feilmelding ved henting av data, prøver på ny om', venteperiode, 'sekunder', e)
-            sleep( 5 )
-            r = self.requestsession.get( url=url, 
-                                       proxies=self.proxies,
-                                       headers=myheaders, 
-                                       **kwargs)        
-        
+        t0 = perf_counter()
+        kilde = 'nett'
+
+        # Avspilling av tidligere opptak, se metoden spillav
+        if self.opptak and self.opptak.modus == 'avspilling': 
+            r = self.opptak.spillav( url, params=kwargs.get( 'params' ), headers=myheaders )
+            if self.maaling: 
+                self.maaling.anrop( url, r.status_code, perf_counter()-t0, antallBytes=len( r.content ), kilde='opptak' )
+            return r 
+
+        r = self.__lesmellomlager( url, myheaders, **kwargs )
+
+        if self.maaling: 
+            if getattr( r, 'fra_mellomlager', False ): 
+                kilde = 'mellomlager'
+            # Ved strømming (stream=True) er ikke responsen lest ennå, så vi har kun tiden til http headerne  
+            antallBytes = int( r.headers.get( 'Content-Length', 0 ) ) if kwargs.get( 'stream', False ) else len( r.content )
+            self.maaling.anrop( url, r.status_code, perf_counter()-t0, antallBytes=antallBytes, kilde=kilde )
+
+        # Opptak, se metoden taopp 
+        if self.opptak: 
+            self.opptak.lagre( url, kwargs.get( 'params' ), myheaders, r )
+
         return r 
 
+    def __lesmellomlager( self, url, myheaders, **kwargs ): 
+        """Leser data fra mellomlager (hvis det er slått på) eller fra NVDB api"""
+
+        # Mellomlager, se metoden mellomlagring. Gjelder ikke strømming av data (stream=True)
+        if self.mellomlager and not kwargs.get( 'stream', False ): 
+            nokkel = self.mellomlager.lagnokkel( url, params=kwargs.get( 'params' ), headers=myheaders )
+            lagret = self.mellomlager.hent( nokkel )
+            if lagret and lagret[1]: 
+                self.mellomlager.forny( nokkel, fornyLevetid=False )
+                return lagret[0]
+
+            if lagret: 
+                myheaders = { **myheaders, **self.mellomlager.betingelser( nokkel ) }
+
+            r = self.__hent( url, myheaders, **kwargs )
+            if lagret and r.status_code == 304: 
+                self.mellomlager.forny( nokkel )
+                return lagret[0]
+            elif r.status_code == 200: 
+                self.mellomlager.lagre( nokkel, r )
+
+            return r 
+
+        return self.__hent( url, myheaders, **kwargs )
+
+    def __hent( self, url, myheaders, **kwargs ): 
+        """Leser data fra NVDB api. Nye forsøk ved brudd på forbindelsen styres av self.forsoksregel"""
+        forsok = 0
+        while True: 
+            try:
+                if self.struping: 
+                    self.struping.inn()
+                    statuskode = None 
+                    try: 
+                        r = self.requestsession.get( url=url, 
+                                                proxies=self.proxies,
+                                                headers=myheaders, 
+                                                **kwargs)
+                        statuskode = r.status_code 
+                    finally: 
+                        self.struping.ut( statuskode )
+                    return r 
+
+                return self.requestsession.get( url=url, 
+                                           proxies=self.proxies,
+                                           headers=myheaders, 
+                                           **kwargs)
+            except (SSLError, ChunkedEncodingError, ConnectionError, RemoteDisconnected, ProtocolError) as e:
+                if not self.forsoksregel.skalprove( forsok ): 
+                    raise
+
+                venteperiode = self.forsoksregel.registrer( forsok )
+                print( 'Feilmelding ved henting av data, prøver på ny om', round( venteperiode, 1), 'sekunder', e)
+                sleep( venteperiode )
+                forsok += 1
+
+    def taopp( self, katalog ): 
+        """
+        Tar opp alle forespørsler og responser fra NVDB api til JSON-filer i angitt katalog, se opptak.py 
+
+        Opptaket kan senere spilles av med metoden spillav, eller serveres av lokalserver.py, uten tilgang til NVDB api. 
+        Slå av opptak med apiforbindelse.opptak = None 
+
+        Arguments: 
+            katalog : string, katalog for opptak 
+
+        Returns: 
+            opptak-objektet
+        """
+        self.opptak = opptak( katalog, modus='opptak' )
+        return self.opptak 
+
+    def spillav( self, katalog ): 
+        """
+        Spiller av opptak laget med metoden taopp i stedet for å spørre NVDB api, se opptak.py 
+
+        Forespørsler som ikke finnes i opptaket får respons med statuskode 404. Slå av avspilling med 
+        apiforbindelse.opptak = None 
+
+        Arguments: 
+            katalog : string, katalog med opptak 
+
+        Returns: 
+            opptak-objektet
+        """
+        self.opptak = opptak( katalog, modus='avspilling' )
+        return self.opptak 
+
+    def strup( self, rate=10, maksSamtidige=4, aktiv=True, **kwargs ): 
+        """
+        Begrenser antall kall per sekund og antall samtidige kall mot NVDB api, se struping.py 
+
+        Begrensningen gjelder alle søkeobjekter, tråder og kloner som deler denne apiforbindelsen. Raten halveres 
+        automatisk når NVDB api svarer 429 eller 503, og økes gradvis igjen (opp til rate) når kallene går bra. 
+
+        Arguments: 
+            None 
+
+        Keywords: 
+            rate : float, maksimalt antall kall per sekund. Default 10
+
+            maksSamtidige : int, maksimalt antall samtidige kall. Default 4 
+
+            aktiv : True (default) eller False. Bruk aktiv=False for å slå av strupingen 
+
+            Øvrige nøkkelord sendes til struping, f.eks minrate, kapasitet 
+
+        Returns: 
+            struping-objektet (evt None hvis aktiv=False)
+        """
+        if aktiv: 
+            self.struping = struping( rate=rate, maksSamtidige=maksSamtidige, **kwargs )
+        else: 
+            self.struping = None 
+
+        return self.struping 
+
+    def maal( self, aktiv=True, lytter=None ): 
+        """
+        Slår på (evt av) måling av tidsbruk og tellere for denne forbindelsen, se maaling.py 
+
+        Målingen gjelder alle søkeobjekter, tråder og kloner som deler denne apiforbindelsen, og registrerer 
+        tid og antall bytes per kall, JSON-dekoding, nye forsøk og tidsbruk i to_records. Søkeobjektenes 
+        to_records skriver en rapport når de er ferdige. 
+
+        Arguments: 
+            None 
+
+        Keywords: 
+            aktiv : True (default) eller False. Bruk aktiv=False for å slå av målingen 
+
+            lytter : None eller funksjon lytter( hendelse, data ) som kalles for hver hendelse, se maaling.py 
+
+        Returns: 
+            maaling-objektet (evt None hvis aktiv=False). Hvis målingen allerede er slått på så får du 
+            det eksisterende objektet (evt med ny lytter)
+        """
+        if not aktiv: 
+            self.maaling = None 
+        elif self.maaling: 
+            if lytter: 
+                self.maaling.lytt( lytter )
+        else: 
+            self.maaling = maaling( lytter=lytter )
+
+        self.forsoksregel.maaling = self.maaling 
+        return self.maaling 
+
+    def mellomlagring( self, filnavn='nvdbapi_mellomlager.sqlite', levetid=3600, maksstorrelse=500*1024*1024, aktiv=True ): 
+        """
+        Slår på (evt av) mellomlagring av responser fra NVDB api på disk, se mellomlager.py 
+
+        Gjentatte kjøringer med samme søk henter da data fra disk i stedet for NVDB api. Responser eldre enn 
+        levetid sekunder sjekkes mot NVDB api med betinget GET (ETag / Last-Modified) før de brukes. 
+
+        Arguments: 
+            None 
+
+        Keywords: 
+            filnavn : string, navn på SQLite-fil for lagring. Default 'nvdbapi_mellomlager.sqlite'
+
+            levetid : int, antall sekunder vi bruker lagrede responser uten å spørre NVDB api. Default 3600
+
+            maksstorrelse : int, maksimal størrelse (bytes) på mellomlageret. Default 500 MB. 
+                            De minst nylig brukte responsene kastes først 
+
+            aktiv : True (default) eller False. Bruk aktiv=False for å slå av mellomlagring 
+
+        Returns: 
+            mellomlager-objektet (evt None hvis aktiv=False)
+        """
+        if self.mellomlager: 
+            self.mellomlager.lukk()
+            self.mellomlager = None 
+
+        if aktiv: 
+            self.mellomlager = mellomlager( filnavn=filnavn, levetid=levetid, maksstorrelse=maksstorrelse )
+
+        return self.mellomlager 
+
     def finnid( self, objektid, kunvegnett=False, kunfagdata=False, miljo=False): 
         """Henter NVDB objekt (enten veglenke eller fagdata) ut fra objektID.
         Bruk nøkkelord kunvegnett=True eller kunfagdata=True for å avgrense til 
@@ -357,7 +583,7 @@ class apiforbindelse( ):
         if kunfagdata or (not kunvegnett): 
             try:
                 res = self.les( self.apiurl +  '/vegobjekt', params = { 'id' : objektid } )
-                res = res.json()
+                res = dekodjson( res.content )
 
             except ValueError: 
                 pass
@@ -365,13 +591,13 @@ class apiforbindelse( ):
             else:
                 # Må hente fagobjektet på ny for å få alle segmenter (inkluder=alle)
                 res = self.les( res['href'], params = { 'inkluder' : 'alle' } ) 
-                res = res.json()
+                res = dekodjson( res.content )
 
         # Henter vegnett
         if kunvegnett or (not kunfagdata) or (not res and not kunfagdata): 
             try: 
                 res = self.les( self.apiurl + '/vegnett/veglenkesekvenser/segmentert/' + str(objektid))
-                res = res.json()            
+                res = dekodjson( res.content )            
             except ValueError: 
                 pass
 
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Asynkron kommunikasjon mot NVDB api v3 LES
+
+apiforbindelse_async - Asynkron variant av apiforbindelse, for de tilfellene der du skal gjøre
+mange små oppslag (finnid, vegrefpunkt, veglenkepunkt) samtidig. Bruker samme http headere,
+miljøvalg (velgmiljo) og innlogging som apiforbindelse, men henter data med aiohttp.
+
+aiohttp er IKKE påkrevd for resten av nvdbapiv3, og må installeres separat:
+    pip install aiohttp
+
+Eksempel:
+    import asyncio
+    from nvdbapiv3 import apiforbindelse_async
+
+    async def finnmange( idliste ):
+        async with apiforbindelse_async() as forb:
+            return await asyncio.gather( *[ forb.finnid( x ) for x in idliste ] )
+
+    data = asyncio.run( finnmange( [ 85288328, 1171087 ] ) )
+
+"""
+import asyncio
+import time
+from json import JSONDecodeError
+
+from .apiforbindelse import apiforbindelse
+from .jsondekoder import dekodjson
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class asynkronrespons( ):
+    """
+    Enkel respons fra apiforbindelse_async.les, med de samme egenskapene som vi bruker fra requests.Response
+    (status_code, ok, url, headers, content, text og json() )
+    """
+
+    def __init__( self, status_code, url, headers, content ):
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers
+        self.content = content
+        self.ok = status_code < 400
+
+    @property
+    def text( self ):
+        return self.content.decode( 'utf-8', errors='replace' )
+
+    def json( self ):
+        return dekodjson( self.content )
+
+
+class apiforbindelse_async( apiforbindelse ):
+    """
+    Asynkron variant av apiforbindelse. Metodene les, anrope, finnid, vegrefpunkt, veglenkepunkt
+    og lukk er korutiner (async def)
+
+    Innlogging (login), miljøvalg (velgmiljo) og http headere arves fra apiforbindelse.
+    """
+
+    def __init__( self, miljo='prodles' ):
+        """
+        Oppretter en instans av apiforbindelse_async
+
+        Arguments:
+            None
+        Keywords:
+            miljo: string, se apiforbindelse
+        """
+        if aiohttp is None:
+            raise ImportError( 'apiforbindelse_async krever aiohttp, installer med pip install aiohttp')
+
+        super().__init__( miljo=miljo )
+        self.asynkronsesjon = None
+
+    @classmethod
+    def fra_forbindelse( cls, forb ):
+        """
+        Lager asynkron forbindelse med samme miljø, http headere (inkl innlogging) og proxy som en eksisterende apiforbindelse
+        """
+        ny = cls( miljo=None )
+        ny.miljo = forb.miljo
+        ny.apiurl = forb.apiurl
+        ny.headers = dict( forb.headers )
+        ny.proxies = forb.proxies
+        ny.forsoksregel = forb.forsoksregel
+        ny.struping = forb.struping
+        ny.maaling = forb.maaling
+        return ny
+
+    async def __aenter__( self ):
+        return self
+
+    async def __aexit__( self, *args ):
+        await self.lukk()
+
+    async def lukk( self ):
+        """
+        Lukker aiohttp-sesjonen. Må kalles når du er ferdig, evt bruk async with apiforbindelse_async() as forb: ...
+        """
+        if self.asynkronsesjon:
+            await self.asynkronsesjon.close()
+            self.asynkronsesjon = None
+
+    async def les( self, path, headers={}, params=None, **kwargs ):
+        """
+        Asynkron http GET mot NVDB api. Samme logikk som apiforbindelse.les
+
+        Arguments:
+            path : URL, enten relativt til rot-endepunt for API, eller fullstendig
+
+        Keywords:
+            headers : dictionary med http headere som legges til (evt overstyrer) self.headers
+
+            params : dictionary med spørreparametre. Lister blir til gjentatte parametre, slik som i requests
+
+            Eventuelle nøkkelord-argumenter sendes til aiohttp
+
+        Returns:
+            asynkronrespons
+        """
+        if path[0:4] == 'http':
+            url = path
+        else:
+            url = self.apiurl + path
+
+        myheaders = { **self.headers, **headers}
+
+        if not self.asynkronsesjon:
+            self.asynkronsesjon = aiohttp.ClientSession( )
+
+        if self.proxies:
+            kwargs.setdefault( 'proxy', self.proxies.get( url.split(':')[0] ) )
+
+        forsok = 0
+        while True:
+            try:
+                t0 = time.perf_counter()
+                r = await self.__get( url, myheaders, params, **kwargs )
+                if self.maaling:
+                    self.maaling.anrop( r.url, r.status_code, time.perf_counter()-t0, antallBytes=len( r.content ) )
+                return r
+            except ( aiohttp.ClientError, asyncio.TimeoutError ) as e:
+                if not self.forsoksregel.skalprove( forsok ):
+                    raise
+
+                venteperiode = self.forsoksregel.registrer( forsok )
+                print( 'Feilmelding ved henting av data, prøver på ny om', round( venteperiode, 1), 'sekunder', e)
+                await asyncio.sleep( venteperiode )
+                forsok += 1
+
+    async def __get( self, url, headers, params, **kwargs ):
+        """
+        Selve http GET-kallet, leser hele responsen. Respekterer evt struping (self.struping)
+        """
+        if self.struping:
+            vent = self.struping.provinn()
+            while vent:
+                await asyncio.sleep( vent )
+                vent = self.struping.provinn()
+
+            statuskode = None
+            try:
+                r = await self.__getustrupet( url, headers, params, **kwargs )
+                statuskode = r.status_code
+            finally:
+                self.struping.ut( statuskode )
+            return r
+
+        return await self.__getustrupet( url, headers, params, **kwargs )
+
+    async def __getustrupet( self, url, headers, params, **kwargs ):
+        async with self.asynkronsesjon.get( url, headers=headers, params=parametreliste( params ), **kwargs ) as r:
+            content = await r.read()
+            return asynkronrespons( r.status, str( r.url ), r.headers, content )
+
+    async def anrope( self, path, parametre=None, headers={}, iterasjontelling=0 ):
+        """
+        Asynkron variant av nvdbVegnett.anrope: Henter data fra NVDB api og returnerer JSON-data
+
+        Samme feilhåndtering som nvdbVegnett.anrope: Nye forsøk (etter self.forsoksregel) ved 503/504 og ved feil
+        i JSON-dekoding, ValueError ved manglende tilgang (401, 403) og øvrige http-feil
+
+        Arguments:
+            path : URL, enten relativt til rot-endepunt for API, eller fullstendig
+
+        Keywords:
+            parametre : dictionary med spørreparametre
+
+            headers : dictionary med http headere
+
+        Returns:
+            JSON-data fra NVDB api (dictionary eller liste)
+        """
+        if not 'http' in path:
+            if path[0] != '/':
+                path = '/' + path
+
+        while True:
+            r = await self.les( path, headers=headers, params=parametre )
+
+            if r.status_code == 200:
+                try:
+                    if self.maaling:
+                        with self.maaling.spenn( 'dekoding' ):
+                            return r.json()
+                    return r.json()
+                except JSONDecodeError as err:
+                    if self.forsoksregel.skalprove( iterasjontelling ):
+                        print( 'Fikk feilmelding på JSON-dekoding av respons, hikke fra NVDB api? Prøver på ny en håndfull ganger med litt pause')
+                        await asyncio.sleep( self.forsoksregel.registrer( iterasjontelling ) )
+                        iterasjontelling += 1
+                        continue
+                    print( 'Beklager, må gi opp å parse data hentet med url', r.url)
+                    print( err )
+                    raise ValueError("Klarte ikke oversette respons fra NVDB api til JSON for kall " + r.url )
+
+            elif self.forsoksregel.skalprove( iterasjontelling, r=r ):
+                print( 'Http error, prøver om igjen', str( iterasjontelling+1), 'av', str( self.forsoksregel.maksforsok), 'ganger om bittelita stund: '+str(r.status_code) +' '+r.url )
+                await asyncio.sleep( self.forsoksregel.registrer( iterasjontelling, r=r ) )
+                iterasjontelling += 1
+
+            elif r.status_code in [ 401, 403 ]:
+                raise ValueError( 'Ugyldig pålogging', str(r.status_code) + ' ' + r.url + '\n' + r.text )
+
+            else:
+                raise ValueError('Http error: '+str(r.status_code) +' '+r.url + '\n' + r.text )
+
+    async def finnid( self, objektid, kunvegnett=False, kunfagdata=False ):
+        """
+        Asynkron variant av finnid: Henter NVDB objekt (enten lenkesekvens eller fagdata) ut fra objektID.
+        Bruk nøkkelord kunvegnett=True eller kunfagdata=True for å avgrense til vegnett og/eller fagdata
+
+        Fagdata returnerer en DICT
+        Vegnett returnerer en LISTE med alle vegnettselementene for veglenka
+        """
+        res = None
+        if kunfagdata or (not kunvegnett):
+            try:
+                res = await self.anrope( 'vegobjekt', parametre = { 'id' : objektid } )
+            except ValueError:
+                pass
+            else:
+                # Må hente fagobjektet på ny for å få alle segmenter (inkluder=alle)
+                res = await self.anrope( res['href'], parametre = { 'inkluder' : 'alle' } )
+
+        if kunvegnett or (not kunfagdata) or (not res and not kunfagdata):
+            try:
+                res = await self.anrope( 'vegnett/veglenkesekvenser/segmentert/' + str(objektid) )
+            except ValueError:
+                pass
+
+            # Sikrer at vi alltid returnerer liste med vegsegmenter - selv om vi kun har ett segment
+            if isinstance( res, dict):
+                res = [ res ]
+
+        if not res:
+            print( "Fant intet NVDB objekt eller vegnett med ID = " + str(objektid))
+
+        return res
+
+    async def vegrefpunkt( self, vref, retur='veglenkeposisjon' ):
+        """
+        Asynkron variant av nvdbapiv3.vegrefpunkt: Slår opp vegsystemreferanse i NVDB api LES /veg
+
+        Keywords:
+            retur : 'veglenkeposisjon' (default), 'wkt' eller 'komplett'
+        """
+        r = await self.les( '/veg', params={ 'vegsystemreferanse' : vref } )
+        if r.ok:
+            data = r.json()
+            if 'vegle' in retur.lower()  and 'veglenkesekvens' in data.keys() and 'kortform' in data['veglenkesekvens'].keys():
+                return data['veglenkesekvens']['kortform']
+            elif retur.lower() == 'wkt' and 'geometri' in data.keys() and 'wkt' in data['geometri'].keys():
+                return data['geometri']['wkt']
+            elif retur.lower() == 'komplett':
+                return data
+
+        return None
+
+    async def veglenkepunkt( self, vpos, retur='wkt' ):
+        """
+        Asynkron variant av nvdbapiv3.veglenkepunkt: Slår opp veglenkeposisjon i NVDB api LES /veg
+
+        Keywords:
+            retur : 'wkt' (default), 'vegsystemreferanse' eller 'komplett'
+        """
+        r = await self.les( '/veg', params={ 'veglenkesekvens' : vpos } )
+        if r.ok:
+            data = r.json()
+            if 'ref' in retur.lower()  and 'vegsystemreferanse' in data.keys() and 'kortform' in data['vegsystemreferanse'].keys():
+                return data['vegsystemreferanse']['kortform']
+            elif retur.lower() == 'wkt' and 'geometri' in data.keys() and 'wkt' in data['geometri'].keys():
+                return data['geometri']['wkt']
+            elif retur.lower() == 'komplett':
+                return data
+
+        return None
+
+
+def parametreliste( params ):
+    """
+    Gjør om dictionary med spørreparametre til liste med (nøkkel, tekst)-tupler, slik aiohttp vil ha det.
+
+    Lister blir til gjentatte parametre, slik som i requests. Eksempel
+        { 'inkluder' : ['alle'], 'kommune' : 5001 } => [ ('inkluder', 'alle'), ('kommune', '5001') ]
+    """
+    if not params:
+        return None
+
+    retur = []
+    for key, verdi in params.items():
+        if verdi is None:
+            continue
+        if isinstance( verdi, (list, tuple) ):
+            retur.extend( [ (key, str( x )) for x in verdi ] )
+        else:
+            retur.append( (key, str( verdi )) )
+    return retur
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Felles mellomlager for datakatalogen (definisjoner av vegobjekttyper) i NVDB api LES
+
+Definisjonen av en objekttype (/vegobjekttyper/<id>) endres kun når NVDB datakatalog får ny versjon.
+Vi tar derfor vare på definisjonene i et mellomlager som deles av alle søkeobjekter i hele
+python-prosessen, med nøkkel (apiurl, datakatalogversjon).
+
+Versjonen sjekkes mot /status maksimalt hvert sjekkintervall sekunder per miljø. Når NVDB api rapporterer
+ny datakatalogversjon så kastes de gamle definisjonene.
+
+Funksjoner:
+    - objekttype: Henter definisjon for en objekttype, fra mellomlager eller NVDB api
+    - lastalle: Henter alle objekttyper med ett kall mot /vegobjekttyper
+    - lagre: Lagrer mellomlageret til JSON-fil på disk
+    - lesfil: Leser mellomlager fra JSON-fil (lagret med lagre)
+    - tom: Tømmer mellomlageret
+
+Eksempel, henter hele datakatalogen én gang og gjenbruker den i senere kjøringer:
+
+    from nvdbapiv3 import datakatalog
+    if os.path.exists( 'datakatalog.json' ):
+        datakatalog.lesfil( 'datakatalog.json' )
+    else:
+        datakatalog.lastalle()
+        datakatalog.lagre( 'datakatalog.json' )
+
+"""
+import json
+import threading
+import time
+
+from . import apiforbindelse
+from .jsondekoder import dekodjson, JSONDecodeError
+
+sjekkintervall = 600        # Antall sekunder mellom hver sjekk av datakatalogversjon mot /status
+
+_laas = threading.RLock()
+_kataloger = {}             # ( apiurl, versjon ) => { objekttypeid : definisjon }
+_versjoner = {}             # apiurl => ( versjon, tidspunkt for siste sjekk )
+
+
+def objekttype( objTypeID, forb=None ):
+    """
+    Henter definisjon for objekttype fra mellomlager, evt fra NVDB api /vegobjekttyper/<objTypeID>
+
+    Definisjonen deles mellom alle som spør, og må IKKE endres.
+
+    ARGUMENTS
+        objTypeID - int, ID for objekttypen
+
+    KEYWORDS
+        forb - En instans av nvdbapiforbindelse. Angis dersom du skal bruke et annet miljø enn PROD
+
+    RETURNS
+        dictionary med definisjon av objekttypen. ValueError hvis den ikke finnes
+    """
+    if not forb:
+        forb = apiforbindelse.apiforbindelse()
+
+    objTypeID = int( objTypeID )
+    katalog = _katalog( forb )
+    with _laas:
+        if objTypeID in katalog:
+            return katalog[objTypeID]
+
+    definisjon = _anrope( forb, '/vegobjekttyper/' + str( objTypeID ) )
+    with _laas:
+        katalog[objTypeID] = definisjon
+
+    return definisjon
+
+
+def lastalle( forb=None ):
+    """
+    Henter definisjonen av alle objekttyper fra NVDB api /vegobjekttyper med ett kall, og legger dem i mellomlageret
+
+    KEYWORDS
+        forb - En instans av nvdbapiforbindelse. Angis dersom du skal bruke et annet miljø enn PROD
+
+    RETURNS
+        antall objekttyper i mellomlageret
+    """
+    if not forb:
+        forb = apiforbindelse.apiforbindelse()
+
+    data = _anrope( forb, '/vegobjekttyper', params={ 'inkluder' : 'alle' } )
+    katalog = _katalog( forb )
+    with _laas:
+        for definisjon in data:
+            katalog[ int( definisjon['id'] ) ] = definisjon
+        return len( katalog )
+
+
+def lagre( filnavn ):
+    """
+    Lagrer mellomlageret (alle miljø og versjoner) til JSON-fil
+    """
+    with _laas:
+        data = [ { 'apiurl' : apiurl, 'versjon' : katalogversjon, 'objekttyper' : list( katalog.values() ) }
+                    for ( apiurl, katalogversjon ), katalog in _kataloger.items() ]
+
+    with open( filnavn, 'w', encoding='utf-8' ) as f:
+        json.dump( data, f, ensure_ascii=False )
+
+
+def lesfil( filnavn ):
+    """
+    Leser mellomlager fra JSON-fil lagret med lagre. Versjonen sjekkes mot NVDB api /status ved første gangs bruk,
+    og definisjonene kastes hvis datakatalogen har fått ny versjon.
+    """
+    with open( filnavn, encoding='utf-8' ) as f:
+        data = json.load( f )
+
+    with _laas:
+        for element in data:
+            katalog = _kataloger.setdefault( ( element['apiurl'], element['versjon'] ), {} )
+            for definisjon in element['objekttyper']:
+                katalog[ int( definisjon['id'] ) ] = definisjon
+
+
+def tom( ):
+    """
+    Tømmer mellomlageret
+    """
+    with _laas:
+        _kataloger.clear()
+        _versjoner.clear()
+
+
+def versjon( forb=None ):
+    """
+    Returnerer versjonsnummer for datakatalogen (tekst, f.eks '2.32'), evt None hvis vi ikke finner det.
+    Spør /status maksimalt hvert sjekkintervall sekunder per miljø.
+    """
+    if not forb:
+        forb = apiforbindelse.apiforbindelse()
+
+    with _laas:
+        if forb.apiurl in _versjoner and time.time() - _versjoner[forb.apiurl][1] < sjekkintervall:
+            return _versjoner[forb.apiurl][0]
+
+    nyversjon = None
+    try:
+        status = _anrope( forb, '/status' )
+        nyversjon = status['datagrunnlag']['datakatalog']['versjon']
+    except ( ValueError, KeyError, TypeError ):
+        print( 'Fant ikke datakatalogversjon i', forb.apiurl + '/status' )
+
+    with _laas:
+        gammel = _versjoner.get( forb.apiurl, (None, 0) )[0]
+        _versjoner[forb.apiurl] = ( nyversjon, time.time() )
+
+        # Kaster utdaterte definisjoner for dette miljøet (men ikke hvis vi ikke fant versjonsnummer)
+        for nokkel in list( _kataloger.keys() ):
+            if nyversjon is not None and nokkel[0] == forb.apiurl and nokkel[1] != nyversjon:
+                if gammel is not None and nokkel[1] == gammel:
+                    print( 'Ny datakatalogversjon', nyversjon, 'erstatter', gammel )
+                del _kataloger[nokkel]
+
+    return nyversjon
+
+
+def _katalog( forb ):
+    """
+    Returnerer dictionary med objekttyper for gjeldende miljø og datakatalogversjon
+    """
+    gjeldende = versjon( forb=forb )
+    with _laas:
+        return _kataloger.setdefault( ( forb.apiurl, gjeldende ), {} )
+
+
+def _anrope( forb, sti, params=None ):
+    """
+    Henter JSON-data fra NVDB api, ValueError ved feil
+
+    Nye forsøk ved http-feil som 503, 504 og ved feil i JSON-dekoding styres av forb.forsoksregel, som i nvdbVegnett.anrope
+    """
+    forsoksregel = forb.forsoksregel
+    forsok = 0
+    while True:
+        r = forb.les( sti, params=params )
+        if r.ok:
+            try:
+                return dekodjson( r.content )
+            except JSONDecodeError as err:
+                if not forsoksregel.skalprove( forsok ):
+                    raise ValueError( 'Klarte ikke oversette respons fra NVDB api til JSON for kall ' + r.url + '\n' + str( err ) )
+                print( 'Fikk feilmelding på JSON-dekoding av respons fra', r.url, 'prøver på ny' )
+                forsoksregel.vent( forsok )
+
+        elif forsoksregel.skalprove( forsok, r=r ):
+            print( 'Http error, prøver om igjen', str( forsok+1 ), 'av', str( forsoksregel.maksforsok ), 'ganger om bittelita stund: ' + str( r.status_code ) + ' ' + r.url )
+            forsoksregel.vent( forsok, r=r )
+
+        else:
+            raise ValueError( 'Http error: ' + str( r.status_code ) + ' ' + r.url + '\n' + r.text )
+
+        forsok += 1
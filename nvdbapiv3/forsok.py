@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Regler for nye forsøk (retry) når NVDB api svarer med feil eller forbindelsen brytes
+
+forsoksregel - Klasse som bestemmer om vi skal prøve på nytt, og hvor lenge vi skal vente:
+    * Eksponentielt økende ventetid (basis * faktor^forsøk), med tilfeldig variasjon (jitter)
+      slik at mange klienter (tråder) ikke prøver på nytt i samme øyeblikk
+    * Respekterer http headeren Retry-After (sekunder eller dato)
+    * Budsjett: Maksimalt antall nye forsøk for hele sesjonen (dvs for en apiforbindelse), slik at
+      et langvarig avbrudd gir feilmelding i stedet for at batch-jobber henger i timevis
+
+Hver apiforbindelse har sin egen forsoksregel, som brukes av apiforbindelse.les, nvdbVegnett.anrope
+og apiforbindelse_async. Eksempel, flere forsøk og lengre ventetid:
+
+    sok = nvdbFagdata( 45 )
+    sok.forbindelse.forsoksregel = forsoksregel( maksforsok=8, maksventetid=120 )
+
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class forsoksregel( ):
+    """
+    Regel for nye forsøk med eksponentiell ventetid, jitter, Retry-After og budsjett per sesjon
+    """
+
+    def __init__( self, maksforsok=5, basis=2, faktor=2, maksventetid=60, jitter=True, budsjett=50,
+                    statuskoder=(429, 502, 503, 504) ):
+        """
+        Arguments:
+            None
+
+        Keywords:
+            maksforsok : int, maksimalt antall nye forsøk per kall. Default 5
+
+            basis : sekunder, ventetid før første nye forsøk. Default 2
+
+            faktor : ventetiden ganges med faktor for hvert nye forsøk. Default 2
+
+            maksventetid : sekunder, øvre grense for beregnet ventetid (men Retry-After fra NVDB api respekteres). Default 60
+
+            jitter : True (default) gir tilfeldig ventetid mellom halvparten og hele beregnet ventetid
+
+            budsjett : int, maksimalt antall nye forsøk totalt for sesjonen. None = ubegrenset. Default 50
+
+            statuskoder : http statuskoder som gir nytt forsøk. Default (429, 502, 503, 504)
+        """
+        self.maksforsok = maksforsok
+        self.basis = basis
+        self.faktor = faktor
+        self.maksventetid = maksventetid
+        self.jitter = jitter
+        self.budsjett = budsjett
+        self.statuskoder = statuskoder
+        self.antallForsok = 0
+        self.ventetidTotalt = 0
+        self.laas = threading.Lock()
+        self.maaling = None         # Settes av apiforbindelse.maal, se maaling.py
+
+    def skalprove( self, forsok, r=None ):
+        """
+        Skal vi prøve på nytt?
+
+        Arguments:
+            forsok : int, antall nye forsøk vi allerede har gjort for dette kallet
+
+        Keywords:
+            r : None eller respons (requests.Response eller tilsvarende). Hvis angitt må statuskoden være
+                en av self.statuskoder. Uten respons (dvs feil på forbindelsen) så prøver vi på nytt.
+
+        Returns:
+            True eller False
+        """
+        if forsok >= self.maksforsok:
+            return False
+
+        if r is not None and r.status_code not in self.statuskoder:
+            return False
+
+        if self.budsjett is not None and self.antallForsok >= self.budsjett:
+            print( 'Har brukt opp budsjettet på', self.budsjett, 'nye forsøk for denne sesjonen, gir opp' )
+            return False
+
+        return True
+
+    def ventetid( self, forsok, r=None ):
+        """
+        Beregner ventetid (sekunder) før nytt forsøk nummer forsok+1. Bruker Retry-After fra respons r hvis den finnes
+        """
+        if r is not None:
+            retryafter = tolkRetryAfter( r.headers.get( 'Retry-After' ) )
+            if retryafter is not None:
+                return retryafter
+
+        vent = min( self.maksventetid, self.basis * self.faktor ** forsok )
+        if self.jitter:
+            vent = random.uniform( vent / 2, vent )
+        return vent
+
+    def registrer( self, forsok, r=None ):
+        """
+        Teller opp et nytt forsøk mot budsjettet, og returnerer ventetid (sekunder). Brukes av asynkron kode,
+        som selv må vente (asyncio.sleep)
+        """
+        vent = self.ventetid( forsok, r=r )
+        with self.laas:
+            self.antallForsok += 1
+            self.ventetidTotalt += vent
+        if self.maaling:
+            self.maaling.tell( 'nyeforsok', forsok=forsok, statuskode=r.status_code if r is not None else None, ventetid=vent )
+        return vent
+
+    def vent( self, forsok, r=None ):
+        """
+        Teller opp et nytt forsøk mot budsjettet og venter (time.sleep) før neste forsøk
+        """
+        time.sleep( self.registrer( forsok, r=r ) )
+
+    def nullstill( self ):
+        """
+        Nullstiller budsjett og tellere
+        """
+        with self.laas:
+            self.antallForsok = 0
+            self.ventetidTotalt = 0
+
+    def statistikk( self ):
+        """
+        Returnerer dictionary med antall nye forsøk og total ventetid (sekunder) for sesjonen
+        """
+        return { 'antallForsok' : self.antallForsok, 'ventetid' : round( self.ventetidTotalt, 3 ),
+                 'budsjett' : self.budsjett }
+
+
+def tolkRetryAfter( verdi ):
+    """
+    Oversetter http headeren Retry-After (sekunder eller http-dato) til antall sekunder, evt None
+    """
+    if not verdi:
+        return None
+
+    try:
+        return max( 0, float( verdi ) )
+    except ValueError:
+        pass
+
+    try:
+        return max( 0, parsedate_to_datetime( verdi ).timestamp() - time.time() )
+    except ( TypeError, ValueError, IndexError ):
+        return None
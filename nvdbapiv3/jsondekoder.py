@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Rask JSON-dekoding av responser fra NVDB api
+
+JSON-dekoding er en stor del av CPU-bruken når vi laster ned mye data. Hvis orjson eller
+pysimdjson er installert så bruker vi dem, ellers standardbiblioteket json. Vi dekoder rett fra
+bytes, uten å gå via tekst (str), slik som requests.Response.json() gjør.
+
+Funksjoner:
+    - dekodjson: Dekoder JSON fra bytes (eller tekst)
+    - velgdekoder: Velger dekoder, en av 'auto' (default), 'orjson', 'simdjson' eller 'json'
+
+Eksempel, tvinger bruk av standardbiblioteket:
+
+    from nvdbapiv3 import jsondekoder
+    jsondekoder.velgdekoder( 'json' )
+
+Alle dekodere gir json.JSONDecodeError ved ugyldig JSON.
+
+Installer orjson med
+    pip install orjson
+"""
+import json
+from json import JSONDecodeError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+dekoder = None          # Navn på dekoderen vi bruker, settes av velgdekoder
+
+
+def _orjson( data ):
+    return orjson.loads( data )
+
+def _simdjson( data ):
+    try:
+        return simdjson.loads( data )
+    except ValueError as err:
+        if isinstance( err, JSONDecodeError ):
+            raise
+        tekst = data if isinstance( data, str ) else data[:1000].decode( 'utf-8', errors='replace' )
+        raise JSONDecodeError( str( err ), tekst, 0 )
+
+def _json( data ):
+    if isinstance( data, ( bytes, bytearray ) ):
+        try:
+            data = data.decode( 'utf-8' )
+        except UnicodeDecodeError as err:
+            # F.eks avkuttet respons som slutter midt i æ, ø eller å
+            raise JSONDecodeError( str( err ), data[:1000].decode( 'utf-8', errors='replace' ), err.start )
+    return json.loads( data )
+
+_dekodere = { 'orjson' : ( lambda : orjson is not None, _orjson ),
+              'simdjson' : ( lambda : simdjson is not None, _simdjson ),
+              'json' : ( lambda : True, _json ) }
+
+_dekod = _json
+
+
+def velgdekoder( navn='auto' ):
+    """
+    Velger JSON-dekoder for hele pakken
+
+    ARGUMENTS
+        None
+
+    KEYWORDS
+        navn - 'auto' (default) = orjson, simdjson eller json, i den rekkefølgen, avhengig av hva som er installert.
+                Eller angi en av 'orjson', 'simdjson', 'json'. ValueError hvis dekoderen ikke er installert
+
+    RETURNS
+        navn på dekoderen vi bruker
+    """
+    global dekoder, _dekod
+
+    if navn == 'auto':
+        navn = [ x for x in ( 'orjson', 'simdjson', 'json' ) if _dekodere[x][0]() ][0]
+
+    if not navn in _dekodere:
+        raise ValueError( 'Ukjent JSON-dekoder ' + str( navn ) + ', lovlige valg: auto, ' + ', '.join( _dekodere.keys() ) )
+
+    if not _dekodere[navn][0]():
+        raise ValueError( 'JSON-dekoder ' + navn + ' er ikke installert' )
+
+    dekoder = navn
+    _dekod = _dekodere[navn][1]
+    return dekoder
+
+
+def dekodjson( data ):
+    """
+    Dekoder JSON fra bytes (evt tekst) med valgt dekoder, se velgdekoder. Gir json.JSONDecodeError ved ugyldig JSON
+
+    ARGUMENTS
+        data - bytes, f.eks requests.Response.content, eller tekst
+
+    RETURNS
+        python-datastruktur (dictionary, liste m.m.)
+    """
+    return _dekod( data )
+
+
+velgdekoder()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Strømmende (inkrementell) JSON-tolkning av responser fra NVDB api LES
+
+objektstrom - Klasse som leser en respons av typen { "objekter" : [ {...}, {...}, ...], "metadata" : {...} }
+bit for bit, og gir deg elementene i "objekter" etter hvert som de kommer inn. Øvrige elementer på
+toppnivå (f.eks "metadata" med lenken til neste side) finner du i objektstrom.resten når hele
+responsen er lest.
+
+Dermed slipper vi å holde både rådata og hele den ferdig tolkede responsen i minnet samtidig, og vi kan
+begynne å jobbe med første objekt før hele siden er lastet ned. Nyttig for objekttyper med store
+geometrier, f.eks vegoppmerking og arealbruk.
+
+Eksempel:
+
+    r = forb.les( '/vegobjekter/45', stream=True )
+    strom = objektstrom( r.iter_content( chunk_size=65536 ) )
+    for objekt in strom:
+        print( objekt['id'] )
+    print( strom.resten['metadata'] )
+
+"""
+import codecs
+import json
+import re
+
+_mellomrom = re.compile( r'[ \t\n\r]*' )
+
+
+class objektstrom( ):
+    """
+    Itererer over elementene i listen "objekter" fra en strøm med biter (bytes) av en JSON-respons
+    """
+
+    def __init__( self, biter, liste='objekter' ):
+        """
+        Arguments:
+            biter : iterator med bytes, f.eks requests.Response.iter_content( chunk_size=65536 )
+
+        Keywords:
+            liste : Navn på listen på toppnivå som vi gir deg element for element. Default 'objekter'
+        """
+        self.biter = biter
+        self.liste = liste
+        self.resten = {}
+        self.antall = 0
+        self.dekoder = json.JSONDecoder()
+        self.tekstdekoder = codecs.getincrementaldecoder( 'utf-8' )()
+        self.buffer = ''
+        self.pos = 0
+        self.minlengde = 0
+        self.tilstand = 'start'
+        self.nokkel = None
+
+    def __iter__( self ):
+        for bit in self.biter:
+            if not bit:
+                continue
+            self.buffer = self.buffer[self.pos:] + self.__tekst( bit )
+            self.pos = 0
+            if len( self.buffer ) < self.minlengde:
+                continue
+            for objekt in self.__tolk( ferdig=False ):
+                self.antall += 1
+                yield objekt
+
+        self.buffer = self.buffer[self.pos:] + self.__tekst( b'', ferdig=True )
+        self.pos = 0
+        for objekt in self.__tolk( ferdig=True ):
+            self.antall += 1
+            yield objekt
+
+        if self.tilstand != 'slutt':
+            raise json.JSONDecodeError( 'Ufullstendig JSON-respons', self.buffer, self.pos )
+
+    def __tekst( self, bit, ferdig=False ):
+        """
+        Dekoder bytes til tekst (utf-8). Ugyldig eller avkuttet utf-8 gir json.JSONDecodeError, som all annen ugyldig JSON
+        """
+        try:
+            return self.tekstdekoder.decode( bit, final=ferdig )
+        except UnicodeDecodeError as err:
+            raise json.JSONDecodeError( str( err ), self.buffer, len( self.buffer ) )
+
+    def __tegn( self, ferdig ):
+        """
+        Hopper over mellomrom og returnerer neste tegn, evt None hvis vi trenger mer data
+        """
+        self.pos = _mellomrom.match( self.buffer, self.pos ).end()
+        if self.pos < len( self.buffer ):
+            return self.buffer[self.pos]
+        if ferdig and self.tilstand != 'slutt':
+            raise json.JSONDecodeError( 'Ufullstendig JSON-respons', self.buffer, self.pos )
+        return None
+
+    def __verdi( self, ferdig ):
+        """
+        Tolker en komplett JSON-verdi fra self.pos. Returnerer ( True, verdi ) eller ( False, None ) hvis vi trenger mer data
+        """
+        try:
+            verdi, slutt = self.dekoder.raw_decode( self.buffer, self.pos )
+        except json.JSONDecodeError:
+            if ferdig:
+                raise
+            # Venter til bufferet er dobbelt så stort før vi prøver igjen, så unngår vi å tolke
+            # store objekter på nytt for hver eneste bit vi mottar
+            self.minlengde = 2 * ( len( self.buffer ) - self.pos )
+            return ( False, None )
+
+        # Tall (og true/false/null) kan være kuttet midt i. Krever derfor at vi ser tegnet etter verdien
+        if not ferdig and _mellomrom.match( self.buffer, slutt ).end() >= len( self.buffer ):
+            return ( False, None )
+
+        self.pos = slutt
+        self.minlengde = 0
+        return ( True, verdi )
+
+    def __tolk( self, ferdig ):
+        """
+        Tolker så mye av bufferet som mulig, og gir oss elementene i self.liste
+        """
+        while True:
+            tegn = self.__tegn( ferdig )
+            if tegn is None:
+                return
+
+            if self.tilstand == 'start':
+                if tegn != '{':
+                    raise json.JSONDecodeError( 'Forventet {', self.buffer, self.pos )
+                self.pos += 1
+                self.tilstand = 'nokkel'
+
+            elif self.tilstand == 'nokkel':
+                if tegn == '}':
+                    self.pos += 1
+                    self.tilstand = 'slutt'
+                    continue
+                if tegn == ',':
+                    self.pos += 1
+                    continue
+                ok, nokkel = self.__verdi( ferdig )
+                if not ok:
+                    return
+                self.nokkel = nokkel
+                self.tilstand = 'kolon'
+
+            elif self.tilstand == 'kolon':
+                if tegn != ':':
+                    raise json.JSONDecodeError( 'Forventet :', self.buffer, self.pos )
+                self.pos += 1
+                self.tilstand = 'verdi'
+
+            elif self.tilstand == 'verdi':
+                if self.nokkel == self.liste and tegn == '[':
+                    self.pos += 1
+                    self.tilstand = 'element'
+                    continue
+                ok, verdi = self.__verdi( ferdig )
+                if not ok:
+                    return
+                self.resten[self.nokkel] = verdi
+                self.tilstand = 'nokkel'
+
+            elif self.tilstand == 'element':
+                if tegn == ']':
+                    self.pos += 1
+                    self.tilstand = 'nokkel'
+                    continue
+                if tegn == ',':
+                    self.pos += 1
+                    continue
+                ok, verdi = self.__verdi( ferdig )
+                if not ok:
+                    return
+                yield verdi
+
+            else:
+                # Tilstand 'slutt', vi ignorerer evt data etter avsluttende }
+                self.pos = len( self.buffer )
+                return
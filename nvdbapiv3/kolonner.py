@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Kolonnevis oppbygging av søkeresultat, til pandas DataFrame eller Arrow-tabell
+
+to_records() gir deg en liste med dictionaries, én per rad. Skal du videre til pandas (eller geopandas,
+geopackage, parquet) så har du både listen og DataFramen i minnet samtidig, og hver rad koster et eget
+dictionary. kolonnebygger legger i stedet verdiene rett inn i én liste per kolonne, og gjør om til DataFrame
+eller Arrow-tabell for hver bolk med rader. Ferdige bolker slås sammen til slutt.
+
+Kolonnene får datatype ut fra datakatalogen (egenskapstyper for objekttypen) og kjente kolonner som nvdbId,
+veglenkesekvensid og startposisjon: Heltall blir Int64 (pandas) eller int64 (Arrow), desimaltall blir float64.
+Øvrige kolonner får den typen pandas (evt Arrow) finner selv. Dictionaries og lister (f.eks relasjoner) blir
+JSON-tekst i Arrow-tabeller, og beholdes som de er i DataFrame.
+
+Brukes av nvdbVegnett.to_dataframe og nvdbVegnett.to_arrow (og dermed nvdbFagdata). Krever pandas og/eller pyarrow:
+
+    pip install pandas pyarrow
+"""
+import json
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+HELTALL = 'heltall'
+FLYTTALL = 'flyttall'
+BOOLSK = 'boolsk'
+TEKST = 'tekst'
+
+# Kjente kolonner fra nvdbfagdata2records og flatutvegnettsegment
+STANDARDTYPER = { 'objekttype' : HELTALL, 'nvdbId' : HELTALL, 'versjon' : HELTALL, 'veglenkesekvensid' : HELTALL,
+                  'kommune' : HELTALL, 'fylke' : HELTALL, 'vegnummer' : HELTALL, 'nummer' : HELTALL,
+                  'strekning' : HELTALL, 'delstrekning' : HELTALL, 'veglenkenummer' : HELTALL, 'segmentnummer' : HELTALL,
+                  'fra_meter' : HELTALL, 'til_meter' : HELTALL, 'ankerpunktmeter' : HELTALL,
+                  'startposisjon' : FLYTTALL, 'sluttposisjon' : FLYTTALL, 'relativPosisjon' : FLYTTALL,
+                  'segmentlengde' : FLYTTALL, 'strekningslengde' : FLYTTALL, 'lengde' : FLYTTALL,
+                  'startdato' : TEKST, 'sluttdato' : TEKST, 'vref' : TEKST, 'geometri' : TEKST }
+
+
+def kolonnetyper( objekttypedefinisjon=None ):
+    """
+    Returnerer dictionary med kolonnenavn => datatype (HELTALL, FLYTTALL, BOOLSK eller TEKST)
+
+    KEYWORDS
+        objekttypedefinisjon : None eller definisjon av objekttypen fra datakatalogen (nvdbFagdata.objektTypeDef).
+                        Egenskapstypene gir datatype for kolonnene med egenskapsverdier
+    """
+    typer = dict( STANDARDTYPER )
+    if objekttypedefinisjon:
+        for eg in objekttypedefinisjon.get( 'egenskapstyper', [] ):
+            typer[eg['navn']] = egenskapsdatatype( eg )
+    return typer
+
+
+def egenskapsdatatype( egenskapstype ):
+    """
+    Returnerer datatype (HELTALL, FLYTTALL, BOOLSK eller TEKST) for en egenskapstype fra datakatalogen
+    (evt en egenskapverdi fra NVDB api, som har de samme elementene egenskapstype og datatype)
+    """
+    # Både egenskapstype (f.eks Tallenum) og datatype (f.eks Heltall) kan fortelle oss hva vi har
+    tekst = ( str( egenskapstype.get( 'egenskapstype', '' ) ) + ' ' + str( egenskapstype.get( 'datatype', '' ) ) ).lower()
+    if 'geometri' in tekst or 'binær' in tekst:
+        return TEKST
+    elif 'heltall' in tekst:
+        return HELTALL
+    elif 'flyttall' in tekst or tekst.startswith( 'tall' ):
+        return FLYTTALL
+    elif 'boolsk' in tekst:
+        return BOOLSK
+    return TEKST
+
+
+class kolonnebygger( ):
+    """
+    Bygger DataFrame eller Arrow-tabell kolonnevis, rad for rad
+    """
+
+    def __init__( self, format='pandas', typer=None, bolk=65536 ):
+        """
+        Keywords:
+            format : 'pandas' (default) eller 'arrow'
+
+            typer : dictionary med kolonnenavn => datatype, se kolonnetyper(). Default STANDARDTYPER
+
+            bolk : int, antall rader som samles opp før vi gjør om til DataFrame eller Arrow-tabell. Default 65536
+        """
+        if not format in [ 'pandas', 'arrow' ]:
+            raise ValueError( 'Ukjent format ' + str( format ) + ', lovlige valg: pandas, arrow' )
+        if format == 'pandas' and pd is None:
+            raise ImportError( 'Format pandas krever pandas, installer med pip install pandas' )
+        if format == 'arrow' and pa is None:
+            raise ImportError( 'Format arrow krever pyarrow, installer med pip install pyarrow' )
+
+        self.format = format
+        self.typer = typer if typer is not None else dict( STANDARDTYPER )
+        self.bolk = bolk
+        self.antall = 0             # Antall rader totalt
+        self.kolonner = {}          # kolonnenavn => liste med verdier for gjeldende bolk
+        self.radnummer = 0          # Antall rader i gjeldende bolk
+        self.ferdige = []           # Ferdige bolker (DataFrame eller Arrow-tabell)
+
+    def legg_til( self, rad ):
+        """
+        Legger til en rad (dictionary, f.eks fra nvdbfagdata2records). Kolonner som mangler får verdien None
+        """
+        kolonner = self.kolonner
+        for navn, verdi in rad.items():
+            liste = kolonner.get( navn )
+            if liste is None:
+                liste = kolonner[navn] = [ None ] * self.radnummer
+            liste.append( verdi )
+
+        self.radnummer += 1
+        self.antall += 1
+        if len( rad ) < len( kolonner ):
+            for liste in kolonner.values():
+                if len( liste ) < self.radnummer:
+                    liste.append( None )
+
+        if self.radnummer >= self.bolk:
+            self.__tombolk()
+
+    def resultat( self ):
+        """
+        Returnerer DataFrame eller Arrow-tabell med alle radene
+        """
+        self.__tombolk()
+        if self.format == 'pandas':
+            if not self.ferdige:
+                return pd.DataFrame()
+            if len( self.ferdige ) == 1:
+                return self.ferdige[0]
+            return pd.concat( self.ferdige, ignore_index=True, sort=False )
+
+        if not self.ferdige:
+            return pa.table( {} )
+        return _samletabeller( self.ferdige )
+
+    def __tombolk( self ):
+        """
+        Gjør om gjeldende bolk til DataFrame eller Arrow-tabell
+        """
+        if self.radnummer == 0:
+            return
+
+        if self.format == 'pandas':
+            self.ferdige.append( pd.DataFrame( { navn : _pandaskolonne( verdier, self.typer.get( navn ) )
+                                                    for navn, verdier in self.kolonner.items() } ) )
+        else:
+            self.ferdige.append( pa.table( { navn : _arrowkolonne( verdier, self.typer.get( navn ) )
+                                                    for navn, verdier in self.kolonner.items() } ) )
+        self.kolonner = {}
+        self.radnummer = 0
+
+
+_pandastyper = { HELTALL : 'Int64', FLYTTALL : 'float64', BOOLSK : 'boolean' }
+
+def _pandaskolonne( verdier, datatype ):
+    if datatype in _pandastyper:
+        try:
+            return pd.array( verdier, dtype=_pandastyper[datatype] )
+        except ( TypeError, ValueError ):
+            pass
+    return verdier
+
+
+def _arrowkolonne( verdier, datatype ):
+    arrowtype = { HELTALL : pa.int64(), FLYTTALL : pa.float64(), BOOLSK : pa.bool_(), TEKST : pa.string() }.get( datatype )
+    if any( isinstance( v, ( dict, list ) ) for v in verdier ):
+        verdier = [ json.dumps( v, ensure_ascii=False ) if isinstance( v, ( dict, list ) ) else v for v in verdier ]
+    try:
+        return pa.array( verdier, type=arrowtype )
+    except ( pa.ArrowInvalid, pa.ArrowTypeError, OverflowError ):
+        return pa.array( [ None if v is None else str( v ) for v in verdier ], type=pa.string() )
+
+
+def _samletabeller( tabeller ):
+    """
+    Slår sammen Arrow-tabeller. Kolonner som har fått ulik type i ulike bolker blir tekst
+    """
+    arrowtyper = {}
+    for tabell in tabeller:
+        for felt in tabell.schema:
+            if not pa.types.is_null( felt.type ):
+                arrowtyper.setdefault( felt.name, set() ).add( felt.type )
+
+    tekstkolonner = [ navn for navn, typer in arrowtyper.items() if len( typer ) > 1 ]
+    if tekstkolonner:
+        nye = []
+        for tabell in tabeller:
+            for navn in tekstkolonner:
+                if navn in tabell.column_names:
+                    indeks = tabell.column_names.index( navn )
+                    tabell = tabell.set_column( indeks, navn, tabell.column( navn ).cast( pa.string() ) )
+            nye.append( tabell )
+        tabeller = nye
+
+    if int( pa.__version__.split( '.' )[0] ) >= 14:
+        return pa.concat_tables( tabeller, promote_options='permissive' )
+    # Eldre pyarrow. Kolonner med ulik type er allerede gjort om til tekst, så vi trenger kun å fylle inn manglende kolonner
+    return pa.concat_tables( tabeller, promote=True )
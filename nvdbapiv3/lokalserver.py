@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Lokal erstatning for NVDB api LES, for testing og ytelsesmåling uten tilgang til nett
+
+lokalserver - Klasse som starter en enkel http-tjener (kun standardbiblioteket) i egen tråd. Tjeneren
+svarer på et utvalg av endepunktene til NVDB api LES, enten med syntetiske data eller med opptak laget
+med apiforbindelse.taopp (se opptak.py). Opptak har forrang, syntetiske data brukes når opptak mangler.
+
+Endepunkter med syntetiske data:
+    /status
+    /vegobjekttyper, /vegobjekttyper/<id>
+    /vegobjekter/<id> (med paginering via metadata.neste), /vegobjekter/<id>/<nvdbId>, /vegobjekter/<id>/statistikk
+    /vegobjekt?id=<nvdbId>
+    /vegnett/veglenkesekvenser/segmentert (med paginering), /vegnett/veglenkesekvenser/segmentert/<id>
+    /omrader/fylker, /omrader/kommuner
+
+Filtrene fylke og kommune virker, øvrige filtre ignoreres.
+
+Syntetiske data lages av funksjonene lagvegobjekt, lagvegnettsegment og lagobjekttype, som også kan brukes direkte.
+Samme argumenter gir alltid samme data.
+
+Eksempel:
+
+    from nvdbapiv3 import lokalserver, nvdbFagdata
+    with lokalserver.lokalserver( antall=10000 ) as tjener:
+        sok = nvdbFagdata( 45, miljo=tjener.url )
+        data = sok.to_records()
+
+Eller fra kommandolinja:
+    python -m nvdbapiv3.lokalserver --port 8080 --antall 100000 --opptak opptak_bomstasjoner
+
+"""
+import json
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+from .opptak import opptak
+
+FYLKER = [ 3, 11, 15, 18, 31, 32, 33, 34, 39, 40, 42, 46, 50, 55, 56 ]
+IDFAKTOR = 10**7            # nvdbId = objekttype * IDFAKTOR + løpenummer + 1
+SEGMENTLENGDE = 100         # Lengde (meter) på hvert syntetiske vegsegment
+DATAKATALOGVERSJON = '2.99-lokal'
+
+
+def lagobjekttype( objekttypeid ):
+    """
+    Lager syntetisk definisjon av objekttype (datakatalogen), med et lite utvalg egenskapstyper
+    """
+    return { 'id' : objekttypeid,
+             'navn' : 'Syntetisk objekttype ' + str( objekttypeid ),
+             'stedfesting' : 'LINJE',
+             'egenskapstyper' : [
+                { 'id' : 1, 'navn' : 'Navn', 'egenskapstype' : 'Tekst', 'datatype' : 'Tekst' },
+                { 'id' : 2, 'navn' : 'Antall', 'egenskapstype' : 'Tall', 'datatype' : 'Heltall' },
+                { 'id' : 3, 'navn' : 'Bredde', 'egenskapstype' : 'Tall', 'datatype' : 'Flyttall' },
+                { 'id' : 4, 'navn' : 'Dato', 'egenskapstype' : 'Dato', 'datatype' : 'Dato' },
+                { 'id' : 5, 'navn' : 'Type', 'egenskapstype' : 'Tekstenum', 'datatype' : 'FlerverdiAttributt, Tekst',
+                        'tillatte_verdier' : [ { 'id' : 51, 'verdi' : 'Enkel' }, { 'id' : 52, 'verdi' : 'Dobbel' } ] },
+                { 'id' : 6, 'navn' : 'Geometri, linje', 'egenskapstype' : 'Geometri', 'datatype' : 'GeomLinjeEllerKurve' }
+                ] }
+
+
+def _linje( x0, y0, punkter ):
+    return 'LINESTRING Z (' + ', '.join( '{0:.3f} {1:.3f} 10.000'.format( x0 + j * SEGMENTLENGDE / max( 1, punkter-1 ), y0 + (j % 2) )
+                                        for j in range( punkter ) ) + ')'
+
+
+def _vegsystemreferanse( lopenummer, fra, til ):
+    nummer = 1000 + lopenummer // 1000
+    kortform = 'KV{0} S1D1 m{1}-{2}'.format( nummer, fra, til )
+    return { 'vegsystem' : { 'id' : nummer, 'versjon' : 1, 'vegkategori' : 'K', 'fase' : 'V', 'nummer' : nummer },
+             'strekning' : { 'id' : nummer, 'versjon' : 1, 'strekning' : 1, 'delstrekning' : 1, 'arm' : False,
+                             'adskilte_løp' : 'Nei', 'trafikantgruppe' : 'K', 'retning' : 'MED',
+                             'fra_meter' : fra, 'til_meter' : til },
+             'kortform' : kortform }
+
+
+def lagvegnettsegment( lopenummer, punkter=5 ):
+    """
+    Lager syntetisk vegnettsegment på samme format som /vegnett/veglenkesekvenser/segmentert.
+    Hver veglenkesekvens har ett segment, med veglenkesekvensid = lopenummer + 1
+    """
+    veglenkesekvensid = lopenummer + 1
+    fylke = FYLKER[ lopenummer % len( FYLKER ) ]
+    fra = ( lopenummer % 1000 ) * SEGMENTLENGDE
+    x0, y0 = 100000 + ( lopenummer % 1000 ) * SEGMENTLENGDE, 6500000 + ( lopenummer // 1000 ) * 10
+    return { 'veglenkesekvensid' : veglenkesekvensid, 'veglenkenummer' : 1, 'segmentnummer' : 1,
+             'startposisjon' : 0.0, 'sluttposisjon' : 1.0, 'kortform' : '0-1@' + str( veglenkesekvensid ),
+             'type' : 'HOVED', 'detaljnivå' : 'Vegtrase og kjørebane', 'typeVeg' : 'Enkel bilveg', 'typeVeg_sosi' : 'enkelBilveg',
+             'målemetode' : 'Metrert', 'feltoversikt' : [ '1', '2' ],
+             'metadata' : { 'startdato' : '2020-01-01' },
+             'geometri' : { 'wkt' : _linje( x0, y0, punkter ), 'srid' : 5973, 'kvalitet' : { 'metode' : 'Fotogrammetrisk', 'nøyaktighet' : 30 },
+                            'datafangstdato' : '2019-06-01', 'temakode' : 7001, 'medium' : 'T' },
+             'lengde' : float( SEGMENTLENGDE ), 'fylke' : fylke, 'kommune' : fylke * 100 + 1,
+             'vegsystemreferanse' : _vegsystemreferanse( lopenummer, fra, fra + SEGMENTLENGDE ) }
+
+
+def lagvegobjekt( lopenummer, objekttypeid=45, punkter=5, antallSegmenter=1 ):
+    """
+    Lager syntetisk vegobjekt på samme format som /vegobjekter/<objekttypeid>?inkluder=alle
+
+    Keywords:
+        punkter : Antall punkt i hver geometri. Øk for å lage geometritunge data
+        antallSegmenter : Antall vegsegmenter per objekt
+    """
+    nvdbid = objekttypeid * IDFAKTOR + lopenummer + 1
+    fylke = FYLKER[ lopenummer % len( FYLKER ) ]
+    kommune = fylke * 100 + 1
+    segmenter = []
+    stedfestinger = []
+    for nr in range( antallSegmenter ):
+        seg = lagvegnettsegment( lopenummer * antallSegmenter + nr, punkter=punkter )
+        segmenter.append( { 'veglenkesekvensid' : seg['veglenkesekvensid'], 'startposisjon' : 0.0, 'sluttposisjon' : 1.0,
+                            'lengde' : seg['lengde'], 'detaljnivå' : seg['detaljnivå'], 'typeVeg' : seg['typeVeg'],
+                            'kommune' : kommune, 'fylke' : fylke, 'veglenkeType' : 'HOVED',
+                            'vegsystemreferanse' : seg['vegsystemreferanse'], 'geometri' : { 'wkt' : seg['geometri']['wkt'], 'srid' : 5973 } } )
+        stedfestinger.append( { 'type' : 'Linje', 'veglenkesekvensid' : seg['veglenkesekvensid'], 'startposisjon' : 0.0,
+                                'sluttposisjon' : 1.0, 'retning' : 'MED', 'kjørefelt' : [ '1' ],
+                                'kortform' : '0-1@' + str( seg['veglenkesekvensid'] ) } )
+
+    geometri = segmenter[0]['geometri']['wkt']
+    return { 'id' : nvdbid,
+             'href' : '/vegobjekter/{0}/{1}/1'.format( objekttypeid, nvdbid ),
+             'metadata' : { 'type' : { 'id' : objekttypeid, 'navn' : 'Syntetisk objekttype ' + str( objekttypeid ) },
+                            'versjon' : 1, 'startdato' : '2020-01-01', 'sist_modifisert' : '2020-01-01T12:00:00' },
+             'egenskaper' : [
+                { 'id' : 1, 'navn' : 'Navn', 'egenskapstype' : 'Tekst', 'datatype' : 'Tekst', 'verdi' : 'Objekt ' + str( nvdbid ) },
+                { 'id' : 2, 'navn' : 'Antall', 'egenskapstype' : 'Tall', 'datatype' : 'Heltall', 'verdi' : lopenummer % 17 },
+                { 'id' : 3, 'navn' : 'Bredde', 'egenskapstype' : 'Tall', 'datatype' : 'Flyttall', 'verdi' : 2.5 + ( lopenummer % 10 ) / 4 },
+                { 'id' : 4, 'navn' : 'Dato', 'egenskapstype' : 'Dato', 'datatype' : 'Dato', 'verdi' : '2020-01-01' },
+                { 'id' : 5, 'navn' : 'Type', 'egenskapstype' : 'Tekstenum', 'datatype' : 'FlerverdiAttributt, Tekst',
+                        'enum_id' : 51 + lopenummer % 2, 'verdi' : [ 'Enkel', 'Dobbel' ][ lopenummer % 2 ] },
+                { 'id' : 6, 'navn' : 'Geometri, linje', 'egenskapstype' : 'Geometri', 'datatype' : 'GeomLinjeEllerKurve', 'verdi' : geometri }
+                ],
+             'lokasjon' : { 'kommuner' : [ kommune ], 'fylker' : [ fylke ],
+                            'vegsystemreferanser' : [ { 'kortform' : s['vegsystemreferanse']['kortform'] } for s in segmenter ],
+                            'stedfestinger' : stedfestinger,
+                            'geometri' : { 'wkt' : geometri, 'srid' : 5973 },
+                            'lengde' : float( SEGMENTLENGDE * antallSegmenter ) },
+             'geometri' : { 'wkt' : geometri, 'srid' : 5973, 'egengeometri' : True },
+             'vegsegmenter' : segmenter,
+             'relasjoner' : { } }
+
+
+class lokalserver( ):
+    """
+    Lokal http-tjener som oppfører seg som (deler av) NVDB api LES
+    """
+
+    def __init__( self, port=0, antall=5000, punkter=5, antallSegmenter=1, opptakskatalog=None, vert='127.0.0.1' ):
+        """
+        Keywords:
+            port : int, 0 (default) = velg ledig port automatisk. Se lokalserver.url
+
+            antall : int, antall syntetiske objekter per objekttype (og antall vegnettsegmenter). Default 5000
+
+            punkter : int, antall punkt i hver syntetiske geometri. Default 5
+
+            antallSegmenter : int, antall vegsegmenter per syntetiske vegobjekt. Default 1
+
+            opptakskatalog : None eller katalog med opptak (se opptak.py) som vi svarer med når det finnes
+
+            vert : string, adresse vi lytter på. Default 127.0.0.1
+        """
+        self.antall = antall
+        self.punkter = punkter
+        self.antallSegmenter = antallSegmenter
+        self.opptak = opptak( opptakskatalog, modus='avspilling' ) if opptakskatalog else None
+        self.tjener = ThreadingHTTPServer( ( vert, port ), _handler )
+        self.tjener.lokalserver = self
+        self.url = 'http://{0}:{1}'.format( vert, self.tjener.server_port )
+        self.traad = None
+
+    def start( self ):
+        """
+        Starter tjeneren i egen tråd. Returnerer URL til tjeneren
+        """
+        self.traad = threading.Thread( target=self.tjener.serve_forever, daemon=True )
+        self.traad.start()
+        return self.url
+
+    def stopp( self ):
+        """
+        Stopper tjeneren
+        """
+        self.tjener.shutdown()
+        self.tjener.server_close()
+
+    def __enter__( self ):
+        self.start()
+        return self
+
+    def __exit__( self, *args ):
+        self.stopp()
+
+    def utvalg( self, parametre ):
+        """
+        Returnerer liste med løpenummer for syntetiske objekter som tilfredsstiller filtrene fylke og kommune
+        """
+        fylker = _heltall( parametre.get( 'fylke' ) )
+        kommuner = _heltall( parametre.get( 'kommune' ) )
+        if not fylker and not kommuner:
+            return range( self.antall )
+
+        gyldige = set( FYLKER )
+        if fylker:
+            gyldige &= set( fylker )
+        if kommuner:
+            gyldige &= set( [ k // 100 for k in kommuner if k % 100 == 1 ] )
+        return [ i for i in range( self.antall ) if FYLKER[ i % len( FYLKER ) ] in gyldige ]
+
+    def svar( self, sti, parametre ):
+        """
+        Lager syntetisk svar for sti og spørreparametre. Returnerer tuple ( statuskode, data )
+        """
+        deler = [ x for x in sti.split( '/' ) if x ]
+
+        if deler == [ 'status' ]:
+            return ( 200, { 'datagrunnlag' : { 'datakatalog' : { 'id' : 0, 'versjon' : DATAKATALOGVERSJON } } } )
+
+        if deler == [ 'vegobjekttyper' ]:
+            return ( 200, [ lagobjekttype( x ) for x in ( 45, 105, 581 ) ] )
+
+        if len( deler ) == 2 and deler[0] == 'vegobjekttyper' and deler[1].isdigit():
+            return ( 200, lagobjekttype( int( deler[1] ) ) )
+
+        if len( deler ) == 2 and deler[0] == 'omrader' and deler[1] in [ 'fylker', 'kommuner' ]:
+            if deler[1] == 'fylker':
+                return ( 200, [ { 'nummer' : f, 'navn' : 'Fylke ' + str( f ) } for f in FYLKER ] )
+            return ( 200, [ { 'nummer' : f * 100 + 1, 'navn' : 'Kommune ' + str( f * 100 + 1 ), 'fylke' : f } for f in FYLKER ] )
+
+        if deler == [ 'vegobjekt' ] and 'id' in parametre:
+            nvdbid = int( parametre['id'] )
+            objekttype, lopenummer = divmod( nvdbid - 1, IDFAKTOR )
+            if lopenummer >= self.antall:
+                return ( 404, { 'message' : 'Fant ikke vegobjekt ' + str( nvdbid ) } )
+            return ( 200, { 'id' : nvdbid, 'href' : self.url + '/vegobjekter/{0}/{1}'.format( objekttype, nvdbid ) } )
+
+        if len( deler ) == 3 and deler[0] == 'vegobjekter' and deler[2] == 'statistikk':
+            antall = len( self.utvalg( parametre ) )
+            return ( 200, { 'antall' : antall, 'lengde' : antall * SEGMENTLENGDE * self.antallSegmenter } )
+
+        if len( deler ) in [ 3, 4 ] and deler[0] == 'vegobjekter' and deler[2].isdigit():
+            objekttype, lopenummer = divmod( int( deler[2] ) - 1, IDFAKTOR )
+            if objekttype != int( deler[1] ) or lopenummer >= self.antall:
+                return ( 404, { 'message' : 'Fant ikke vegobjekt ' + deler[2] } )
+            return ( 200, lagvegobjekt( lopenummer, objekttypeid=objekttype, punkter=self.punkter, antallSegmenter=self.antallSegmenter ) )
+
+        if len( deler ) == 2 and deler[0] == 'vegobjekter' and deler[1].isdigit():
+            objekttype = int( deler[1] )
+            return self.__side( sti, parametre, lambda i : lagvegobjekt( i, objekttypeid=objekttype, punkter=self.punkter,
+                                                                        antallSegmenter=self.antallSegmenter ) )
+
+        if deler == [ 'vegnett', 'veglenkesekvenser', 'segmentert' ]:
+            return self.__side( sti, parametre, lambda i : lagvegnettsegment( i, punkter=self.punkter ) )
+
+        if len( deler ) == 4 and deler[:3] == [ 'vegnett', 'veglenkesekvenser', 'segmentert' ] and deler[3].isdigit():
+            lopenummer = int( deler[3] ) - 1
+            if lopenummer < 0 or lopenummer >= self.antall:
+                return ( 404, { 'message' : 'Fant ikke veglenkesekvens ' + deler[3] } )
+            return ( 200, [ lagvegnettsegment( lopenummer, punkter=self.punkter ) ] )
+
+        return ( 404, { 'message' : 'Endepunktet ' + sti + ' finnes ikke i lokalserver' } )
+
+    def __side( self, sti, parametre, lagobjekt ):
+        """
+        Lager en side med objekter, med paginering via metadata.neste
+        """
+        utvalg = self.utvalg( parametre )
+        antall = int( parametre.get( 'antall', 1000 ) )
+        start = int( parametre.get( 'start', 0 ) )
+        objekter = [ lagobjekt( i ) for i in utvalg[start:start+antall] ]
+
+        nesteparametre = { k : v for k, v in parametre.items() if k != 'start' }
+        nesteparametre['start'] = start + len( objekter )
+        return ( 200, { 'objekter' : objekter,
+                        'metadata' : { 'antall' : len( utvalg ), 'returnert' : len( objekter ), 'sidestørrelse' : antall,
+                                        'neste' : { 'start' : str( nesteparametre['start'] ),
+                                                    'href' : self.url + sti + '?' + urlencode( nesteparametre ) } } } )
+
+
+class _handler( BaseHTTPRequestHandler ):
+
+    def log_message( self, *args ):
+        pass
+
+    def do_GET( self ):
+        tjener = self.server.lokalserver
+        if tjener.opptak:
+            data = tjener.opptak.hent( tjener.opptak.lagnokkel( self.path, headers=dict( self.headers.items() ) ) )
+            if data:
+                innhold = data['innhold']
+                # Lenker (f.eks metadata.neste.href) skal peke til oss, ikke til tjeneren vi tok opp fra
+                deler = urlsplit( data['url'] )
+                if deler.netloc:
+                    innhold = innhold.replace( '{0}://{1}'.format( deler.scheme, deler.netloc ).encode( 'utf-8' ), tjener.url.encode( 'utf-8' ) )
+                return self.__send( data['status'], innhold, data['headers'].get( 'Content-Type', 'application/json' ) )
+
+        deler = urlsplit( self.path )
+        parametre = { k : ','.join( v ) for k, v in parse_qs( deler.query ).items() }
+        status, data = tjener.svar( deler.path, parametre )
+        self.__send( status, json.dumps( data, ensure_ascii=False ).encode( 'utf-8' ), 'application/json; charset=utf-8' )
+
+    def __send( self, status, innhold, innholdstype ):
+        self.send_response( status )
+        self.send_header( 'Content-Type', innholdstype )
+        self.send_header( 'Content-Length', str( len( innhold ) ) )
+        self.end_headers()
+        self.wfile.write( innhold )
+
+
+def _heltall( tekst ):
+    if not tekst:
+        return []
+    return [ int( x ) for x in re.split( r'[,\s]+', str( tekst ) ) if x.strip().lstrip( '-' ).isdigit() ]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser( description='Lokal erstatning for NVDB api LES' )
+    parser.add_argument( '--port', type=int, default=8080 )
+    parser.add_argument( '--antall', type=int, default=5000, help='Antall syntetiske objekter per objekttype' )
+    parser.add_argument( '--punkter', type=int, default=5, help='Antall punkt per syntetiske geometri' )
+    parser.add_argument( '--opptak', default=None, help='Katalog med opptak (se opptak.py)' )
+    args = parser.parse_args()
+
+    tjener = lokalserver( port=args.port, antall=args.antall, punkter=args.punkter, opptakskatalog=args.opptak )
+    print( 'Lokal NVDB api LES på', tjener.start() )
+    try:
+        while True:
+            time.sleep( 3600 )
+    except KeyboardInterrupt:
+        tjener.stopp()
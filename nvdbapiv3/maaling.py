@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Måling av tidsbruk og tellere for nedlasting og behandling av data fra NVDB api
+
+maaling - Klasse som samler tidsbruk per trinn (nettverk, JSON-dekoding, nvdbfagdata2records m.m.), tid og
+antall bytes per kall mot NVDB api, nye forsøk og antall objekter. Hører til en apiforbindelse, og deles
+dermed av alle søkeobjekter, tråder og kloner som bruker samme forbindelse. Slås på med apiforbindelse.maal()
+eller søkeobjekt.maal()
+
+Med oppsummering() og rapport() ser du om en treg jobb venter på nettverket eller bruker CPU på å
+behandle data. Lyttere (funksjoner) får beskjed om hver enkelt hendelse, f.eks for logging eller for å sende
+data videre til OpenTelemetry, Prometheus el.l. Med parallelle tråder (f.eks to_records_parallell) kan summen
+av tidsbruk per trinn bli større enn totaltiden. Ved strømming (nvdbVegnett.stromming) måler vi kun tiden til
+http headerne for hvert kall, nedlasting og JSON-tolkning havner under 'annet'.
+
+Hendelser som sendes til lyttere, med nøkkelord:
+    'anrop'   : url, status, sekunder, antallBytes, kilde ('nett', 'mellomlager' eller 'opptak')
+    'nyeforsok' : forsok, statuskode (None ved brudd på forbindelsen), ventetid
+    Trinn målt med spenn(), f.eks 'dekoding', 'nvdbfagdata2records' : sekunder, pluss evt nøkkelord til spenn()
+
+Eksempel:
+
+    sok = nvdbFagdata( 45 )
+    sok.maal( lytter=lambda hendelse, data : print( hendelse, data ) if hendelse == 'anrop' else None )
+    data = sok.to_records()     # Skriver rapport når den er ferdig
+    print( sok.forbindelse.maaling.oppsummering() )
+
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class maaling( ):
+    """
+    Samler tidsbruk per trinn, kall mot NVDB api og tellere. Trådsikker
+    """
+
+    def __init__( self, lytter=None ):
+        """
+        Arguments:
+            None
+
+        Keywords:
+            lytter : None eller funksjon lytter( hendelse, data ) som kalles for hver hendelse, se lytt()
+        """
+        self.laas = threading.Lock()
+        self.lyttere = []
+        if lytter:
+            self.lytt( lytter )
+        self.nullstill()
+
+    def nullstill( self ):
+        """
+        Nullstiller alle målinger
+        """
+        with self.laas:
+            self.start = time.perf_counter()
+            self.trinn = {}         # navn => [ antall, sekunder ]
+            self.tellere = {}       # navn => antall
+            self.anropstider = []   # sekunder per kall mot NVDB api (uten mellomlager og opptak)
+            self.antallBytes = 0
+            self.kilder = {}        # kilde => antall kall
+
+    def lytt( self, lytter ):
+        """
+        Legger til lytter, dvs en funksjon lytter( hendelse, data ) der hendelse er tekst og data er dictionary
+        """
+        self.lyttere.append( lytter )
+
+    def hendelse( self, hendelse, **data ):
+        """
+        Sender hendelse til alle lyttere
+        """
+        for lytter in self.lyttere:
+            lytter( hendelse, data )
+
+    def registrer( self, navn, sekunder, **data ):
+        """
+        Legger til tidsbruk (sekunder) for trinnet navn
+        """
+        with self.laas:
+            trinn = self.trinn.setdefault( navn, [ 0, 0.0 ] )
+            trinn[0] += 1
+            trinn[1] += sekunder
+        if self.lyttere:
+            self.hendelse( navn, sekunder=sekunder, **data )
+
+    @contextmanager
+    def spenn( self, navn, **data ):
+        """
+        Måler tidsbruk for trinnet navn, bruk with maaling.spenn( 'navn' ): ...
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrer( navn, time.perf_counter() - t0, **data )
+
+    def tell( self, navn, antall=1, **data ):
+        """
+        Teller opp telleren navn. Nøkkelord sendes til lyttere sammen med hendelsen navn
+        """
+        with self.laas:
+            self.tellere[navn] = self.tellere.get( navn, 0 ) + antall
+        if self.lyttere:
+            self.hendelse( navn, antall=antall, **data )
+
+    def anrop( self, url, status, sekunder, antallBytes=0, kilde='nett' ):
+        """
+        Registrerer et kall mot NVDB api (evt svar fra mellomlager eller opptak)
+        """
+        with self.laas:
+            self.kilder[kilde] = self.kilder.get( kilde, 0 ) + 1
+            self.antallBytes += antallBytes
+            if kilde == 'nett':
+                self.anropstider.append( sekunder )
+            trinn = self.trinn.setdefault( 'nettverk', [ 0, 0.0 ] )
+            trinn[0] += 1
+            trinn[1] += sekunder
+        if self.lyttere:
+            self.hendelse( 'anrop', url=url, status=status, sekunder=sekunder, antallBytes=antallBytes, kilde=kilde )
+
+    def oppsummering( self, totaltid=None ):
+        """
+        Returnerer dictionary med oppsummering av målingene
+
+        Keywords:
+            totaltid : sekunder, tidsbruken vi skal fordele på trinnene. Default = tid siden start (evt nullstill)
+
+        Returns:
+            dictionary med totaltid, tidsbruk og andel per trinn (pluss 'annet' = det vi ikke har målt),
+            statistikk for kall mot NVDB api, antall bytes, tellere og objekter per sekund
+        """
+        with self.laas:
+            if totaltid is None:
+                totaltid = time.perf_counter() - self.start
+            trinn = { navn : { 'antall' : v[0], 'sekunder' : round( v[1], 3 ),
+                               'andel' : round( v[1] / totaltid, 3 ) if totaltid > 0 else None }
+                        for navn, v in self.trinn.items() }
+            tider = sorted( self.anropstider )
+            tellere = dict( self.tellere )
+            antallBytes = self.antallBytes
+            kilder = dict( self.kilder )
+
+        annet = totaltid - sum( v['sekunder'] for v in trinn.values() )
+        anrop = { 'antall' : sum( kilder.values() ), 'kilder' : kilder }
+        if tider:
+            anrop.update( { 'snitt' : round( sum( tider ) / len( tider ), 4 ), 'median' : round( tider[len( tider ) // 2], 4 ),
+                            'p95' : round( tider[ min( len( tider )-1, int( 0.95 * len( tider ) ) ) ], 4 ), 'maks' : round( tider[-1], 4 ) } )
+
+        resultat = { 'totaltid' : round( totaltid, 3 ), 'trinn' : trinn,
+                     'annet' : round( max( 0, annet ), 3 ), 'anrop' : anrop,
+                     'antallBytes' : antallBytes, 'tellere' : tellere }
+        if 'objekter' in tellere and totaltid > 0:
+            resultat['objekterPerSekund'] = round( tellere['objekter'] / totaltid, 1 )
+        return resultat
+
+    def rapport( self, totaltid=None ):
+        """
+        Returnerer oppsummeringen som lesbar tekst, se oppsummering()
+        """
+        opp = self.oppsummering( totaltid=totaltid )
+        linjer = [ 'Tidsbruk {0:.1f} sekunder'.format( opp['totaltid'] ) ]
+        for navn, v in sorted( opp['trinn'].items(), key=lambda x : -x[1]['sekunder'] ):
+            linjer.append( '    {0:<22} {1:>9.2f} s {2:>6.1%} ({3} ganger)'.format( navn, v['sekunder'], v['andel'] or 0, v['antall'] ) )
+        linjer.append( '    {0:<22} {1:>9.2f} s'.format( 'annet', opp['annet'] ) )
+
+        anrop = opp['anrop']
+        tekst = 'Kall mot NVDB api: {0} ({1})'.format( anrop['antall'], ', '.join( k + '=' + str( v ) for k, v in anrop['kilder'].items() ) )
+        if 'snitt' in anrop:
+            tekst += ', snitt {0:.3f} s, median {1:.3f} s, p95 {2:.3f} s'.format( anrop['snitt'], anrop['median'], anrop['p95'] )
+        linjer.append( tekst )
+        linjer.append( 'Lastet ned {0:.1f} MB'.format( opp['antallBytes'] / 1024**2 ) )
+        for navn, antall in opp['tellere'].items():
+            linjer.append( '{0}: {1}'.format( navn, antall ) )
+        if 'objekterPerSekund' in opp:
+            linjer.append( '{0} objekter per sekund'.format( opp['objekterPerSekund'] ) )
+        return '\n'.join( linjer )
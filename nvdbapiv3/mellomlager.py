@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Mellomlager (cache) for http-responser fra NVDB api LES, lagret i en SQLite-fil på disk
+
+mellomlager - Klasse som tar vare på responser fra apiforbindelse.les, slik at gjentatte kjøringer
+med samme søk (f.eks rapportene i spesialrapporter.py) ikke laster ned de samme dataene på ny.
+
+    * Nøkkel er URL, spørreparametre (sortert) og http headeren Accept (+ evt innlogging), uansett store/små bokstaver i headernavn
+    * Levetid (TTL): Responser som er yngre enn levetid sekunder brukes direkte
+    * Eldre responser revalideres med betinget GET (If-None-Match / If-Modified-Since) der
+      NVDB api har gitt oss ETag eller Last-Modified. Svar 304 Not Modified => vi bruker lagret respons
+    * Størrelsesbegrensning: Når lagrede data overstiger maksstorrelse bytes så kastes de responsene
+      som har vært ubrukt lengst (LRU)
+
+Ta i bruk via apiforbindelse:
+
+    forb = apiforbindelse()
+    forb.mellomlagring( 'nvdbapi_mellomlager.sqlite', levetid=3600 )
+
+Eller via søkeobjekt:
+
+    sok = nvdbFagdata( 45 )
+    sok.forbindelse.mellomlagring( levetid=24*3600 )
+
+Alle objekter med metodene lagnokkel, hent, betingelser, lagre og forny kan brukes som mellomlager,
+sett i så fall apiforbindelse.mellomlager = <ditt objekt>
+
+"""
+import sqlite3
+import threading
+import hashlib
+import json
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .jsondekoder import dekodjson, JSONDecodeError
+
+
+class mellomlager( ):
+    """
+    Mellomlager for http-responser, lagret i SQLite
+    """
+
+    def __init__( self, filnavn='nvdbapi_mellomlager.sqlite', levetid=3600, maksstorrelse=500*1024*1024 ):
+        """
+        Oppretter (evt åpner eksisterende) mellomlager
+
+        Arguments:
+            None
+
+        Keywords:
+            filnavn : string, navn på SQLite-fil. Bruk ':memory:' for mellomlager som kun lever i minnet
+
+            levetid : int, antall sekunder en lagret respons brukes uten å spørre NVDB api på nytt.
+                      Etter dette revalideres responsen med betinget GET (hvis mulig)
+
+            maksstorrelse : int, maksimal størrelse (bytes) på lagrede responser. Default 500 MB
+        """
+        self.filnavn = filnavn
+        self.levetid = levetid
+        self.maksstorrelse = maksstorrelse
+        self.treff = 0
+        self.bom = 0
+        self.revalidert = 0
+        self.laas = threading.Lock()
+        self.db = sqlite3.connect( filnavn, check_same_thread=False )
+        self.db.execute( """CREATE TABLE IF NOT EXISTS respons (
+                                nokkel TEXT PRIMARY KEY,
+                                url TEXT,
+                                status INTEGER,
+                                headers TEXT,
+                                innhold BLOB,
+                                etag TEXT,
+                                sistendret TEXT,
+                                lagret REAL,
+                                sistbrukt REAL,
+                                storrelse INTEGER )""" )
+        self.db.execute( "CREATE INDEX IF NOT EXISTS respons_sistbrukt ON respons( sistbrukt )")
+        self.db.commit()
+
+    @staticmethod
+    def lagnokkel( url, params=None, headers=None ):
+        """
+        Lager nøkkel for mellomlagring ut fra URL, spørreparametre og http headere Accept og Authorization
+
+        Vi tar med Authorization fordi innloggede brukere kan få se mer data enn andre. Navn på headere
+        skiller ikke mellom store og små bokstaver, se headerverdi
+        """
+        params = params or {}
+        parametre = sorted( [ (str(k), str(v)) for k, v in params.items() if v is not None ] )
+        nokkel = json.dumps( [ url, parametre, headerverdi( headers, 'Accept' ), headerverdi( headers, 'Authorization' ) ] )
+        return hashlib.sha256( nokkel.encode( 'utf-8') ).hexdigest()
+
+    def hent( self, nokkel ):
+        """
+        Henter lagret respons
+
+        Returns:
+            None, eller tuple ( requests.Response, fersk ) der fersk=True betyr at responsen er yngre enn levetid
+        """
+        with self.laas:
+            rad = self.db.execute( """SELECT url, status, headers, innhold, lagret FROM respons
+                                    WHERE nokkel = ?""", (nokkel,) ).fetchone()
+        if not rad:
+            self.bom += 1
+            return None
+
+        url, status, headers, innhold, lagret = rad
+        fersk = time.time() - lagret < self.levetid
+        if fersk:
+            self.treff += 1
+        return ( lagrespons( url, status, json.loads( headers ), innhold ), fersk )
+
+    def betingelser( self, nokkel ):
+        """
+        Returnerer dictionary med http headere for betinget GET (If-None-Match, If-Modified-Since), evt tom dictionary
+        """
+        with self.laas:
+            rad = self.db.execute( "SELECT etag, sistendret FROM respons WHERE nokkel = ?", (nokkel,) ).fetchone()
+
+        headers = {}
+        if rad and rad[0]:
+            headers['If-None-Match'] = rad[0]
+        if rad and rad[1]:
+            headers['If-Modified-Since'] = rad[1]
+        return headers
+
+    def lagre( self, nokkel, r ):
+        """
+        Lagrer respons (requests.Response) og rydder hvis vi har overskredet maksstorrelse
+
+        JSON-responser som ikke lar seg dekode lagres ikke, slik at nye forsøk (hikke fra NVDB api) går mot NVDB api
+        og ikke får den samme ødelagte responsen fra mellomlageret.
+        """
+        innhold = r.content
+        if len( innhold ) > self.maksstorrelse:
+            return
+
+        if 'json' in r.headers.get( 'Content-Type', 'json' ).lower():
+            try:
+                dekodjson( innhold )
+            except ( JSONDecodeError, ValueError ):
+                return
+
+        naa = time.time()
+        with self.laas:
+            self.db.execute( "INSERT OR REPLACE INTO respons VALUES (?,?,?,?,?,?,?,?,?,?)",
+                            ( nokkel, r.url, r.status_code, json.dumps( dict( r.headers ) ), innhold,
+                              r.headers.get( 'ETag' ), r.headers.get( 'Last-Modified' ), naa, naa, len( innhold ) ) )
+            self.__rydd()
+            self.db.commit()
+
+    def forny( self, nokkel, fornyLevetid=True ):
+        """
+        Oppdaterer tidspunkt for sist brukt (LRU), og evt tidspunkt for lagring (når responsen er revalidert med 304)
+        """
+        naa = time.time()
+        if fornyLevetid:
+            self.revalidert += 1
+        with self.laas:
+            if fornyLevetid:
+                self.db.execute( "UPDATE respons SET sistbrukt = ?, lagret = ? WHERE nokkel = ?", (naa, naa, nokkel) )
+            else:
+                self.db.execute( "UPDATE respons SET sistbrukt = ? WHERE nokkel = ?", (naa, nokkel) )
+            self.db.commit()
+
+    def tom( self ):
+        """
+        Sletter alle lagrede responser
+        """
+        with self.laas:
+            self.db.execute( "DELETE FROM respons" )
+            self.db.commit()
+            self.db.execute( "VACUUM" )
+
+    def statistikk( self ):
+        """
+        Returnerer dictionary med antall lagrede responser, størrelse og treff/bom i denne sesjonen
+        """
+        with self.laas:
+            antall, storrelse = self.db.execute( "SELECT count(*), coalesce( sum( storrelse ), 0) FROM respons" ).fetchone()
+        return { 'antall' : antall, 'storrelse' : storrelse, 'treff' : self.treff,
+                'bom' : self.bom, 'revalidert' : self.revalidert }
+
+    def lukk( self ):
+        """
+        Lukker databaseforbindelsen
+        """
+        with self.laas:
+            self.db.close()
+
+    def __rydd( self ):
+        """
+        Kaster de minst nylig brukte responsene til total størrelse er under maksstorrelse.
+        Forutsetter at vi allerede har låst databasen (self.laas)
+        """
+        storrelse = self.db.execute( "SELECT coalesce( sum( storrelse ), 0) FROM respons" ).fetchone()[0]
+        if storrelse <= self.maksstorrelse:
+            return
+
+        slett = []
+        for nokkel, str_rad in self.db.execute( "SELECT nokkel, storrelse FROM respons ORDER BY sistbrukt ASC" ):
+            if storrelse <= self.maksstorrelse:
+                break
+            slett.append( (nokkel,) )
+            storrelse -= str_rad
+
+        self.db.executemany( "DELETE FROM respons WHERE nokkel = ?", slett )
+
+
+def headerverdi( headers, navn ):
+    """
+    Returnerer verdien av http headeren navn, uten å skille mellom store og små bokstaver. Tom tekst hvis den mangler
+
+    apiforbindelse.les slår sammen headere fra apiforbindelse og søkeobjekt, og da kan f.eks både Accept og accept
+    finnes. Det er den siste som blir sendt (requests), og derfor også den siste vi bruker.
+    """
+    verdi = ''
+    for nokkel, v in ( headers or {} ).items():
+        if str( nokkel ).lower() == navn.lower():
+            verdi = v
+    return verdi
+
+
+def lagrespons( url, status, headers, innhold ):
+    """
+    Gjenoppretter requests.Response - objekt fra lagrede data
+    """
+    r = requests.models.Response()
+    r.url = url
+    r.status_code = status
+    r.headers = CaseInsensitiveDict( headers )
+    r._content = innhold
+    r._content_consumed = True  # Slik at iter_content (stream=True) gir oss det lagrede innholdet
+    r.encoding = requests.utils.get_encoding_from_headers( r.headers ) or 'utf-8'
+    r.fra_mellomlager = True
+    return r
@@ -9,7 +9,12 @@ Har disse hjelpefunksjonene:
     - finnid: Henter vegobjekt og/eller lenkesekvens med angitt ID
     - nvdbfagdata2records: Flater ut NVDB-vegobjekt (direkte fra NVDB api) til enklere (forutsigbar) dictionary-struktur
     - egenskaper2records: Oversetter liste med egenskapverdier til dictionary 
+    - egenskapsuttrekker: Kompilert utgave av egenskaper2records for én objekttype (raskere for store datamengder)
     - vegrefpunkt: Slår opp på et punkt på vegnettet
+    - omrader: Henter liste med fylker, kommuner, kontraktsområder m.m.
+    - fra_sjekkpunkt: Lager søkeobjekt som fortsetter fra et sjekkpunkt (se nvdbVegnett.sjekkpunkt og to_jsonl)
+
+Definisjoner fra datakatalogen mellomlagres på tvers av søkeobjekter, se datakatalog.py
 
 Sjekk README.md for detaljer, og https://github.com/LtGlahn/nvdbapi-V3/issues for kjente feil og mangler. 
 
@@ -19,15 +24,23 @@ import json
 import requests
 from warnings import warn
 import os
-from copy import deepcopy
-from time import sleep
+from copy import deepcopy, copy
 # import pdb
 from datetime import datetime
 import dateutil.parser
 import re
 from json import JSONDecodeError
+import threading
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 from . import apiforbindelse
+from . import apiforbindelse_async
+from . import datakatalog
+from . import kolonner
+from . import jsonstrom
+from .jsondekoder import dekodjson
 import nvdbapiv3
 
 # Uncomment to silent those unverified https-request warnings
@@ -61,7 +74,7 @@ class nvdbVegnett:
     """
     
     
-    def __init__( self, miljo=None, debug=False, filter=None ):
+    def __init__( self, miljo=None, debug=False, filter=None, forbindelse=None ):
         
         
         self.filterdata = {}
@@ -82,7 +95,9 @@ class nvdbVegnett:
                                                                 # 
                             'meredata'              : True,     # Gjetning på om vi kan hente mere data
                             'initielt'              : True,     # Initiell ladning av datasett
-                            'dummy'                 : False     # Jukse-bruk av paginering 
+                            'dummy'                 : False,    # Jukse-bruk av paginering 
+                            'forhandshenting'       : 0,        # Antall sider vi henter på forhånd i egen tråd (0=av)
+                            'strom'                 : False     # Strømmende JSON-tolkning av hver side, se stromming()
                     } 
     
 
@@ -91,10 +106,10 @@ class nvdbVegnett:
         self.respons  = { }
         
         self.data = { 'objekter' : []}
-        self.forbindelse = apiforbindelse.apiforbindelse()
-        if not miljo:
-            miljo = 'prod'
-        self.miljo( miljo)
+        self.sidebuffer = None      # Kø med forhåndshentede sider, se forhandshenting()
+        self.sidestopp = None       # Signal som stopper tråden for forhåndshenting
+        self.strom = None           # Gjeldende side ved strømmende JSON-tolkning, se stromming()
+        self._brukforbindelse( forbindelse, miljo )
 
         self.debug = debug
 
@@ -154,27 +169,22 @@ class nvdbVegnett:
                 return self.data['objekter'][self.paginering['hvilken']-1]
             else: 
                 return None
+
+        elif self.paginering['strom']: 
+            return self.__nestestrom()
              
         elif self.paginering['initielt']: 
         
-            if isinstance( self, nvdbFagdata): 
-                parametre = merge_dicts(  self.filterdata, self.respons )
-                self.data = self.anrope( '/'.join(('vegobjekter', str(self.objektTypeId) )), 
-                    parametre=parametre ) 
-                self.antall = self.data['metadata']['antall']
-
-            elif isinstance( self, nvdbNoder ): 
-                parametre = self.filterdata
-                self.data = self.anrope( 'vegnett/noder', parametre=parametre )
-
-            elif isinstance( self, nvdbVegnett): 
-                parametre = self.filterdata
-                self.data = self.anrope( 'vegnett/veglenkesekvenser/segmentert', parametre=parametre )
+            (sti, parametre) = self.sokeanrop()
+            self.data = self.anrope( sti, parametre=parametre )
+            if not isinstance( self, nvdbNoder ): 
                 self.antall = self.data['metadata']['antall']
 
             self.paginering['initielt'] = False
 
             if self.data['metadata']['returnert'] > 0: 
+                if self.paginering['forhandshenting'] > 0: 
+                    self.__startforhandshenting( self.data['metadata']['neste']['href'] )
                 self.paginering['hvilken'] = 1
                 self.paginering['antallObjektReturnert'] += 1 
                 return self.data['objekter'][0]
@@ -183,7 +193,7 @@ class nvdbVegnett:
                 return None
                 
         elif self.paginering['meredata'] and self.paginering['hvilken'] > antObjLokalt-1: 
-            self.data = self.anrope( self.data['metadata']['neste']['href'] ) 
+            self.data = self.nesteside( ) 
             self.paginering['hvilken'] = 1
             
             if self.data['metadata']['returnert'] > 0: 
@@ -199,6 +209,474 @@ class nvdbVegnett:
             self.paginering['antallObjektReturnert'] += 1 
             return self.data['objekter'][self.paginering['hvilken']-1]
         
+    def iter_pages( self ): 
+        """
+        Generator som gir deg hele sider med data fra NVDB api, dvs listen med objekter fra hver respons
+
+        Raskere enn nesteForekomst for deg som behandler en hel side av gangen (pandas, Arrow, databaser), fordi 
+        vi slipper å slå opp i pagineringsinformasjonen for hvert eneste objekt. Bruker samme paginering som 
+        nesteForekomst, så har du allerede hentet noen objekter med nesteForekomst så får du resten av gjeldende side 
+        først. Forhåndshenting virker som før. Med strømming (se stromming()) samler vi opp objektene i lister med 
+        inntil paginering['antall'] objekter. 
+
+        EKSEMPEL
+            for objekter in sok.iter_pages(): 
+                print( len( objekter ) )
+
+        ARGUMENTS
+            None
+
+        KEYWORDS
+            None 
+
+        RETURNS
+            generator som gir deg lister med objekter (dictionary) fra NVDB api 
+        """
+        if isinstance( self, nvdbFagdata) and not self.objektTypeId: 
+            raise ValueError( 'ObjektTypeID mangler.' )
+
+        if self.paginering['dummy'] or self.paginering['strom']: 
+            yield from delibolker( iter( self.nesteForekomst, None ), self.paginering['antall'] )
+            return 
+
+        if self.paginering['initielt']: 
+            (sti, parametre) = self.sokeanrop()
+            self.data = self.anrope( sti, parametre=parametre )
+            if not isinstance( self, nvdbNoder ): 
+                self.antall = self.data['metadata']['antall']
+
+            self.paginering['initielt'] = False
+            self.paginering['hvilken'] = 0 
+            if self.data['metadata']['returnert'] > 0 and self.paginering['forhandshenting'] > 0: 
+                self.__startforhandshenting( self.data['metadata']['neste']['href'] )
+
+        while True: 
+            objekter = self.data['objekter']
+            if self.paginering['hvilken'] > 0: 
+                objekter = objekter[self.paginering['hvilken']:]
+            self.paginering['hvilken'] = len( self.data['objekter'] )
+            self.paginering['antallObjektReturnert'] += len( objekter )
+            if len( objekter ) > 0: 
+                yield objekter 
+
+            if not self.paginering['meredata'] or self.data['metadata']['returnert'] == 0: 
+                self.paginering['meredata'] = False
+                return 
+
+            self.data = self.nesteside( ) 
+            self.paginering['hvilken'] = 0
+
+    def iter_batches( self, bolk ): 
+        """
+        Som iter_pages, men gir deg lister med nøyaktig bolk objekter (bortsett fra den siste, som kan være kortere)
+
+        ARGUMENTS
+            bolk : int, antall objekter per liste 
+
+        KEYWORDS
+            None 
+
+        RETURNS
+            generator som gir deg lister med objekter (dictionary) fra NVDB api 
+        """
+        rest = []
+        for objekter in self.iter_pages(): 
+            if rest: 
+                objekter = rest + objekter 
+            start = 0 
+            while len( objekter ) - start >= bolk: 
+                yield objekter[start:start+bolk]
+                start += bolk 
+            rest = objekter[start:]
+
+        if rest: 
+            yield rest 
+
+    def sjekkpunkt( self ): 
+        """
+        Returnerer dictionary med pagineringstilstand (lenke til neste side), filter og miljø for dette søket
+
+        Sjekkpunktet gjelder for siste side vi har hentet fra NVDB api, dvs at alle objektene på gjeldende side 
+        regnes som ferdig behandlet. Bruk sammen med iter_pages(), der du tar sjekkpunkt etter at du er ferdig 
+        med hver side. Søket fortsetter fra sjekkpunktet med gjenoppta() eller funksjonen fra_sjekkpunkt(). 
+        Brukes av to_jsonl 
+
+        ARGUMENTS
+            None
+
+        KEYWORDS
+            None 
+
+        RETURNS
+            dictionary som kan lagres som JSON
+        """
+        if self.paginering['strom'] or self.paginering['dummy']: 
+            raise ValueError( 'Sjekkpunkt virker ikke med strømming eller med data du har dyttet inn selv' )
+
+        if self.paginering['initielt']: 
+            neste = None 
+            ferdig = False 
+        else: 
+            ferdig = not self.paginering['meredata'] or self.data['metadata']['returnert'] == 0 
+            neste = None if ferdig else self.data['metadata']['neste']['href']
+
+        return { 'sokeobjekt'   : self.__class__.__name__, 
+                 'objekttype'   : getattr( self, 'objektTypeId', None ), 
+                 'miljo'        : self.apiurl, 
+                 'filter'       : self.filterdata, 
+                 'respons'      : self.respons, 
+                 'neste'        : neste, 
+                 'ferdig'       : ferdig, 
+                 'antallObjektReturnert' : self.paginering['antallObjektReturnert'], 
+                 'tidspunkt'    : datetime.now().isoformat() }
+
+    def gjenoppta( self, sjekkpunkt ): 
+        """
+        Fortsetter søket fra et sjekkpunkt, se sjekkpunkt(). Neste side vi henter er den første etter sjekkpunktet
+
+        ARGUMENTS
+            sjekkpunkt : dictionary fra sjekkpunkt() 
+
+        KEYWORDS
+            None 
+
+        RETURNS
+            None 
+        """
+        self.refresh()
+        self.paginering['antallObjektReturnert'] = sjekkpunkt.get( 'antallObjektReturnert', 0 )
+        if sjekkpunkt['neste'] is None and not sjekkpunkt.get( 'ferdig', False ): 
+            return 
+
+        self.paginering['initielt'] = False
+        if sjekkpunkt.get( 'ferdig', False ): 
+            self.paginering['meredata'] = False
+            self.data = { 'objekter' : [], 'metadata' : { 'returnert' : 0 } }
+        else: 
+            # Later som vi har en (ferdig behandlet) side med lenke til neste side
+            self.data = { 'objekter' : [], 'metadata' : { 'returnert' : 1, 'neste' : { 'href' : sjekkpunkt['neste'] } } }
+
+    def sokeanrop( self ): 
+        """
+        Returnerer endepunkt og parametre for det første anropet mot NVDB api for dette søket
+
+        ARGUMENTS
+            None
+
+        KEYWORDS
+            None 
+
+        RETURNS
+            tuple (sti, parametre) med endepunkt (relativt til rot for NVDB api) og dictionary med spørreparametre
+        """
+        if isinstance( self, nvdbFagdata): 
+            return ( '/'.join(('vegobjekter', str(self.objektTypeId) )), merge_dicts(  self.filterdata, self.respons ) )
+        elif isinstance( self, nvdbNoder ): 
+            return ( 'vegnett/noder', self.filterdata )
+        else: 
+            return ( 'vegnett/veglenkesekvenser/segmentert', self.filterdata )
+
+    def __aiter__( self ): 
+        """
+        Asynkron iterasjon over søkeobjektet, dvs async for vegobjekt in sokeobjekt: ... 
+
+        Se asynkroniter for detaljer 
+        """
+        return self.asynkroniter()
+
+    async def asynkroniter( self, forb=None ): 
+        """
+        Asynkron generator som gir deg alle objektene i søket, ett for ett. Krever aiohttp 
+
+        Bruker apiforbindelse_async, som kopierer miljø og http headere (inklusive evt innlogging) fra self.forbindelse. 
+        Paginering skjer på samme måte som for nesteForekomst, men vi henter neste side i bakgrunnen mens du jobber 
+        med den forrige. Asynkron iterasjon påvirker ikke pagineringen til nesteForekomst. 
+
+        ARGUMENTS
+            None
+
+        KEYWORDS
+            forb : None eller en instans av apiforbindelse_async. Angis hvis du vil dele forbindelse mellom flere søk
+
+        RETURNS
+            asynkron generator med objekter (dictionary) fra NVDB api
+
+        EKSEMPEL
+            async def tellfartsgrenser(): 
+                antall = 0
+                async for fart in nvdbFagdata( 105, filter={'kommune' : 5001 } ): 
+                    antall += 1
+                return antall 
+
+            asyncio.run( tellfartsgrenser() )
+        """
+        if isinstance( self, nvdbFagdata) and not self.objektTypeId: 
+            raise ValueError( 'ObjektTypeID mangler.' )
+
+        egenforbindelse = False 
+        if not forb: 
+            forb = apiforbindelse_async.apiforbindelse_async.fra_forbindelse( self.forbindelse )
+            egenforbindelse = True 
+
+        try: 
+            (sti, parametre) = self.sokeanrop()
+            data = await forb.anrope( sti, parametre=parametre, headers=self.headers )
+            while data['metadata']['returnert'] > 0: 
+                neste = asyncio.ensure_future( forb.anrope( data['metadata']['neste']['href'], headers=self.headers ) )
+                try: 
+                    for objekt in data['objekter']: 
+                        yield objekt 
+                except BaseException: 
+                    neste.cancel()
+                    raise 
+                data = await neste 
+
+        finally: 
+            if egenforbindelse: 
+                await forb.lukk()
+
+    def nesteside( self ): 
+        """
+        Henter neste side (dvs neste respons fra NVDB api, med inntil paginering['antall'] objekter) 
+
+        Hvis forhåndshenting er slått på så tar vi neste side fra køen som fylles av bakgrunnstråden, 
+        ellers spør vi NVDB api direkte via lenken metadata.neste.href i forrige respons. 
+
+        ARGUMENTS
+            None
+
+        KEYWORDS
+            None 
+
+        RETURNS
+            dictionary med respons fra NVDB api, dvs med elementene "objekter" og "metadata"
+        """
+        if self.paginering['forhandshenting'] > 0: 
+            if self.sidebuffer is None: 
+                self.__startforhandshenting( self.data['metadata']['neste']['href'] )
+
+            data = self.sidebuffer.get()
+            if isinstance( data, Exception): 
+                self.__stoppforhandshenting()
+                raise data
+            if data['metadata']['returnert'] == 0: 
+                self.__stoppforhandshenting()
+            return data 
+
+        return self.anrope( self.data['metadata']['neste']['href'] ) 
+
+    def forhandshenting( self, dybde=2 ): 
+        """
+        Slår på forhåndshenting av data: En bakgrunnstråd henter side N+1 (og evt flere) mens du jobber med side N. 
+
+        Nedlasting og JSON-dekoding skjer dermed samtidig med at du behandler dataene, f.eks med to_records(). 
+        For store datasett (f.eks. alle fartsgrenser eller alt vegnett i Norge) kan dette redusere tidsbruken betraktelig. 
+
+        Forhåndshentingen starter ved første anrop mot NVDB api og stopper når vi har hentet siste side, eller når 
+        søkeobjektet nullstilles med refresh(). 
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS
+            dybde : int, default 2. Maksimalt antall sider vi holder i forhåndshentet kø. Sett til 0 for å slå av forhåndshenting.  
+
+        RETURNS
+            None 
+
+        EKSEMPEL
+            fart = nvdbFagdata( 105 )
+            fart.forhandshenting( dybde=3 )
+            data = fart.to_records()
+        """
+        self.__stoppforhandshenting()
+        self.paginering['forhandshenting'] = max( int( dybde ), 0 )
+
+    def __startforhandshenting( self, url ): 
+        """
+        Starter bakgrunnstråd som henter sider fra NVDB api og legger dem i køen self.sidebuffer 
+        """
+        self.__stoppforhandshenting()
+        self.sidebuffer = queue.Queue( maxsize=self.paginering['forhandshenting'] )
+        self.sidestopp = threading.Event()
+        traad = threading.Thread( target=self.__forhandshent, args=( url, self.sidebuffer, self.sidestopp ), daemon=True )
+        traad.start()
+
+    def __stoppforhandshenting( self ): 
+        """
+        Stopper evt bakgrunnstråd for forhåndshenting og tømmer køen
+        """
+        if self.sidestopp: 
+            self.sidestopp.set()
+        if self.sidebuffer: 
+            try: 
+                while True: 
+                    self.sidebuffer.get_nowait()
+            except queue.Empty: 
+                pass 
+        self.sidebuffer = None
+        self.sidestopp = None
+
+    def __forhandshent( self, url, sidebuffer, sidestopp ): 
+        """
+        Jobben til bakgrunnstråden: Henter sider fra NVDB api inntil vi får en tom side, eller blir bedt om å stoppe. 
+
+        Evt feil (f.eks ValueError fra anrope) legges i køen og kastes på nytt av nesteside() 
+        """
+        while not sidestopp.is_set(): 
+            try: 
+                data = self.anrope( url )
+            except Exception as err: 
+                data = err 
+
+            while not sidestopp.is_set(): 
+                try: 
+                    sidebuffer.put( data, timeout=0.5 )
+                except queue.Full: 
+                    pass 
+                else: 
+                    break 
+
+            if isinstance( data, Exception) or data['metadata']['returnert'] == 0: 
+                return 
+            url = data['metadata']['neste']['href']
+
+    def stromming( self, aktiv=True ): 
+        """
+        Slår på (evt av) strømmende JSON-tolkning: Vi tolker objektene i hver side (respons fra NVDB api) etter hvert 
+        som de lastes ned, i stedet for å vente på hele siden og så tolke alt på en gang. 
+
+        Gir lavere minnebruk og raskere tilgang til første objekt for objekttyper med store geometrier (f.eks 
+        vegoppmerking, arealbruk), særlig med inkluder=alle. Metadata (bl.a. lenken til neste side) leses 
+        når hele siden er lastet ned. Brytes forbindelsen midt i en side så henter vi siden på nytt, og hopper 
+        over de objektene du allerede har fått. 
+
+        Strømming erstatter forhåndshenting (se forhandshenting) for nesteForekomst og to_records, og 
+        påvirker ikke asynkron iterasjon. 
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS
+            aktiv : True (default) eller False 
+
+        RETURNS
+            None 
+
+        EKSEMPEL
+            oppmerking = nvdbFagdata( 836 )
+            oppmerking.stromming()
+            data = oppmerking.to_records()
+        """
+        self.refresh()
+        self.paginering['strom'] = bool( aktiv )
+
+    def maal( self, aktiv=True, lytter=None ):
+        """
+        Slår på (evt av) måling av tidsbruk og tellere, se maaling.py og apiforbindelse.maal
+
+        Målingen hører til apiforbindelsen (self.forbindelse), og gjelder dermed også andre søk og kloner som
+        deler forbindelsen. to_records nullstiller målingen når den starter, og skriver rapport om tidsbruk for
+        nettverk, JSON-dekoding og nvdbfagdata2records (evt flatutvegnettsegment) når den er ferdig, slik at du
+        ser om jobben venter på nettverket eller bruker CPU.
+
+        ARGUMENTS
+            None
+
+        KEYWORDS
+            aktiv : True (default) eller False
+
+            lytter : None eller funksjon lytter( hendelse, data ) som kalles for hver hendelse (kall mot NVDB api,
+                    nye forsøk, trinn i to_records), f.eks for logging
+
+        RETURNS
+            maaling-objektet, evt None
+
+        EKSEMPEL
+            fart = nvdbFagdata( 105 )
+            fart.maal()
+            data = fart.to_records()
+            print( fart.forbindelse.maaling.oppsummering() )
+        """
+        return self.forbindelse.maal( aktiv=aktiv, lytter=lytter )
+
+    def __nestestrom( self ): 
+        """
+        nesteForekomst for strømmende JSON-tolkning, se stromming()
+        """
+        if self.paginering['initielt']: 
+            (sti, parametre) = self.sokeanrop()
+            self.paginering['initielt'] = False
+            self.__apnestrom( sti, parametre=parametre )
+
+        forsok = 0
+        while self.paginering['meredata'] and self.strom: 
+            try: 
+                objekt = next( self.strom['iterator'], None )
+            except ( requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError, JSONDecodeError ) as err: 
+                forsoksregel = self.forbindelse.forsoksregel
+                if not forsoksregel.skalprove( forsok ): 
+                    raise 
+                print( 'Brudd midt i respons fra NVDB api, henter siden på nytt', self.strom['url'], err )
+                forsoksregel.vent( forsok )
+                forsok += 1
+                self.__apnestrom( self.strom['url'], parametre=self.strom['parametre'], hopp=self.strom['antall'] )
+                continue 
+
+            if objekt is not None: 
+                self.strom['antall'] += 1
+                self.paginering['antallObjektReturnert'] += 1 
+                return objekt 
+
+            # Ferdig med denne siden, metadata er lest 
+            metadata = self.strom['resten'].get( 'metadata', {} )
+            self.data = { 'objekter' : [], 'metadata' : metadata }
+            if getattr( self, 'antall', None ) is None and not isinstance( self, nvdbNoder ) and 'antall' in metadata: 
+                self.antall = metadata['antall']
+
+            if metadata.get( 'returnert', 0 ) == 0 or not 'neste' in metadata: 
+                self.__lukkstrom()
+                self.paginering['meredata'] = False
+                return None 
+
+            self.__apnestrom( metadata['neste']['href'] )
+
+        return None 
+
+    def __apnestrom( self, sti, parametre=None, hopp=0 ): 
+        """
+        Åpner strømmende respons fra NVDB api for en side, og hopper evt over de første objektene (hopp)
+        """
+        self.__lukkstrom()
+        if not 'http' in sti: 
+            url = '/'.join(( self.forbindelse.apiurl, sti.lstrip( '/') ))
+        else: 
+            url = sti 
+
+        r = self.forbindelse.les( url, params=parametre, headers=self.headers, stream=True )
+        self.sisteanrop = r.url
+        if r.status_code == requests.codes.ok: 
+            strom = jsonstrom.objektstrom( r.iter_content( chunk_size=65536 ) )
+            self.strom = { 'url' : url, 'parametre' : parametre, 'respons' : r, 'antall' : hopp, 
+                           'iterator' : iter( strom ), 'resten' : strom.resten }
+        else: 
+            # Nye forsøk og feilhåndtering overlates til anrope, som henter hele siden på en gang 
+            r.close()
+            data = self.anrope( url, parametre=parametre )
+            self.strom = { 'url' : url, 'parametre' : parametre, 'respons' : None, 'antall' : hopp,
+                           'iterator' : iter( data.get( 'objekter', [] ) ), 'resten' : data }
+
+        for _ in range( hopp ): 
+            next( self.strom['iterator'], None )
+
+    def __lukkstrom( self ): 
+        """
+        Lukker evt åpen strømmende respons
+        """
+        if self.strom and self.strom['respons'] is not None: 
+            self.strom['respons'].close()
+        self.strom = None 
+
     def addfilter_geo(self, *args):
         """
         DEPRECEATED: replaced with addfilter - function
@@ -266,9 +744,15 @@ class nvdbVegnett:
     
 
     def anrope(self, path, parametre=None, debug=False, silent=False, logganrop=False, iterasjontelling = 0): 
+        """
+        Henter data fra NVDB api og returnerer JSON-data 
+
+        Nye forsøk ved feil i JSON-dekoding og ved http-feil som 503, 504 (hikke fra NVDB api) styres av 
+        self.forbindelse.forsoksregel, se forsok.py 
+        """
     
         logganrop = False # Logger alle anrop til fil
-        maks_iterasjoner = 5
+        forsoksregel = self.forbindelse.forsoksregel
     
         # if not self.apiurl in path: 
         if not 'http' in path: 
@@ -279,29 +763,33 @@ class nvdbVegnett:
         else: 
             url = path 
 
-        # r = requests.get(url, params=parametre, headers=self.headers)
-        r = self.forbindelse.les( url, params=parametre, headers=self.headers )
-        
-        self.sisteanrop = r.url
-        
-        if debug:
-            print( r.url[33:]) # DEBUG
-        
-        if r.status_code == requests.codes.ok:
-            data = None 
-            try: 
-                data = r.json()
-            except JSONDecodeError as err: 
-                if iterasjontelling < maks_iterasjoner: 
-                    print( 'Fikk feilmelding på JSON-dekoding av respons, hikke fra NVDB api? Prøver på ny en håndfull ganger med litt pause')
-                    sleep( 15 )
-                    iterasjontelling += 1
-                    self.anrope( path, parametre=parametre, debug=debug, silent=silent, logganrop=logganrop, iterasjontelling=iterasjontelling )
-                else: 
-                    print( 'Beklager, må gi opp å parse data hentet med url', r.url)
-                    print( err )
-                    raise ValueError("Klarte ikke oversette respons fra NVDB api til JSON for kall " + r.url ) 
-            else: 
+        while True: 
+            # r = requests.get(url, params=parametre, headers=self.headers)
+            r = self.forbindelse.les( url, params=parametre, headers=self.headers )
+            
+            self.sisteanrop = r.url
+            
+            if debug:
+                print( r.url[33:]) # DEBUG
+            
+            if r.status_code == requests.codes.ok:
+                data = None 
+                try: 
+                    if self.forbindelse.maaling: 
+                        with self.forbindelse.maaling.spenn( 'dekoding' ): 
+                            data = dekodjson( r.content )
+                    else: 
+                        data = dekodjson( r.content )
+                except JSONDecodeError as err: 
+                    if forsoksregel.skalprove( iterasjontelling ): 
+                        print( 'Fikk feilmelding på JSON-dekoding av respons, hikke fra NVDB api? Prøver på ny en håndfull ganger med litt pause')
+                        forsoksregel.vent( iterasjontelling )
+                        iterasjontelling += 1
+                        continue 
+                    else: 
+                        print( 'Beklager, må gi opp å parse data hentet med url', r.url)
+                        print( err )
+                        raise ValueError("Klarte ikke oversette respons fra NVDB api til JSON for kall " + r.url ) 
 
                 if debug and 'metadata' in data.keys(): 
                     print( '\n',  data['metadata'], '\n' ) 
@@ -323,32 +811,66 @@ class nvdbVegnett:
                         f.write( json.dumps( data, indent=4, ensure_ascii=False) )
                         f.write( '\n' )  
 
-            # Normalsituasjon, returnerer JSON-data    
-            return data 
+                # Normalsituasjon, returnerer JSON-data    
+                return data 
 
-        elif r.status_code in [ 503, 504 ] and iterasjontelling < maks_iterasjoner: # Gateway timeout
-            iterasjontelling += 1
-            print( 'Http error, prøver om igjen', str( iterasjontelling), 'av', str( maks_iterasjoner), 'ganger om bittelita stund: '+str(r.status_code) +' '+r.url +
-                            '\n' + r.text )
-            sleep( 15 )
-            data = self.anrope( path, parametre=parametre, debug=debug, silent=silent, logganrop=logganrop, iterasjontelling=iterasjontelling )
-            return data 
+            elif forsoksregel.skalprove( iterasjontelling, r=r ): # Gateway timeout, for mange forespørsler m.m.
+                print( 'Http error, prøver om igjen', str( iterasjontelling+1), 'av', str( forsoksregel.maksforsok), 'ganger om bittelita stund: '+str(r.status_code) +' '+r.url +
+                                '\n' + r.text )
+                forsoksregel.vent( iterasjontelling, r=r )
+                iterasjontelling += 1
 
-        elif r.status_code == 401: 
-            raise ValueError( 'Ugyldig pålogging', str(r.status_code) + ' ' + r.url + '\n' + r.text ) 
+            elif r.status_code == 401: 
+                raise ValueError( 'Ugyldig pålogging', str(r.status_code) + ' ' + r.url + '\n' + r.text ) 
 
-        elif r.status_code == 403: 
-            raise ValueError( 'Ugyldig pålogging', str(r.status_code) + ' ' + r.url + '\n' + r.text ) 
+            elif r.status_code == 403: 
+                raise ValueError( 'Ugyldig pålogging', str(r.status_code) + ' ' + r.url + '\n' + r.text ) 
 
-        else:
-            if not silent: 
-                print( 'Http error: '+str(r.status_code) +' '+r.url +
-                            '\n' + r.text )
-            raise ValueError('Http error: '+str(r.status_code) +' '+r.url +
-                            '\n' + r.text )
+            else:
+                if not silent: 
+                    print( 'Http error: '+str(r.status_code) +' '+r.url +
+                                '\n' + r.text )
+                raise ValueError('Http error: '+str(r.status_code) +' '+r.url +
+                                '\n' + r.text )
                             
+    def klone( self, filter=None ): 
+        """
+        Lager en kopi av søkeobjektet, med samme filter, responsparametre og http headere, men uten nedlastede data. 
+
+        Kopien deler apiforbindelse (self.forbindelse) og evt datakatalogdefinisjon med orginalen, så vi slipper 
+        ny innlogging og nye oppslag i datakatalogen. Brukes bl.a. for å dele opp et søk i uavhengige delsøk. 
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS
+            filter : None eller dictionary med filter som føyes til (evt overskriver) filteret til kopien 
+
+        RETURNS
+            Ny instans av søkeobjektet, med nullstilt paginering
+        """
+        ny = copy( self )
+        ny.filterdata = deepcopy( self.filterdata )
+        if isinstance( filter, dict ): 
+            ny.filterdata.update( filter )
+        if hasattr( self, 'respons' ): 
+            ny.respons = deepcopy( self.respons )
+        ny.headers = deepcopy( self.headers )
+        ny.paginering = deepcopy( self.paginering )
+        ny.paginering['antallObjektReturnert'] = 0
+        ny.sidebuffer = None
+        ny.sidestopp = None
+        ny.strom = None
+        if isinstance( ny, nvdbFagdata ): 
+            ny.antall = None
+            ny.strekningslengde = None
+        ny.refresh()
+        return ny 
+
     def refresh(self):
         """Deletes all data, resets pagination to 0"""
+        self.__stoppforhandshenting()
+        self.__lukkstrom()
         self.paginering['hvilken'] = 0
         self.paginering['initielt'] = True
         self.paginering['meredata'] = True
@@ -390,6 +912,23 @@ class nvdbVegnett:
                     '"X-Kontaktperson" : "ola.nordmann@eposten.din" }\n' ))
             # warn( mytext ) 
 
+    def _brukforbindelse( self, forbindelse, miljo ): 
+        """
+        Setter apiforbindelse og miljø for søkeobjektet, brukes av __init__ i nvdbVegnett og klassene som arver fra den
+
+        Evt eksisterende apiforbindelse deles med andre søkeobjekter (innlogging, struping, opptak m.m.). Uten 
+        forbindelse lager vi ny apiforbindelse, og går mot miljo (default 'prod')
+        """
+        if forbindelse: 
+            self.forbindelse = forbindelse
+            self.apiurl = forbindelse.apiurl + '/'
+        else: 
+            self.forbindelse = apiforbindelse.apiforbindelse()
+            if not miljo:
+                miljo = 'prod'
+        if miljo: 
+            self.miljo( miljo)
+
     def miljo(self, *args):
         """Kun internt på vegvesen-nettet!
         Kan endre hvilket miljø vi går mot.
@@ -398,6 +937,7 @@ class nvdbVegnett:
             'utv' - bruker UTVIKLINGSmiljøet (ATLAS)
             'test' - bruker TESTmiljø (ATLAS)
             'prod' - går mot PRODUKSJON (ATLAS)
+            'http://...' - URL til tjeneste som oppfører seg som NVDB api LES, f.eks lokalserver.py 
         eksempel
         b = nvdbFagdata(45)
         b.miljo()
@@ -408,7 +948,10 @@ class nvdbVegnett:
         
         if args and isinstance( args[0], str): 
             
-            if 'utv' in  args[0].lower() and not 'stm' in args[0].lower(): 
+            if args[0][0:4] == 'http': 
+                self.apiurl = args[0].rstrip( '/' ) + '/'
+                self.forbindelse.velgmiljo( args[0] )
+            elif 'utv' in  args[0].lower() and not 'stm' in args[0].lower(): 
                 self.apiurl = 'https://nvdbapiles-v3.utv.atlas.vegvesen.no/'
                 self.forbindelse.velgmiljo('utvles')
             elif 'stm-utvles' in args[0].lower(): 
@@ -485,23 +1028,201 @@ class nvdbVegnett:
             Liste med segmentert vegnett fra NVDB api V3, forflatet for enklere bruk 
         """
 
-        data = []
-        v1 = self.nesteForekomst()
+        return list( self.iter_records( **kwargs ) )
+
+    def iter_records( self, bolk=None, **kwargs ): 
+        """
+        Som to_records(), men gir deg radene etter hvert som de kommer fra NVDB api (generator)
+
+        Kun gjeldende side med data fra NVDB api holdes i minnet, så du kan skrive store datamengder (f.eks 
+        vegnett for hele landet) til disk uten å ha hele resultatet i minnet samtidig. 
 
-        if hasattr( self, 'antall') and self.antall > 10000: 
-            print( 'Eksport av', self.antall, 'vegsegmenter kommer til å ta tid...')
+        EKSEMPEL
+            for rader in sok.iter_records( bolk=10000 ): 
+                pd.DataFrame( rader ).to_csv( 'vegnett.csv', mode='a' )
 
+        ARGUMENTS
+            None 
+
+        KEYWORDS 
+            bolk : None (default) eller heltall. Med bolk=N får du lister med inntil N rader i stedet for én og én rad 
+
+            Øvrige nøkkelord er de samme som for to_records()
+
+        RETURNS
+            generator som gir deg dictionaries (evt lister med dictionaries)
+        """
+        if bolk: 
+            return delibolker( self.__vegnettrader( **kwargs ), bolk )
+        return self.__vegnettrader( **kwargs )
+
+    def __vegnettrader( self, **kwargs ): 
+        """
+        Generator med forflatet vegnett, se iter_records og to_records 
+        """
+        # Vi eier dataene fra NVDB api og kan endre dem direkte, med mindre noen har dyttet inn data selv
+        kwargs.setdefault( 'kopier', self.paginering['dummy'] )
+        maaling = self.forbindelse.maaling 
+        if maaling and getattr( self, 'maalerapport', True ): 
+            maaling.nullstill()
         count = 1
-        while v1: 
+        for side in self.iter_pages(): 
+            antall = getattr( self, 'antall', None )
+            if count == 1 and antall and antall > 10000: 
+                print( 'Eksport av', antall, 'vegsegmenter kommer til å ta tid...')
+
+            for v1 in side: 
+                if maaling: 
+                    with maaling.spenn( 'flatutvegnettsegment' ): 
+                        v1 = flatutvegnettsegment( v1, **kwargs )
+                    maaling.tell( 'objekter' )
+                else: 
+                    v1 = flatutvegnettsegment( v1, **kwargs )
+                yield v1 
+                count += 1
+                if count == 1000 or count == 5000 or count % 10000 == 0: 
+                    print( 'Vegsegment', count, 'av', getattr( self, 'antall', None ) )            
 
-            v1 = flatutvegnettsegment( v1, **kwargs )
-            data.append( v1 )
-            v1 = self.nesteForekomst()
-            count += 1
-            if count == 1000 or count == 5000 or count % 10000 == 0: 
-                print( 'Vegsegment', count, 'av', self.antall)            
+        if maaling and getattr( self, 'maalerapport', True ): 
+            print( maaling.rapport() )
 
-        return data
+    def to_dataframe( self, bolk=65536, **kwargs ): 
+        """
+        Som to_records(), men gir deg en pandas DataFrame bygd opp kolonne for kolonne, uten å gå via liste med dictionaries
+
+        Gir lavere minnebruk og raskere konvertering enn pd.DataFrame( sok.to_records() ) for store datamengder. 
+        Kolonner med heltall (nvdbId, veglenkesekvensid m.m., og egenskaper som er heltall ifølge datakatalogen) 
+        får datatypen Int64, som tåler manglende verdier. Se kolonner.py 
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS 
+            bolk : int, antall rader som samles opp før vi gjør dem om til DataFrame. Default 65536 
+
+            Øvrige nøkkelord er de samme som for to_records()
+
+        RETURNS
+            pandas DataFrame 
+        """
+        return self.__tilkolonner( 'pandas', bolk, **kwargs )
+
+    def to_arrow( self, bolk=65536, **kwargs ): 
+        """
+        Som to_records(), men gir deg en Arrow-tabell (pyarrow.Table) bygd opp kolonne for kolonne. Krever pyarrow
+
+        Datatyper for egenskapene hentes fra datakatalogen. Dictionaries og lister (f.eks relasjoner) blir JSON-tekst. 
+        Skriv til parquet med pyarrow.parquet.write_table( tabell, 'filnavn.parquet' ). Se kolonner.py 
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS 
+            bolk : int, antall rader som samles opp før vi gjør dem om til Arrow-format. Default 65536 
+
+            Øvrige nøkkelord er de samme som for to_records()
+
+        RETURNS
+            pyarrow.Table 
+        """
+        return self.__tilkolonner( 'arrow', bolk, **kwargs )
+
+    def __tilkolonner( self, format, bolk, **kwargs ): 
+        """
+        Felles implementasjon av to_dataframe og to_arrow
+        """
+        if isinstance( self, nvdbFagdata ): 
+            typer = kolonner.kolonnetyper( self.objektTypeDef )
+        else: 
+            typer = kolonner.kolonnetyper( )
+
+        bygger = kolonner.kolonnebygger( format=format, typer=typer, bolk=bolk )
+        for rad in self.iter_records( **kwargs ): 
+            bygger.legg_til( rad )
+
+        return bygger.resultat()
+
+    def to_jsonl( self, filnavn, sjekkpunktfil=None, **kwargs ): 
+        """
+        Skriver søkeresultatet (samme rader som to_records) til fil med én JSON-rad per linje, med sjekkpunkt per side
+
+        Etter hver side fra NVDB api skriver vi radene til disk og lagrer et sjekkpunkt (se sjekkpunkt()) sammen med 
+        filstørrelsen. Dør nedlastingen underveis så fortsetter vi fra siste ferdige side neste gang du kjører 
+        samme kommando. Det som evt ble skrevet etter siste sjekkpunkt kuttes bort, så ingen rader blir duplisert. 
+        Ferdige nedlastinger hentes ikke på nytt, slett sjekkpunktfila hvis du vil starte på nytt. 
+
+        EKSEMPEL
+            sok = nvdbFagdata( 105 )
+            sok.to_jsonl( 'fartsgrenser.jsonl' )     # Kjør på nytt hvis den stopper
+            df = pd.read_json( 'fartsgrenser.jsonl', lines=True )
+
+        ARGUMENTS
+            filnavn : Navn på fila vi skriver til 
+
+        KEYWORDS 
+            sjekkpunktfil : None eller filnavn. Default er filnavn + '.sjekkpunkt.json' 
+
+            Øvrige nøkkelord er de samme som for to_records(), og må være de samme når vi fortsetter fra et sjekkpunkt
+
+        RETURNS
+            Antall rader i fila 
+        """
+        if not sjekkpunktfil: 
+            sjekkpunktfil = filnavn + '.sjekkpunkt.json'
+
+        if os.path.exists( sjekkpunktfil ): 
+            with open( sjekkpunktfil, encoding='utf-8' ) as f: 
+                lagret = json.load( f )
+            if lagret['sokeobjekt'] != self.__class__.__name__ or lagret['objekttype'] != getattr( self, 'objektTypeId', None ) or \
+                    lagret['filter'] != json.loads( json.dumps( self.filterdata ) ) or lagret['nokkelord'] != json.loads( json.dumps( kwargs ) ): 
+                raise ValueError( 'Sjekkpunkt ' + sjekkpunktfil + ' gjelder et annet søk (eller andre nøkkelord), slett fila hvis du vil starte på nytt' )
+            if lagret['ferdig']: 
+                print( 'Nedlasting til', filnavn, 'er allerede ferdig,', lagret['antallRader'], 'rader' )
+                return lagret['antallRader']
+            print( 'Fortsetter nedlasting til', filnavn, 'fra sjekkpunkt', lagret['tidspunkt'], 'med', lagret['antallRader'], 'rader' )
+            self.gjenoppta( lagret )
+            antallRader = lagret['antallRader']
+            posisjon = lagret['posisjon']
+        else: 
+            self.refresh()
+            antallRader = 0 
+            posisjon = 0 
+
+        uttrekker = None 
+        if isinstance( self, nvdbFagdata ): 
+            uttrekker = self.uttrekker( geometri=kwargs.get( 'geometri', False ), geometrikvalitet=kwargs.get( 'geometrikvalitet', False ) )
+
+        with open( filnavn, 'a+b' ) as utfil: 
+            # Kutter bort evt halvferdig side fra forrige gang
+            utfil.truncate( posisjon )
+            for side in self.iter_pages(): 
+                if isinstance( self, nvdbFagdata ): 
+                    rader = nvdbfagdata2records( side, uttrekker=uttrekker, **kwargs )
+                else: 
+                    rader = [ flatutvegnettsegment( seg, **{ 'kopier' : False, **kwargs } ) for seg in side ]
+
+                utfil.write( ''.join( json.dumps( rad, ensure_ascii=False ) + '\n' for rad in rader ).encode( 'utf-8' ) )
+                utfil.flush()
+                os.fsync( utfil.fileno() )
+                antallRader += len( rader )
+                posisjon = utfil.tell()
+                self.__lagresjekkpunkt( sjekkpunktfil, { **self.sjekkpunkt(), 'nokkelord' : kwargs, 
+                                                         'antallRader' : antallRader, 'posisjon' : posisjon } )
+
+        self.__lagresjekkpunkt( sjekkpunktfil, { **self.sjekkpunkt(), 'ferdig' : True, 'nokkelord' : kwargs, 
+                                                 'antallRader' : antallRader, 'posisjon' : posisjon } )
+        return antallRader 
+
+    def __lagresjekkpunkt( self, sjekkpunktfil, sjekkpunkt ): 
+        """
+        Skriver sjekkpunkt til midlertidig fil og bytter navn, slik at sjekkpunktfila aldri er halvferdig
+        """
+        midlertidig = sjekkpunktfil + '.tmp'
+        with open( midlertidig, 'w', encoding='utf-8' ) as f: 
+            json.dump( sjekkpunkt, f, ensure_ascii=False, indent=4 )
+            f.flush()
+            os.fsync( f.fileno() )
+        os.replace( midlertidig, sjekkpunktfil )
 
     def vegrefrutesok(self, vref1, vref2, **kwargs ): 
         """
@@ -548,7 +1269,7 @@ class nvdbNoder(nvdbVegnett):
     Ref https://nvdbapiles-v3.atlas.vegvesen.no/dokumentasjon/openapi/#/Vegnett/get_vegnett_noder
     """
 
-    def __init__( self, miljo=None, debug=False, filter=None):
+    def __init__( self, miljo=None, debug=False, filter=None, forbindelse=None ):
         self.filterdata = {}
         self.headers =   { 'accept' : 'application/vnd.vegvesen.nvdb-v3-rev3+json', 
                             'X-Client' : 'nvdbapi.py',
@@ -563,19 +1284,20 @@ class nvdbNoder(nvdbVegnett):
                                                                 # 
                             'meredata'              : True,     # Gjetning på om vi kan hente mere data
                             'initielt'              : True,     # Initiell ladning av datasett
-                            'dummy'                 : False     # Jukse-bruk av paginering 
+                            'dummy'                 : False,    # Jukse-bruk av paginering 
+                            'forhandshenting'       : 0,        # Antall sider vi henter på forhånd i egen tråd (0=av)
+                            'strom'                 : False     # Strømmende JSON-tolkning av hver side, se stromming()
                     } 
 
         self.data = { 'objekter' : []}
+        self.sidebuffer = None      # Kø med forhåndshentede sider, se forhandshenting()
+        self.sidestopp = None       # Signal som stopper tråden for forhåndshenting
+        self.strom = None           # Gjeldende side ved strømmende JSON-tolkning, se stromming()
         self.filterdata = {}
         if isinstance( filter, dict ): 
             self.filterdata = filter 
 
-        self.forbindelse = apiforbindelse.apiforbindelse()
-        if not miljo:
-            miljo = 'prod'
-        self.miljo( miljo )
-        self.forbindelse.velgmiljo( miljo.lower()+'les')
+        self._brukforbindelse( forbindelse, miljo )
         self.debug = debug
 
         # Leser verdier for http header fra JSON-fil
@@ -612,6 +1334,11 @@ class nvdbFagdata(nvdbVegnett):
     Filteret kan også settes som parameter når du oppretter søkeobjektet, eksempel 
     n = nvdbFagdata( 45, filter={'kommune' : 5001})
 
+    Med nøkkelordet forbindelse kan flere søkeobjekter dele samme apiforbindelse, eksempel 
+    forb = apiforbindelse()
+    forb.login()
+    n = nvdbFagdata( 45, forbindelse=forb )
+
     # EKSEMPEL: Iterer over alle bomstasjoner
     n = nvdbFagdata(45) 
     bomst = n.nesteForekomst()
@@ -623,7 +1350,7 @@ class nvdbFagdata(nvdbVegnett):
     
     
     
-    def __init__( self, objTypeID, miljo=None, debug=False, filter=None ):
+    def __init__( self, objTypeID, miljo=None, debug=False, filter=None, forbindelse=None ):
 
 
         self.headers =   { 'accept' : 'application/vnd.vegvesen.nvdb-v3-rev1+json', 
@@ -639,24 +1366,26 @@ class nvdbFagdata(nvdbVegnett):
                                                                 # 
                             'meredata'              : True,     # Gjetning på om vi kan hente mere data
                             'initielt'              : True,     # Initiell ladning av datasett
-                            'dummy'                 : False     # Jukse-bruk av paginering 
+                            'dummy'                 : False,    # Jukse-bruk av paginering 
+                            'forhandshenting'       : 0,        # Antall sider vi henter på forhånd i egen tråd (0=av)
+                            'strom'                 : False     # Strømmende JSON-tolkning av hver side, se stromming()
                     }  
     
         self.data = { 'objekter' : []}
+        self.sidebuffer = None      # Kø med forhåndshentede sider, se forhandshenting()
+        self.sidestopp = None       # Signal som stopper tråden for forhåndshenting
+        self.strom = None           # Gjeldende side ved strømmende JSON-tolkning, se stromming()
         self.apiurl = 'https://nvdbapiles-v3.atlas.vegvesen.no/'
         self.objektTypeId = None
         self.objektTypeDef = None
+        self.uttrekkere = {}        # Kompilerte egenskapsuttrekkere, se uttrekker()
         self.antall = None
         self.strekningslengde = None
         self.filterdata = {}
         self.geofilter = {}         # DEPRECEATED
         self.egenskapsfilter = {}   # DEPRECEATED
         self.overlappfilter = {}    # DEPRECEATED
-        self.forbindelse = apiforbindelse.apiforbindelse()
-        if not miljo: 
-            miljo = 'prod'
-        self.miljo( miljo)
-        self.forbindelse.velgmiljo( 'prodles')
+        self._brukforbindelse( forbindelse, miljo )
 
         self.debug = debug
 
@@ -671,9 +1400,8 @@ class nvdbFagdata(nvdbVegnett):
         # Refresh er lurt, (arver tilstand fra andre instanser). 
         self.refresh()
 
-        # Leser typedefinisjon fra NVDB api
-        self.objektTypeDef = self.anrope( '/'.join(( 'vegobjekttyper', 
-                                            str(objTypeID))) )
+        # Leser typedefinisjon fra felles mellomlager for datakatalogen, evt fra NVDB api
+        self.objektTypeDef = datakatalog.objekttype( objTypeID, forb=self.forbindelse )
         self.objektTypeId = objTypeID 
 
         if isinstance( filter, dict ): 
@@ -730,6 +1458,20 @@ class nvdbFagdata(nvdbVegnett):
                 data[eg['navn']] = missing
                 
         return data
+
+    def uttrekker( self, geometri=False, geometrikvalitet=False ): 
+        """
+        Returnerer egenskapsuttrekker for denne objekttypen, kompilert fra datakatalogen én gang per søkeobjekt
+
+        Brukes av to_records, to_dataframe og to_arrow. Se egenskapsuttrekker og egenskaper2records
+
+        KEYWORDS 
+            geometri, geometrikvalitet : Som for to_records 
+        """
+        nokkel = ( geometri, geometrikvalitet )
+        if not nokkel in self.uttrekkere: 
+            self.uttrekkere[nokkel] = egenskapsuttrekker( self.objektTypeDef, geometri=geometri, geometrikvalitet=geometrikvalitet )
+        return self.uttrekkere[nokkel]
                
     def addfilter_overlapp( self, *arg): 
         """
@@ -821,10 +1563,44 @@ class nvdbFagdata(nvdbVegnett):
 
         """
 
+        return list( self.iter_records( vegsegmenter=vegsegmenter, relasjoner=relasjoner, geometri=geometri, debug=debug, 
+                                        tidspunkt=tidspunkt, ignorerGeometriFeil=ignorerGeometriFeil, geometrikvalitet=geometrikvalitet ) )
+
+    def iter_records( self, bolk=None, vegsegmenter=True, relasjoner=True, geometri=False, debug=False, tidspunkt=None, ignorerGeometriFeil=False, geometrikvalitet=False ): 
+        """
+        Som to_records(), men gir deg radene etter hvert som de kommer fra NVDB api (generator)
+
+        Kun gjeldende side med data fra NVDB api holdes i minnet, så du kan skrive store datamengder til disk 
+        uten å ha hele resultatet i minnet samtidig. 
+
+        EKSEMPEL
+            for rader in sok.iter_records( bolk=10000, vegsegmenter=False ): 
+                pd.DataFrame( rader ).to_csv( 'bomstasjoner.csv', mode='a' )
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS 
+            bolk : None (default) eller heltall. Med bolk=N får du lister med inntil N rader i stedet for én og én rad 
+
+            Øvrige nøkkelord er de samme som for to_records()
+
+        RETURNS
+            generator som gir deg dictionaries (evt lister med dictionaries)
+        """
+        rader = self.__fagdatarader( vegsegmenter=vegsegmenter, relasjoner=relasjoner, geometri=geometri, debug=debug, 
+                                     tidspunkt=tidspunkt, ignorerGeometriFeil=ignorerGeometriFeil, geometrikvalitet=geometrikvalitet )
+        if bolk: 
+            return delibolker( rader, bolk )
+        return rader 
+
+    def __fagdatarader( self, vegsegmenter=True, relasjoner=True, geometri=False, debug=False, tidspunkt=None, ignorerGeometriFeil=False, geometrikvalitet=False ): 
+        """
+        Generator med forflatede vegobjekter, se iter_records og to_records 
+        """
         if ignorerGeometriFeil: 
             print( f"To_records: Tar med vegobjekt som mangler geometridata")
 
-        mydata = []
         if not self.antall: 
             self.statistikk()
 
@@ -839,26 +1615,36 @@ class nvdbFagdata(nvdbVegnett):
         count = 0
         nvdbid_manglergeom = []
         terskler = [ 1000, 10000]
-        feat = self.nesteForekomst()
-        while feat:
-            count += 1
-            if count == 1000 or count == 5000 or count % 10000 == 0: 
-                print( 'Objekt', count, 'av', self.antall)
-
-            # Ignorerer dem med tomt geometrielement, ref 
-            # https://github.com/LtGlahn/diskusjon_diverse/tree/master/debug_nvdbapilesv3/vegobjekter 
-            if 'geometri' in feat.keys() or ignorerGeometriFeil:
-
-                featureliste = nvdbfagdata2records( feat, vegsegmenter=vegsegmenter, relasjoner=relasjoner, 
-                                                    geometri=geometri, debug=debug, tidspunkt=tidspunkt, 
-                                                    ignorerGeometriFeil=ignorerGeometriFeil, geometrikvalitet=geometrikvalitet )
+        uttrekker = self.uttrekker( geometri=geometri, geometrikvalitet=geometrikvalitet )
+        maaling = self.forbindelse.maaling 
+        if maaling and getattr( self, 'maalerapport', True ): 
+            maaling.nullstill()
+        for side in self.iter_pages(): 
+            for feat in side:
+                count += 1
+                if count == 1000 or count == 5000 or count % 10000 == 0: 
+                    print( 'Objekt', count, 'av', self.antall)
+
+                # Ignorerer dem med tomt geometrielement, ref 
+                # https://github.com/LtGlahn/diskusjon_diverse/tree/master/debug_nvdbapilesv3/vegobjekter 
+                if 'geometri' in feat.keys() or ignorerGeometriFeil:
+
+                    if maaling: 
+                        with maaling.spenn( 'nvdbfagdata2records' ): 
+                            featureliste = nvdbfagdata2records( feat, vegsegmenter=vegsegmenter, relasjoner=relasjoner, 
+                                                            geometri=geometri, debug=debug, tidspunkt=tidspunkt, 
+                                                            ignorerGeometriFeil=ignorerGeometriFeil, geometrikvalitet=geometrikvalitet, 
+                                                            uttrekker=uttrekker )
+                        maaling.tell( 'objekter' )
+                    else: 
+                        featureliste = nvdbfagdata2records( feat, vegsegmenter=vegsegmenter, relasjoner=relasjoner, 
+                                                            geometri=geometri, debug=debug, tidspunkt=tidspunkt, 
+                                                            ignorerGeometriFeil=ignorerGeometriFeil, geometrikvalitet=geometrikvalitet, 
+                                                            uttrekker=uttrekker )
             
-                mydata.extend( featureliste )
-            else: 
-                nvdbid_manglergeom.append( feat['id'])
-
-
-            feat = self.nesteForekomst()
+                    yield from featureliste 
+                else: 
+                    nvdbid_manglergeom.append( feat['id'])
 
         if len( nvdbid_manglergeom ) > 0: 
             print( 'Manglende geometri-element for', len( nvdbid_manglergeom), 'vegobjekter fra dette søket')
@@ -867,7 +1653,104 @@ class nvdbFagdata(nvdbVegnett):
             if debug: 
                 print( nvdbid_manglergeom )
 
-        return mydata
+        if maaling and getattr( self, 'maalerapport', True ): 
+            print( maaling.rapport() )
+
+
+    def to_records_parallell( self, partisjon='fylke', verdier=None, antallTraader=4, **kwargs ): 
+        """
+        Som to_records(), men deler søket opp i uavhengige delsøk som lastes ned i parallell 
+
+        Søket deles opp med ett delsøk per fylke, kommune eller kontraktsområde (eller et annet filter 
+        du angir selv). Delsøkene kjøres i en trådpool og deler samme apiforbindelse (og dermed innlogging 
+        og http tilkoblingspool). Antall treff for hvert delsøk hentes med statistikk() i samme tråd som 
+        nedlastingen, og delsøk uten treff hoppes over. 
+
+        Et vegobjekt kan dukke opp i flere delsøk, f.eks en fartsgrense som krysser en fylkesgrense. Slike 
+        duplikater fjernes ut fra nvdbId og versjon (samt veglenkeposisjon når vegsegmenter=True, fordi 
+        NVDB api kun gir oss de vegsegmentene som er innafor hvert delsøk). Rekkefølgen på resultatet 
+        følger rekkefølgen på delsøkene, og er dermed forutsigbar. Etterpå er self.antall antall unike vegobjekter 
+        (nvdbId og versjon) i resultatet. 
+
+        ARGUMENTS
+            None 
+
+        KEYWORDS
+            partisjon : str, default 'fylke'. Hvilket filter vi deler opp søket etter, for eksempel 
+                        'fylke', 'kommune' eller 'kontraktsomrade'. 
+
+            verdier : None eller liste med filterverdier for partisjon. Hvis None så henter vi liste med alle 
+                        fylker, kommuner eller kontraktsområder fra NVDB api. Må angis for andre partisjoner. 
+
+            antallTraader : int, default 4. Antall delsøk som lastes ned samtidig 
+
+            Øvrige nøkkelord sendes videre til to_records() for hvert delsøk 
+
+        RETURNS
+            liste med dictionaries, samme som to_records()
+
+        EKSEMPEL
+            fart = nvdbFagdata( 105 )
+            data = fart.to_records_parallell( partisjon='fylke', antallTraader=8 )
+        """
+
+        if partisjon in self.filterdata: 
+            raise ValueError( f"Filteret har allerede verdi for {partisjon}={self.filterdata[partisjon]}, kan ikke dele opp søket etter {partisjon}" )
+
+        if verdier is None: 
+            omradeoppslag = { 'fylke' : ('fylker', 'nummer'), 
+                              'kommune' : ('kommuner', 'nummer'), 
+                              'kontraktsomrade' : ('kontraktsomrader', 'navn') }
+            if partisjon not in omradeoppslag: 
+                raise ValueError( f"Må angi liste med verdier for partisjon={partisjon}, evt bruk en av {list( omradeoppslag.keys() )}")
+            verdier = [ x[omradeoppslag[partisjon][1]] for x in omrader( omradeoppslag[partisjon][0], forb=self.forbindelse ) ]
+
+        self.forbindelse.tilkoblingspool( antall=max( antallTraader, 10 ) )
+
+        delsok = []
+        for verdi in verdier: 
+            sok = self.klone( filter={ partisjon : verdi } )
+            sok.maalerapport = False    # Vi skriver én felles rapport for alle delsøkene  
+            delsok.append( sok )
+
+        print( 'Henter objekter fordelt på', len( delsok), 'delsøk med', partisjon, 'i', antallTraader, 'parallelle tråder' )
+
+        if self.forbindelse.maaling: 
+            self.forbindelse.maaling.nullstill()
+
+        def hentdelsok( sok ): 
+            # Telling og nedlasting i samme tråd, så vi slipper å vente på tellingen for alle delsøkene før vi starter 
+            if not sok.statistikk()['antall']: 
+                return [] 
+            return sok.to_records( **kwargs )
+
+        with ThreadPoolExecutor( max_workers=antallTraader ) as utforer: 
+            resultater = list( utforer.map( hentdelsok, delsok ) )
+
+        if self.forbindelse.maaling: 
+            print( self.forbindelse.maaling.rapport() )
+
+
+        vegsegmenter = kwargs.get( 'vegsegmenter', True )
+        mydata = []
+        sett = set()
+        objekter = set()
+        for resultat in resultater: 
+            nyenokler = set()
+            for rad in resultat: 
+                nokkel = ( rad['nvdbId'], rad['versjon'] )
+                objekter.add( nokkel )
+                if vegsegmenter: 
+                    nokkel = nokkel + ( rad.get( 'veglenkesekvensid' ), rad.get( 'startposisjon' ), 
+                                        rad.get( 'sluttposisjon' ), rad.get( 'relativPosisjon' ) )
+                if nokkel not in sett: 
+                    nyenokler.add( nokkel )
+                    mydata.append( rad )
+            sett.update( nyenokler )
+
+        # Antall unike vegobjekter, dvs uten duplikatene fra objekter som finnes i flere delsøk 
+        self.antall = len( objekter )
+        return mydata 
 
 
 class nvdbFagObjekt():
@@ -1060,7 +1943,7 @@ def nvdbfagobjekt2records( feature_eller_liste, **kwargs):
     data = nvdbfagdata2records( feature_eller_liste, **kwargs) 
     return data 
 
-def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True, geometri=False, debug=False, tidspunkt=None, ignorerGeometriFeil=False, geometrikvalitet=False  ): 
+def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True, geometri=False, debug=False, tidspunkt=None, ignorerGeometriFeil=False, geometrikvalitet=False, uttrekker=None  ): 
     """
     Gjør om (liste med) nvdb fagdata fra NVDB api LES til records, dvs de-normalisert til dictionaries med enkel struktur. 
 
@@ -1111,8 +1994,14 @@ def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True
 
         geometrikvalitet=False, tar med kvalitetsparametre (metadata) for geometri (hvis den finnes). Forutsetter at geometri=True
 
+        uttrekker=None | egenskapsuttrekker laget med samme verdier for geometri og geometrikvalitet. Gjenbruk av 
+                    uttrekkeren på tvers av kall lønner seg når du kaller funksjonen for ett og ett objekt. 
+                    Default: Vi lager en ny uttrekker for hvert kall 
+
     RETURNS
-        liste med dictionaries (vegobjekt fra NVDB api LES i flatere dictionary-struktur)
+        liste med dictionaries (vegobjekt fra NVDB api LES i flatere dictionary-struktur). Med vegsegmenter=True 
+        deler radene for samme vegobjekt de samme egenskapsverdiene, så endrer du f.eks relasjoner-elementet 
+        for én rad så endres det for alle radene til dette objektet
 
     """
     if not isinstance( feature_eller_liste, list): 
@@ -1126,6 +2015,9 @@ def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True
     nvdbid_manglergeom = []
     terskler = [ 1000, 10000]
 
+    if uttrekker is None: 
+        uttrekker = egenskapsuttrekker( geometri=geometri, geometrikvalitet=geometrikvalitet )
+
     for count, feat in enumerate(feature_eller_liste): 
         
         if ignorerGeometriFeil or 'geometri' in feat.keys():
@@ -1141,13 +2033,31 @@ def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True
 
             # meta['metadata'] = feat['metadata']
 
-            egenskaper = egenskaper2records( feat['egenskaper'], relasjoner=False, geometri=geometri, geometrikvalitet=geometrikvalitet )
+            egenskaper = uttrekker( feat['egenskaper'] )
             if relasjoner and 'relasjoner' in feat.keys() and len( feat['relasjoner']) > 0: 
                 egenskaper['relasjoner'] = feat['relasjoner']
 
             egenskaper = merge_dicts( meta, egenskaper)
 
             if vegsegmenter: 
+
+                # Indeks over stedfestingene, nøkkel (veglenkesekvensid, relativPosisjon) for punkt og 
+                # (veglenkesekvensid, startposisjon, sluttposisjon) for strekning. Da slipper vi å lete gjennom 
+                # alle stedfestingene for hvert eneste vegsegment (som blir kvadratisk for lange objekter) 
+                # Hvert element i indeksen er ( nummer i listen med stedfestinger, stedfesting ), så vi kan beholde rekkefølgen.
+                stedfestingindeks = { }
+                svingstedfesting = None     # Siste stedfesting av typen Sving
+                svingnummer = None          # Nummer på første stedfesting av typen Sving
+                for nr, lok in enumerate( feat['lokasjon']['stedfestinger'] ): 
+                    if 'relativPosisjon' in lok: 
+                        stedfestingindeks.setdefault( ( lok.get( 'veglenkesekvensid' ), lok['relativPosisjon'] ), [] ).append( ( nr, lok ) )
+                    if 'type' in lok and lok['type'] == 'Sving': 
+                        svingstedfesting = lok 
+                        if svingnummer is None: 
+                            svingnummer = nr 
+                    elif 'startposisjon' in lok and 'sluttposisjon' in lok: 
+                        stedfestingindeks.setdefault( ( lok.get( 'veglenkesekvensid' ), lok['startposisjon'], lok['sluttposisjon'] ), [] ).append( ( nr, lok ) )
+
                 for seg in feat['vegsegmenter']:
 
                     # Kommenterer ut tidspunkt-logikk fordi NVDB api nå (per mai 2021) kun presenterer de vegsegmentene som er 
@@ -1201,34 +2111,38 @@ def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True
                         
                     s2['geometri'] = seg['geometri']['wkt']
 
-                    # Itererer over lokasjons-elementene for å finne evt sideposisjon og kjørefelt-stedfesting
-                    for lok in feat['lokasjon']['stedfestinger']: 
-                        if 'relativPosisjon' in seg:
-                            if lok['veglenkesekvensid'] == seg['veglenkesekvensid'] and lok['relativPosisjon'] == seg['relativPosisjon']: 
-                                if 'sideposisjon' in lok and isinstance( lok['sideposisjon'], str): 
-                                    s2['sideposisjon'] = lok['sideposisjon']
-                                if 'kjørefelt' in lok and isinstance( lok['kjørefelt'], list) and len( lok['kjørefelt'] ) > 0:
-                                    s2['stedfesting_felt'] = ','.join( lok['kjørefelt'])                                 
-                                if 'retning' in lok: 
-                                    s2['stedfesting_retning'] = lok['retning']
-                            
-                        elif 'type' in lok and lok['type'] == 'Sving': 
-                            # Forenklet behandling av svingerestriksjon
-                            s2['stedfesting'] = lok
-
-
-                        else: 
-                            if lok['veglenkesekvensid'] == seg['veglenkesekvensid'] and lok['startposisjon'] == seg['startposisjon'] and lok['sluttposisjon'] == seg['sluttposisjon']:
-                                if 'sideposisjon' in lok: 
-                                    s2['sideposisjon'] = lok['sideposisjon']
-                                if 'kjørefelt' in lok and isinstance( lok['kjørefelt'], list) and len( lok['kjørefelt'] ) > 0:
-                                    s2['stedfesting_felt'] = ','.join( lok['kjørefelt']) 
-                                if 'retning' in lok: 
-                                    s2['stedfesting_retning'] = lok['retning']
-
-                    egenskaper_kopi = deepcopy( egenskaper )
-                    egenskaper_kopi = merge_dicts( egenskaper_kopi, s2)
-                    mydata.append( egenskaper_kopi )
+                    # Slår opp i stedfestingsindeksen for å finne evt sideposisjon og kjørefelt-stedfesting. 
+                    # Hvis flere stedfestinger passer så vinner den siste, slik som i lokasjon-elementet
+                    if 'relativPosisjon' in seg:
+                        for nr, lok in stedfestingindeks.get( ( seg['veglenkesekvensid'], seg['relativPosisjon'] ), [] ): 
+                            if 'sideposisjon' in lok and isinstance( lok['sideposisjon'], str): 
+                                s2['sideposisjon'] = lok['sideposisjon']
+                            if 'kjørefelt' in lok and isinstance( lok['kjørefelt'], list) and len( lok['kjørefelt'] ) > 0:
+                                s2['stedfesting_felt'] = ','.join( lok['kjørefelt'])                                 
+                            if 'retning' in lok: 
+                                s2['stedfesting_retning'] = lok['retning']
+
+                    else: 
+                        treff = stedfestingindeks.get( ( seg['veglenkesekvensid'], seg.get( 'startposisjon' ), seg.get( 'sluttposisjon' ) ), [] )
+                        if svingstedfesting: 
+                            treff = sorted( treff + [ ( svingnummer, None ) ], key=lambda x : x[0] )
+
+                        for nr, lok in treff: 
+                            if lok is None: 
+                                # Forenklet behandling av svingerestriksjon
+                                s2['stedfesting'] = svingstedfesting
+                                continue 
+
+                            if 'sideposisjon' in lok: 
+                                s2['sideposisjon'] = lok['sideposisjon']
+                            if 'kjørefelt' in lok and isinstance( lok['kjørefelt'], list) and len( lok['kjørefelt'] ) > 0:
+                                s2['stedfesting_felt'] = ','.join( lok['kjørefelt']) 
+                            if 'retning' in lok: 
+                                s2['stedfesting_retning'] = lok['retning']
+
+                    # Grunn kopi: Radene for samme objekt deler egenskapsverdiene (inkl evt relasjoner-dictionary)
+                    # i stedet for at vi kopierer alt (deepcopy) for hvert eneste vegsegment
+                    mydata.append( { **egenskaper, **s2 } )
             else: 
                 egenskaper['vegsystemreferanser'] = ','.join([ d['kortform'] for d in feat['lokasjon']['vegsystemreferanser'] ] )
 
@@ -1276,6 +2190,42 @@ def nvdbfagdata2records( feature_eller_liste, vegsegmenter=True, relasjoner=True
     return mydata 
 
 
+def fra_sjekkpunkt( sjekkpunkt, forbindelse=None ): 
+    """
+    Lager søkeobjekt som fortsetter fra et sjekkpunkt, se nvdbVegnett.sjekkpunkt() 
+
+    ARGUMENTS
+        sjekkpunkt : dictionary fra sjekkpunkt(), eller navn på JSON-fil med sjekkpunkt (f.eks fra to_jsonl)
+
+    KEYWORDS
+        forbindelse : None eller apiforbindelse som skal brukes (f.eks med innlogging)
+
+    RETURNS
+        nvdbFagdata, nvdbVegnett eller nvdbNoder - objekt 
+    """
+    if isinstance( sjekkpunkt, str ): 
+        with open( sjekkpunkt, encoding='utf-8' ) as f: 
+            sjekkpunkt = json.load( f )
+
+    if forbindelse: 
+        miljo = None 
+    else: 
+        miljo = sjekkpunkt['miljo']
+
+    if sjekkpunkt['sokeobjekt'] == 'nvdbFagdata': 
+        sok = nvdbFagdata( sjekkpunkt['objekttype'], miljo=miljo, forbindelse=forbindelse )
+    elif sjekkpunkt['sokeobjekt'] == 'nvdbNoder': 
+        sok = nvdbNoder( miljo=miljo, forbindelse=forbindelse )
+    elif sjekkpunkt['sokeobjekt'] == 'nvdbVegnett': 
+        sok = nvdbVegnett( miljo=miljo, forbindelse=forbindelse )
+    else: 
+        raise ValueError( 'Ukjent søkeobjekt i sjekkpunkt: ' + str( sjekkpunkt['sokeobjekt'] ) )
+
+    sok.filterdata = sjekkpunkt['filter']
+    sok.respons = sjekkpunkt['respons']
+    sok.gjenoppta( sjekkpunkt )
+    return sok 
+
 def finnid(objektid, kunvegnett=False, kunfagdata=False, miljo=False): 
     """Henter NVDB objekt (enten lenkesekvens eller fagdata) ut fra objektID.
     Bruk nøkkelord kunvegnett=True eller kunfagdata=True for å avgrense til 
@@ -1289,8 +2239,10 @@ def finnid(objektid, kunvegnett=False, kunfagdata=False, miljo=False):
     miljø som skal brukes.
     """
     
-    # Dummy objekt for å gjenbruke anrops-funksjonene
-    b = nvdbFagdata(45)
+    # Dummy objekt for å gjenbruke anrops-funksjonene (nvdbVegnett trenger ikke datakatalogen), 
+    # men med samme accept-header (rev1) som nvdbFagdata 
+    b = nvdbVegnett()
+    b.headers['accept'] = 'application/vnd.vegvesen.nvdb-v3-rev1+json'
     if miljo:
         b.miljo( miljo)
     res = None
@@ -1323,6 +2275,34 @@ def finnid(objektid, kunvegnett=False, kunfagdata=False, miljo=False):
         
     return res
 
+def omrader( omradetype='fylker', forb=None ): 
+    """
+    Henter liste med områder (fylker, kommuner, kontraktsområder m.m.) fra NVDB api LES /omrader 
+
+    https://nvdbapiles-v3.atlas.vegvesen.no/dokumentasjon/openapi/#/Områder 
+
+    ARGUMENTS: 
+        None
+
+    KEYWORDS 
+        omradetype - string, en av 'fylker' (default), 'kommuner', 'kontraktsomrader', 'riksvegruter', 
+                     'vegavdelinger' m.fl. 
+
+        forb - En instans av nvdbapiforbindelse. Angis dersom du skal bruke et annet miljø enn PROD
+
+    RETURNS 
+        liste med dictionaries, en per område. Tom liste hvis det feiler 
+    """
+
+    if not forb: 
+        forb = apiforbindelse.apiforbindelse()
+    r = forb.les( '/omrader/' + omradetype )
+    if r.ok: 
+        return dekodjson( r.content )
+
+    print( 'omrader: feilkode', r.status_code, r.url )
+    return [] 
+
 def vegrefpunkt( vref, retur='veglenkeposisjon', forb=None ): 
     """
     Slår opp vegsystemreferanse i NVDBAPILES V3. Returnerer koordinater, veglenkeposisjon eller hele datastrukturen. 
@@ -1349,7 +2329,7 @@ def vegrefpunkt( vref, retur='veglenkeposisjon', forb=None ):
     params = { 'vegsystemreferanse' : vref }
     r = forb.les('/veg', params=params)
     if r.ok: 
-        data = r.json() 
+        data = dekodjson( r.content ) 
         if 'vegle' in retur.lower()  and 'veglenkesekvens' in data.keys() and 'kortform' in data['veglenkesekvens'].keys(): 
             return data['veglenkesekvens']['kortform']
         elif retur.lower() == 'wkt' and 'geometri' in data.keys() and 'wkt' in data['geometri'].keys(): 
@@ -1385,7 +2365,7 @@ def veglenkepunkt( vpos, retur='wkt', forb=None ):
     params = { 'veglenkesekvens' : vpos }
     r = forb.les('/veg', params=params)
     if r.ok: 
-        data = r.json() 
+        data = dekodjson( r.content ) 
         if 'ref' in retur.lower()  and 'vegsystemreferanse' in data.keys() and 'kortform' in data['vegsystemreferanse'].keys(): 
             return data['vegsystemreferanse']['kortform']
         elif retur.lower() == 'wkt' and 'geometri' in data.keys() and 'wkt' in data['geometri'].keys(): 
@@ -1478,7 +2458,7 @@ def hentrute( pos1, pos2, forb=None, droppRiksvegruter=True, droppKontrakter=Tru
 
     r = forb.les( '/beta/vegnett/rute', params=params )
     if r.ok: 
-        data = r.json()
+        data = dekodjson( r.content )
 
         # Ikke funnet rute? Prøver med større bbox 
         if 'IKKE' in data['metadata']['status_tekst'].upper() and (not 'omkrets' in params.keys() or params['omkrets'] < 10000): 
@@ -1487,7 +2467,7 @@ def hentrute( pos1, pos2, forb=None, droppRiksvegruter=True, droppKontrakter=Tru
 
         else: 
             for segment in data['vegnettsrutesegmenter']: 
-                v1 = flatutvegnettsegment( segment, droppRiksvegruter=droppRiksvegruter, droppKontrakter=droppKontrakter )
+                v1 = flatutvegnettsegment( segment, droppRiksvegruter=droppRiksvegruter, droppKontrakter=droppKontrakter, kopier=False )
                 returdata.append( v1 )
 
         if len( returdata ) == 0: 
@@ -1497,7 +2477,29 @@ def hentrute( pos1, pos2, forb=None, droppRiksvegruter=True, droppKontrakter=Tru
 
     return returdata 
 
-def flatutvegnettsegment( vegnettsegment, droppRiksvegruter=True, droppKontrakter=True, kvalitetsparametre=False  ): 
+# Ferdig kompilert plan for flatutvegnettsegment: ( nytt navn, del av vegsystemreferanse, element ). Noen av
+# disse verdiene hentes fra strekning, men overskrives med data fra kryssdel eller sideanlegg dersom de finnes, 
+# så rekkefølgen er viktig. Del nummer 0=vegsystem, 1=strekning, 2=kryssystem, 3=sideanlegg 
+_VEGSYSTEMREFERANSEPLAN = ( ( 'vegkategori',     0, 'vegkategori'     ), 
+                            ( 'fase',            0, 'fase'            ), 
+                            ( 'nummer',          0, 'nummer'          ), 
+                            ( 'strekning',       1, 'strekning'       ), 
+                            ( 'delstrekning',    1, 'delstrekning'    ), 
+                            ( 'ankerpunktmeter', 1, 'meter'           ), 
+                            ( 'kryssdel',        2, 'kryssdel'        ), 
+                            ( 'sideanleggsdel',  3, 'sideanleggsdel'  ), 
+                            ( 'fra_meter',       1, 'fra_meter'       ), 
+                            ( 'til_meter',       1, 'til_meter'       ), 
+                            ( 'trafikantgruppe', 1, 'trafikantgruppe' ), 
+                            ( 'fra_meter',       2, 'fra_meter'       ), 
+                            ( 'til_meter',       2, 'til_meter'       ), 
+                            ( 'trafikantgruppe', 2, 'trafikantgruppe' ), 
+                            ( 'fra_meter',       3, 'fra_meter'       ), 
+                            ( 'til_meter',       3, 'til_meter'       ), 
+                            ( 'trafikantgruppe', 3, 'trafikantgruppe' ), 
+                            ( 'adskilte_lop',    1, 'adskilte_løp'    ) )
+
+def flatutvegnettsegment( vegnettsegment, droppRiksvegruter=True, droppKontrakter=True, kvalitetsparametre=False, kopier=True  ): 
     """
     Flater ut et veglenkesegment til en forenklet dictionary-struktur 
 
@@ -1519,74 +2521,53 @@ def flatutvegnettsegment( vegnettsegment, droppRiksvegruter=True, droppKontrakte
 
         kvalitetsparametre : False (default), sett til True hvis du ønsker å bevare kvalitetsparametre
 
+        kopier : True (default), vi lager en grunn kopi av vegnettsegment. Sett til False hvis du ikke trenger 
+                                 vegnettsegment etterpå, da endrer vi vegnettsegment direkte (raskere) 
+
     RETURNS 
-        dictionary, input-data med vegnettsinformasjon omarbeidet til flat struktur 
+        dictionary, input-data med vegnettsinformasjon omarbeidet til flat struktur. Med kopier=True (grunn kopi) 
+        deler resultatet evt underliggende dictionaries og lister (f.eks vegsystemreferanse) med vegnettsegment
     """
 
-    v1 = deepcopy( vegnettsegment ) 
+    if kopier: 
+        v1 = dict( vegnettsegment )
+    else: 
+        v1 = vegnettsegment 
 
-    metadata = v1.pop( 'metadata', { } )
-    v1.update( metadata)
-    vr = 'vegsystemreferanse'
-    vsys = 'vegsystem'
-    strek = 'strekning'
-    kryss = 'kryssystem'
-    sidea = 'sideanlegg'
+    metadata = v1.pop( 'metadata', None )
+    if metadata: 
+        v1.update( metadata)
 
+    geometri = v1.get( 'geometri' )
     if kvalitetsparametre: 
-        v1['geometri_kvalitet']       = v1['geometri'].pop( 'kvalitet', None  )
-        v1['geometri_datafangstdato'] = v1['geometri'].pop( 'datafangstdato', None )
-        v1['geometri_temakode']       = v1['geometri'].pop( 'temakode', None ) 
-
-    struktur = [ 
-        { 'navn' : 'medium',    'verdi' : { 'l1' : 'geometri',    'l2' : 'medium'  }}, 
-        { 'navn' : 'geometri',  'verdi' : { 'l1' : 'geometri',    'l2' : 'wkt'  }}, # NB! Geometri-dictionary byttes nå ut med WKT-tekststreng!
-                                                                                    # Hvis du vil ha mer data ut av geometri-elementet 
-                                                                                    # må du gjøre det FØR denne operasjonen (eller ta vare på data eksplisitt)
-        { 'navn' : 'vref',      'verdi' : { 'l1' : vr,            'l2' : 'kortform'  }}
-    ]
-
-    for mykey in struktur: 
-        try: 
-                v1[mykey['navn']] = v1[mykey['verdi']['l1']][mykey['verdi']['l2']]
-        except (KeyError, TypeError): 
-            pass                 
+        geometri = v1['geometri'] = dict( geometri ) if kopier else geometri
+        v1['geometri_kvalitet']       = geometri.pop( 'kvalitet', None  )
+        v1['geometri_datafangstdato'] = geometri.pop( 'datafangstdato', None )
+        v1['geometri_temakode']       = geometri.pop( 'temakode', None ) 
+
+    # NB! Geometri-dictionary byttes nå ut med WKT-tekststreng! Hvis du vil ha mer data ut av geometri-elementet 
+    # må du gjøre det FØR denne operasjonen (eller ta vare på data eksplisitt)
+    if isinstance( geometri, dict ): 
+        if 'medium' in geometri: 
+            v1['medium'] = geometri['medium']
+        if 'wkt' in geometri: 
+            v1['geometri'] = geometri['wkt']
+
+    vref = v1.get( 'vegsystemreferanse' )
+    if isinstance( vref, dict ) and 'kortform' in vref: 
+        v1['vref'] = vref['kortform']
+
     # Gjør om feltoversikt fra liste-objekt til (kommaseparert) ren tekst 
-    try: 
+    if 'feltoversikt' in v1: 
         v1['feltoversikt']  = ','.join( v1['feltoversikt'])
-    except KeyError: 
-        pass 
-
-    # Noen av disse verdiene hentes fra strekning, men overskrives med  data
-    # fra kryssdel eller sidenanlegg dersom de finnes. 
-    # Vi følger python-idomet med å prøve om verdiene er der og ubekymret springe 
-    # videre hvis de ikke finnes. 
-    struktur = [{ 'navn' : 'vegkategori'     , 'verdi' :  { 'l1' : vr, 'l2' : vsys, 'l3' : 'vegkategori'        }}, 
-                { 'navn' : 'fase'            , 'verdi' :  { 'l1' : vr, 'l2' : vsys, 'l3' : 'fase'               }},  
-                { 'navn' : 'nummer'          , 'verdi' :  { 'l1' : vr, 'l2' : vsys, 'l3' : 'nummer'             }}, 
-                { 'navn' : 'strekning'       , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'strekning'         }}, 
-                { 'navn' : 'delstrekning'    , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'delstrekning'      }}, 
-                { 'navn' : 'ankerpunktmeter' , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'meter'             }}, 
-                { 'navn' : 'kryssdel'        , 'verdi' :  { 'l1' : vr, 'l2' : kryss, 'l3' : 'kryssdel'          }}, 
-                { 'navn' : 'sideanleggsdel'  , 'verdi' :  { 'l1' : vr, 'l2' : sidea, 'l3' : 'sideanleggsdel'    }},   
-                { 'navn' : 'fra_meter'       , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'fra_meter'         }}, 
-                { 'navn' : 'til_meter'       , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'til_meter'         }}, 
-                { 'navn' : 'trafikantgruppe' , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'trafikantgruppe'   }}, 
-                { 'navn' : 'fra_meter'       , 'verdi' :  { 'l1' : vr, 'l2' : kryss, 'l3' : 'fra_meter'         }}, 
-                { 'navn' : 'til_meter'       , 'verdi' :  { 'l1' : vr, 'l2' : kryss, 'l3' : 'til_meter'         }}, 
-                { 'navn' : 'trafikantgruppe' , 'verdi' :  { 'l1' : vr, 'l2' : kryss, 'l3' : 'trafikantgruppe'   }}, 
-                { 'navn' : 'fra_meter'       , 'verdi' :  { 'l1' : vr, 'l2' : sidea, 'l3' : 'fra_meter'         }}, 
-                { 'navn' : 'til_meter'       , 'verdi' :  { 'l1' : vr, 'l2' : sidea, 'l3' : 'til_meter'         }}, 
-                { 'navn' : 'trafikantgruppe' , 'verdi' :  { 'l1' : vr, 'l2' : sidea, 'l3' : 'trafikantgruppe'   }}, 
-                { 'navn' : 'adskilte_lop'    , 'verdi' :  { 'l1' : vr, 'l2' : strek, 'l3' : 'adskilte_løp'      }}
-                ]
-
-    for mykey in struktur: 
-        try: 
-            v1[mykey['navn']] = v1[mykey['verdi']['l1']][mykey['verdi']['l2']][mykey['verdi']['l3']]
-        except KeyError: 
-            pass 
-    
+
+    if vref: 
+        deler = ( vref.get( 'vegsystem' ), vref.get( 'strekning' ), vref.get( 'kryssystem' ), vref.get( 'sideanlegg' ) )
+        for navn, nr, element in _VEGSYSTEMREFERANSEPLAN: 
+            vrdel = deler[nr]
+            if vrdel and element in vrdel: 
+                v1[navn] = vrdel[element]
+
     if droppKontrakter: 
         v1.pop( 'kontraktsområder', None)
     if droppRiksvegruter: 
@@ -1608,6 +2589,8 @@ def egenskaper2records( egenskaper, relasjoner=False, geometri=False, geometrikv
 
     NB! Hopper over egenskaper av typen Liste og Struktur
 
+    Selve jobben gjøres av egenskapsuttrekker, som du bør bruke direkte hvis du skal oversette mange objekter. 
+
     ARGUMENTS
         egenskaper: Liste med egenskapverdier, hentet fra NVDB api LES
 
@@ -1622,20 +2605,95 @@ def egenskaper2records( egenskaper, relasjoner=False, geometri=False, geometrikv
     RETURNS 
         dictionary med egenskapsnavn og verdier 
     """
-    data = {}
+    data = egenskapsuttrekker( geometri=geometri, geometrikvalitet=geometrikvalitet )( egenskaper )
+
+    if relasjoner: 
+        warn( 'Uthenting av relasjoner fra egenskapverdier er ikke implementert (ennå). Bruk to_records() eller nvdbfagdata2records()')
+
+    return data 
+
+class egenskapsuttrekker(): 
+    """
+    Ferdig kompilert utgave av egenskaper2records for én objekttype (evt flere)
+
+    Vi sjekker egenskapstype, navn og om det er geometri én gang per egenskapstype, ut fra definisjonen i 
+    datakatalogen (nvdbFagdata.objektTypeDef), og slår deretter opp hver egenskapverdi i en dictionary med 
+    egenskapstype-ID. Egenskapstyper som ikke finnes i definisjonen kompileres første gang vi ser dem. 
+    egenskaper2records bruker en egenskapsuttrekker uten definisjon. 
+
+    EKSEMPEL
+        uttrekker = egenskapsuttrekker( sok.objektTypeDef, geometri=True )
+        rad = uttrekker( feat['egenskaper'] )    # Samme som egenskaper2records( feat['egenskaper'], geometri=True )
+
+    Brukes av nvdbfagdata2records, og av nvdbFagdata.to_records via nvdbFagdata.uttrekker() 
+    """
+    HOPPOVER = 0 
+    VERDI    = 1 
+    BINAER   = 2 
+    VEDLEGG  = 3 
 
-    for eg in egenskaper: 
-        if eg['id'] < 100000 and not eg['egenskapstype'].lower() in ['struktur', 'liste']: 
+    def __init__( self, objekttypedefinisjon=None, geometri=False, geometrikvalitet=False ): 
+        """
+        ARGUMENTS
+            None 
 
-            if eg['navn'] == 'Vedlegg':
-                vedleggnavn = eg['navn']
+        KEYWORDS
+            objekttypedefinisjon : None eller definisjon av objekttypen fra datakatalogen (nvdbFagdata.objektTypeDef)
+
+            geometri, geometrikvalitet : Som for egenskaper2records
+        """
+        self.geometri = geometri 
+        self.geometrikvalitet = geometrikvalitet 
+        self.planer = { }       # egenskapstype-ID => ( kolonnenavn, handling, ta med kvalitet for egengeometri )
+        self.datatyper = { }    # kolonnenavn => datatype, se kolonner.py 
+        if objekttypedefinisjon: 
+            for eg in objekttypedefinisjon.get( 'egenskapstyper', [] ): 
+                self.kompiler( eg )
+
+    def kompiler( self, eg ): 
+        """
+        Finner ut hva vi skal gjøre med egenskapstypen eg (fra datakatalogen eller en egenskapverdi), og husker det
+        """
+        navn = eg['navn']
+        geometriegenskap = 'geometri' in navn.lower()
+        if eg['id'] >= 100000 or eg.get( 'egenskapstype', '' ).lower() in [ 'struktur', 'liste' ]: 
+            handling = self.HOPPOVER 
+        elif navn == 'Vedlegg': 
+            handling = self.VEDLEGG 
+        elif geometriegenskap and not self.geometri: 
+            handling = self.HOPPOVER 
+        elif eg.get( 'egenskapstype' ) == 'Binær': 
+            handling = self.BINAER 
+        else: 
+            handling = self.VERDI 
+
+        if handling != self.HOPPOVER: 
+            self.datatyper[navn] = kolonner.egenskapsdatatype( eg )
+        plan = ( navn, handling, self.geometrikvalitet and geometriegenskap )
+        self.planer[eg['id']] = plan 
+        return plan 
+
+    def __call__( self, egenskaper ): 
+        """
+        Oversetter liste med egenskapverdier til dictionary, se egenskaper2records
+        """
+        data = {}
+        planer = self.planer 
+        for eg in egenskaper: 
+            plan = planer.get( eg['id'] )
+            if plan is None: 
+                plan = self.kompiler( eg )
+            navn, handling, kvalitet = plan 
+
+            if handling == self.HOPPOVER: 
+                continue 
+
+            elif handling == self.VEDLEGG: 
+                vedleggnavn = navn 
                 count = 0 
-                # Legger til rette for at vi kan ha en liste med vedlegg (vedlegg1, vedlegg2, ...)
-                # Bør testes før vi stoler 100% på denne funksjonen, gjetter
-                # litt i blinde her. 
-                while vedleggnavn in data.keys():
+                while vedleggnavn in data: 
                     count += 1
-                    vedleggnavn = eg['navn'] + str( count )
+                    vedleggnavn = navn + str( count )
                     print( "Flere vedlegg (eksperimentelt!", vedleggnavn)
                     print( json.dumps( eg, indent=4 ))
 
@@ -1645,28 +2703,32 @@ def egenskaper2records( egenskaper, relasjoner=False, geometri=False, geometrikv
                     print( 'Primitiv vedleggshåndtering, denne skjønte jeg ikke:')
                     print( json.dumps( eg, indent=4 ))
 
-            # Skal vi ignorere geometri-egenskaper? I så fall er nøkkelord geometri==False, og vi 
-            # hopper over de egenskapene som sier noe om egengeometri.  
-            elif geometri or not 'geometri' in eg['navn'].lower(): 
-                if 'egenskapstype' in eg.keys() and eg['egenskapstype'] == 'Binær' and 'href' in eg.keys(): 
-                    data[eg['navn']] = eg['href']
-                else: 
-                    try: 
-                        data[eg['navn']] = eg['verdi']
-                    except KeyError:
-                        print( 'Fant ingen verdi i denne egenskapen, ignorerer:\n', json.dumps( eg, indent=4) )
-                        # TODO må kanskje gå gjennom alle egenskaptype-varianter mer i detalj og eksplisitt? 
+            elif handling == self.BINAER and 'href' in eg: 
+                data[navn] = eg['href']
 
-                    else: 
-                        # Føyer på kvalitetsparametre geometri (hvis vi er bedt om det, og hvis den finnes)
-                        if geometrikvalitet and 'geometri' in eg['navn'].lower() and 'kvalitet' in eg.keys(): 
-                            data[eg['navn']+'_kvalitet'] = eg['kvalitet']
+            elif 'verdi' in eg: 
+                data[navn] = eg['verdi']
+                if kvalitet and 'kvalitet' in eg: 
+                    data[navn+'_kvalitet'] = eg['kvalitet']
 
-    if relasjoner: 
-        warn( 'Uthenting av relasjoner fra egenskapverdier er ikke implementert (ennå). Bruk to_records() eller nvdbfagdata2records()')
+            else: 
+                print( 'Fant ingen verdi i denne egenskapen, ignorerer:\n', json.dumps( eg, indent=4) )
+
+        return data 
+
+def delibolker( rader, bolk ): 
+    """
+    Deler rader (liste, generator e.l.) opp i lister med inntil bolk elementer. Brukes av iter_records
+    """
+    liste = []
+    for rad in rader: 
+        liste.append( rad )
+        if len( liste ) >= bolk: 
+            yield liste 
+            liste = []
+    if liste: 
+        yield liste 
 
-    return data 
-            
 def merge_dicts(*dict_args):
     """
     Python < 3.5 kompatibel kode for å slå sammen to eller flere dict. 
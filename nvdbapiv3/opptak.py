@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Opptak og avspilling av http-trafikk mot NVDB api, for kjøring uten nett (testing, ytelsesmåling)
+
+opptak - Klasse som lagrer par av forespørsel og respons fra apiforbindelse.les som JSON-filer i en katalog
+(modus 'opptak'), og som spiller dem av igjen uten å spørre NVDB api (modus 'avspilling').
+
+Nøkkel for hver forespørsel er sti og spørreparametre (fra URL og params, sortert) pluss http headeren Accept.
+Vertsnavnet er IKKE med i nøkkelen, så opptak fra ett miljø kan spilles av mot et annet, f.eks med lokalserver.py
+
+Eksempel:
+
+    forb = apiforbindelse()
+    forb.taopp( 'opptak_bomstasjoner' )
+    sok = nvdbFagdata( 45 )
+    sok.forbindelse = forb
+    data = sok.to_records()
+
+    # Senere, uten nett:
+    forb = apiforbindelse()
+    forb.spillav( 'opptak_bomstasjoner' )
+    ...
+
+"""
+import base64
+import hashlib
+import json
+import os
+from urllib.parse import urlsplit, parse_qsl
+
+from .mellomlager import lagrespons, headerverdi
+
+
+class opptak( ):
+    """
+    Lagrer og spiller av http-responser fra/til katalog på disk
+    """
+
+    def __init__( self, katalog, modus='opptak' ):
+        """
+        Arguments:
+            katalog : string, katalog der opptakene lagres (opprettes hvis den ikke finnes)
+
+        Keywords:
+            modus : 'opptak' (default) eller 'avspilling'
+        """
+        if not modus in [ 'opptak', 'avspilling' ]:
+            raise ValueError( 'Ukjent modus ' + str( modus ) + ', lovlige valg: opptak, avspilling' )
+
+        self.katalog = katalog
+        self.modus = modus
+        self.antallLagret = 0
+        self.antallAvspilt = 0
+        self.antallMangler = 0
+        os.makedirs( katalog, exist_ok=True )
+
+    @staticmethod
+    def lagnokkel( url, params=None, headers=None ):
+        """
+        Lager nøkkel ut fra sti og spørreparametre (uten vertsnavn) og http headeren Accept (den som faktisk
+        sendes, dvs siste forekomst uansett store og små bokstaver, se mellomlager.headerverdi)
+        """
+        deler = urlsplit( url )
+        parametre = parse_qsl( deler.query, keep_blank_values=True )
+        for nokkel, verdi in ( params or {} ).items():
+            if verdi is None:
+                continue
+            if isinstance( verdi, ( list, tuple ) ):
+                parametre.extend( [ ( nokkel, str( x ) ) for x in verdi ] )
+            else:
+                parametre.append( ( nokkel, str( verdi ) ) )
+
+        tekst = json.dumps( [ deler.path.rstrip( '/' ), sorted( parametre ), headerverdi( headers, 'Accept' ) ] )
+        return hashlib.sha256( tekst.encode( 'utf-8' ) ).hexdigest()[:40]
+
+    def filnavn( self, nokkel ):
+        return os.path.join( self.katalog, nokkel + '.json' )
+
+    def lagre( self, url, params, headers, r ):
+        """
+        Lagrer respons r (requests.Response) for forespørsel ( url, params, headers )
+        """
+        nokkel = self.lagnokkel( url, params=params, headers=headers )
+        svarheadere = { k : v for k, v in r.headers.items()
+                            if k.lower() not in [ 'content-encoding', 'transfer-encoding', 'content-length', 'connection' ] }
+        data = { 'url' : r.url, 'params' : params, 'status' : r.status_code, 'headers' : svarheadere }
+        try:
+            data['innhold'] = r.content.decode( 'utf-8' )
+        except UnicodeDecodeError:
+            data['innhold_base64'] = base64.b64encode( r.content ).decode( 'ascii' )
+
+        midlertidig = self.filnavn( nokkel ) + '.tmp'
+        with open( midlertidig, 'w', encoding='utf-8' ) as f:
+            json.dump( data, f, ensure_ascii=False )
+        os.replace( midlertidig, self.filnavn( nokkel ) )
+        self.antallLagret += 1
+
+    def hent( self, nokkel ):
+        """
+        Leser opptak med angitt nøkkel. Returnerer dictionary med url, status, headers og innhold (bytes), evt None
+        """
+        if not os.path.exists( self.filnavn( nokkel ) ):
+            return None
+
+        with open( self.filnavn( nokkel ), encoding='utf-8' ) as f:
+            data = json.load( f )
+
+        if 'innhold_base64' in data:
+            data['innhold'] = base64.b64decode( data.pop( 'innhold_base64' ) )
+        else:
+            data['innhold'] = data['innhold'].encode( 'utf-8' )
+        return data
+
+    def spillav( self, url, params=None, headers=None ):
+        """
+        Returnerer lagret respons (requests.Response) for forespørselen. Mangler opptaket får du respons med statuskode 404
+        """
+        data = self.hent( self.lagnokkel( url, params=params, headers=headers ) )
+        if data is None:
+            self.antallMangler += 1
+            print( 'Fant ikke opptak for', url, params )
+            return lagrespons( url, 404, { 'Content-Type' : 'text/plain' }, b'Mangler opptak for denne foresporselen' )
+
+        self.antallAvspilt += 1
+        return lagrespons( data['url'], data['status'], data['headers'], data['innhold'] )
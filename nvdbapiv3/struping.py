@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Struping av trafikken mot NVDB api LES på klientsiden
+
+struping - Klasse som begrenser både antall kall per sekund (token bucket) og antall samtidige kall
+(kall "i lufta"). Hører til en apiforbindelse, og deles dermed av alle søkeobjekter, tråder og kloner
+(f.eks fra nvdbFagdata.to_records_parallell) som bruker samme forbindelse.
+
+Tilpasser seg automatisk (AIMD): Når NVDB api svarer 429 Too Many Requests eller 503 Service Unavailable så
+halveres raten, og for hvert vellykket kall økes raten litt igjen, opp til maksrate.
+
+Eksempel:
+
+    forb = apiforbindelse()
+    forb.strup( rate=10, maksSamtidige=4 )
+
+    sok = nvdbFagdata( 45 )
+    sok.forbindelse = forb
+    data = sok.to_records_parallell( antallTraader=8 )
+
+"""
+import threading
+import time
+
+
+class struping( ):
+    """
+    Token bucket for kall per sekund, kombinert med grense for antall samtidige kall
+    """
+
+    def __init__( self, rate=10, maksSamtidige=4, kapasitet=None, minrate=0.2, okning=0.1, tilbakestatus=(429, 503) ):
+        """
+        Arguments:
+            None
+
+        Keywords:
+            rate : float, maksimalt antall kall per sekund (øvre grense for automatisk tilpasning). Default 10
+
+            maksSamtidige : int, maksimalt antall samtidige kall. Default 4
+
+            kapasitet : Antall kall vi kan gjøre i en kort "rykk" før raten begrenser. Default = rate
+
+            minrate : float, laveste rate vi kan strupe ned til ved 429/503. Default 0.2 kall per sekund
+
+            okning : float, raten økes med så mye for hvert vellykkede kall. Default 0.1
+
+            tilbakestatus : http statuskoder som halverer raten. Default (429, 503)
+        """
+        self.maksrate = rate
+        self.rate = rate
+        self.minrate = minrate
+        self.okning = okning
+        self.kapasitet = kapasitet if kapasitet else max( 1, rate )
+        self.maksSamtidige = maksSamtidige
+        self.tilbakestatus = tilbakestatus
+        self.tokens = self.kapasitet
+        self.sistfylt = time.monotonic()
+        self.iluften = 0
+        self.antallKall = 0
+        self.antallStrupet = 0
+        self.betingelse = threading.Condition()
+
+    def inn( self ):
+        """
+        Venter til vi har lov å gjøre et nytt kall (ledig plass og token). Må etterfølges av ut()
+        """
+        with self.betingelse:
+            while True:
+                vent = self.__provinn()
+                if vent == 0:
+                    return
+                self.betingelse.wait( timeout=vent )
+
+    def provinn( self ):
+        """
+        Som inn(), men venter ikke. Brukes av asynkron kode
+
+        Returns:
+            0 hvis vi fikk plass (må etterfølges av ut() ), ellers antall sekunder vi bør vente før nytt forsøk
+        """
+        with self.betingelse:
+            vent = self.__provinn()
+        return 0.05 if vent is None else vent
+
+    def ut( self, statuskode=None ):
+        """
+        Frigir plassen etter et kall og tilpasser raten etter statuskoden. statuskode=None betyr brudd på forbindelsen
+        """
+        with self.betingelse:
+            self.iluften -= 1
+            if statuskode in self.tilbakestatus:
+                self.rate = max( self.minrate, self.rate / 2 )
+                self.antallStrupet += 1
+            elif statuskode is not None and statuskode < 400:
+                self.rate = min( self.maksrate, self.rate + self.okning )
+            self.betingelse.notify()
+
+    def statistikk( self ):
+        """
+        Returnerer dictionary med gjeldende rate, antall kall, antall ganger raten er halvert og antall kall i lufta
+        """
+        return { 'rate' : round( self.rate, 3 ), 'antallKall' : self.antallKall,
+                 'antallStrupet' : self.antallStrupet, 'iluften' : self.iluften }
+
+    def __provinn( self ):
+        """
+        Tar plass og token hvis mulig. Forutsetter at vi har låst self.betingelse
+
+        Returns:
+            0 hvis vi fikk plass, None hvis alle plasser er opptatt (vent på ut() ), ellers sekunder til neste token
+        """
+        if self.iluften >= self.maksSamtidige:
+            return None
+
+        naa = time.monotonic()
+        self.tokens = min( self.kapasitet, self.tokens + ( naa - self.sistfylt ) * self.rate )
+        self.sistfylt = naa
+        if self.tokens < 1:
+            return ( 1 - self.tokens ) / self.rate
+
+        self.tokens -= 1
+        self.iluften += 1
+        self.antallKall += 1
+        return 0
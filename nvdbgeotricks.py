@@ -34,9 +34,12 @@ def nvdbsok2GDF( sokeobjekt, **kwargs ):
     """
     Konverterer et NVDB søkeobjekt til geodataframe 
 
-    Eventuelle nøkkelord-argumenter sendes til funksjonen sokeobjekt.to_records( )
+    Eventuelle nøkkelord-argumenter sendes til funksjonen sokeobjekt.to_dataframe( ) (evt to_records( ) )
     """
-    mydf = pd.DataFrame( sokeobjekt.to_records( **kwargs ))
+    if hasattr( sokeobjekt, 'to_dataframe' ): 
+        mydf = sokeobjekt.to_dataframe( **kwargs )
+    else: 
+        mydf = pd.DataFrame( sokeobjekt.to_records( **kwargs ))
     mydf['geometry'] = mydf['geometri'].apply( wkt.loads )
     myGDF = gpd.GeoDataFrame( mydf, geometry='geometry', crs=5973)
     return myGDF
@@ -155,13 +158,18 @@ def records2gpkg( minliste, filnavn, lagnavn ):
     """
     Tar en liste med records (dictionaries) a la dem vi får fra nvdbapiv3.to_records() og skriver til geopackage
 
+    Kan også være en DataFrame, f.eks fra nvdbapiv3.to_dataframe() 
+
     Forutsetning: Alle records har et "geometri"-element med WKT-streng og inneholder ingen lister. 
     Vi tester for en del kjente snublefeller mhp disse forutsetningene, men ikke alle. 
     """
     if len( minliste ) == 0: 
         raise ValueError( 'nvdbgeotrics.records2gpkg: Tom liste som inngangsverdi, funker dårlig')
 
-    mindf = pd.DataFrame( minliste )
+    if isinstance( minliste, pd.DataFrame ): 
+        mindf = minliste.copy( deep=False )
+    else: 
+        mindf = pd.DataFrame( minliste )
     # Må trickse litt for å unngå navnekollisjon
     kolonner = list( mindf.columns )
     lowerkolonner = [ x.lower() for x in kolonner ]
@@ -248,7 +256,7 @@ def nvdb2gpkg( objekttyper, filnavn='datadump', mittfilter=None, vegnett=True, v
         print( 'Henter', stat['antall'],  'forekomster av objekttype', sok.objektTypeId, objtypenavn )
         lagnavn = 'type' + str(enObjTypeId) + '_' + nvdbapiv3.esriSikkerTekst( objtypenavn.lower() ) 
 
-        rec = sok.to_records( vegsegmenter=vegsegmenter, geometri=geometri )
+        rec = sok.to_dataframe( vegsegmenter=vegsegmenter, geometri=geometri )
 
         # Lagringsrutine skilt ut med funksjonen records2gpkg, IKKE TESTET (men bør gå greit) 
         if len( rec ) > 0: 
@@ -264,8 +272,7 @@ def nvdb2gpkg( objekttyper, filnavn='datadump', mittfilter=None, vegnett=True, v
             junk = mittfilter.pop( 'overlapp', None)
             veg.filter( mittfilter )
         print( 'Henter vegnett')
-        rec = veg.to_records()
-        mindf = pd.DataFrame( rec)
+        mindf = veg.to_dataframe()
         mindf['geometry'] = mindf['geometri'].apply( wkt.loads )
         mindf.drop( columns='geometri', inplace=True)
         minGdf = gpd.GeoDataFrame( mindf, geometry='geometry', crs=5973 )       
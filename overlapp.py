@@ -10,16 +10,14 @@ og sikrer minimalt med kluss, samt ikke minst: Eventuelt kluss lar seg greit rep
 uten at det påvirker hele python-installasjonen din. 
 """
 import re
-import pdb
+import os
 from copy import deepcopy
-import sqlite3
-import json
 import string
-from sys import prefix
-from xmlrpc.client import Boolean 
 from numbers import Number
 from importlib.metadata import version
+from concurrent.futures import ProcessPoolExecutor
 
+import shapely
 from shapely import wkt 
 from shapely.geometry import Point, LineString
 # from shapely.ops import unary_union
@@ -68,8 +66,8 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
     ARGUMENTS
         dfA, dfB - Pandas dataframe eller Geopandas geodataframe, eller kombinasjon. Returverdi blir samme type som dfA. 
 
-        Merk at geodataframe må gjøres om til dataframe for at SQL-implementasjonen skal fungere. Så man kan få en mer effektiv verdikjede ved å 
-        konvertere til geodataframe etterpå. 
+        Geometri kan være shapely-objekter eller Well Known Text (WKT). Klippet geometri får samme form som geometrien i dfA. 
+        Overlapp finnes med funksjonen finnoverlappindekser, uten at vi trenger å konvertere data til tekst (WKT, JSON) underveis. 
 
     KEYWORDS
         prefixA=None Valgfri tekststreng med det prefikset som skal føyes til navn i dfA, eller det prefikset som 
@@ -113,9 +111,9 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
     join = join.upper()
     assert join in jointypes, f"Ukjent join type {join}, må være en av tekstveridene {jointypes}"
 
-    # Lager kopier, så vi ikke gir kjipe sideeffekter på orginaldata utafor funksjonen 
-    dfA = dfA.copy()
-    dfB = dfB.copy()
+    # Lager (grunne) kopier, så vi ikke gir kjipe sideeffekter på orginaldata utafor funksjonen 
+    dfA = dfA.copy( deep=False )
+    dfB = dfB.copy( deep=False )
 
     col_vlinkA  = 'veglenkesekvensid'   
     col_startA  = 'startposisjon'   
@@ -207,8 +205,7 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
     if crs != 5973: 
         print( f"Advarsel - CRS={crs} avviker fra 5973, som er det vi vanligvis bruker. Sikker på at det er riktig?")
 
-    # Må gjøre om GeoDataFrame => DataFrame
-    # Returnerer GeodataFrame hvis dfA er GDF
+    # Jobber med DataFrame internt, returnerer GeodataFrame hvis dfA er GDF
     returner_GeoDataFrame = False 
     if isinstance( dfA, gpd.geodataframe.GeoDataFrame): 
         if isinstance( dfA.crs, pyproj.crs.crs.CRS) and dfA.crs != crs:
@@ -220,22 +217,8 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
     if isinstance( dfB, gpd.geodataframe.GeoDataFrame): 
         dfB = pd.DataFrame(dfB)
 
-    # Må gjøre om shapely-objekter til Well Known Text, ellers klager sql'en vår 
-    if isinstance( dfA.iloc[0][col_geomA], LineString) or isinstance( dfA.iloc[0][col_geomA], Point): 
-        dfA[col_geomA] = dfA[col_geomA].apply( lambda x : x.wkt )
-    if isinstance( dfB.iloc[0][col_geomB], LineString) or isinstance( dfB.iloc[0][col_geomB], Point): 
-        dfB[col_geomB] = dfB[col_geomB].apply( lambda x : x.wkt )
-
-    # Har vi dictionary? Det liker ikke sql'en vår, gjør om til string 
-    for col in dfA.columns: 
-        if isinstance( dfA.iloc[0][col], dict ): 
-            dfA[col] = dfA[col].apply( lambda x : json.dumps( x, ensure_ascii=False, indent=4 ))
-            print( f"Datasett A: Gjør om kolonne {col} fra dictionary til JSON tekst" )
-
-    for col in dfB.columns: 
-        if isinstance( dfB.iloc[0][col], dict ): 
-            dfB[col] = dfB[col].apply( lambda x : json.dumps( x, ensure_ascii=False, indent=4 ))
-            print( f"Datasett B: Gjør om kolonne {col} fra dictionary til JSON tekst" )
+    # Geometri kan være shapely-objekter eller Well Known Text. Klippet geometri får samme form som geometrien i dfA
+    geometriSomTekst = len( dfA ) > 0 and isinstance( dfA.iloc[0][col_geomA], str )
 
 
     # Kvalitetssjekk på at vi har det som trengs: 
@@ -289,32 +272,35 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
     dfA[col_backup_tilposisjon] = dfA[col_sluttA]
     dfA[col_backup_geometri]    = dfA[col_geomA]
 
-    qry = ( f"select * from A\n"
-            f"INNER JOIN B ON\n"
-            f"A.{col_vlinkA} = B.{col_vlinkB} and\n"
-            f"A.{col_startA} < B.{col_sluttB} and\n"
-            f"A.{col_sluttA} > B.{col_startB} "
-        )
-
+    # Finner radnummer for alle par av rader i dfA og dfB som overlapper, dvs 
+    #   A.veglenkesekvensid = B.veglenkesekvensid og A.startposisjon < B.sluttposisjon og A.sluttposisjon > B.startposisjon 
+    indeksA, indeksB = finnoverlappindekser( dfA[col_vlinkA], dfA[col_startA], dfA[col_sluttA], 
+                                             dfB[col_vlinkB], dfB[col_startB], dfB[col_sluttB] )
     if debug: 
-        print( "Join-spørring:\n", qry )
+        print( f"Fant {len( indeksA )} overlappende par av rader i dfA og dfB" )
 
-    conn = sqlite3.connect( ':memory:')
-    dfA.to_sql( 'A', conn, index=False )
-    dfB.to_sql( 'B', conn, index=False )
-    inner_joined = pd.read_sql_query( qry, conn )
+    inner_joined = pd.concat( [ dfA.iloc[indeksA].reset_index( drop=True ), 
+                                dfB.iloc[indeksB].reset_index( drop=True ) ], axis=1 )
 
     if klippgeometri: 
         if col_geomA in inner_joined.columns and col_geomB in inner_joined.columns: 
 
-            tmp = inner_joined.apply( lambda x : finnoverlappgeometri( x[col_geomA], x[col_geomB], x[col_startA], x[col_sluttA], x[col_startB], x[col_sluttB], debug=debug  ) , axis=1) 
-            inner_joined['geometry']      = tmp.apply( lambda x : x[0].wkt )
-            inner_joined['segmentlengde'] = tmp.apply( lambda x : x[0].length )
-            inner_joined['startposisjon'] = tmp.apply( lambda x : x[1] )
-            inner_joined['sluttposisjon'] = tmp.apply( lambda x : x[2] )
+            # Klipper alle radene på en gang, se finnoverlappgeometrier 
+            nyGeom, nyFrapos, nyTilpos = finnoverlappgeometrier( inner_joined[col_geomA], inner_joined[col_geomB], 
+                                                                 inner_joined[col_startA], inner_joined[col_sluttA], 
+                                                                 inner_joined[col_startB], inner_joined[col_sluttB] )
+            if geometriSomTekst: 
+                inner_joined['geometry']  = shapely.to_wkt( nyGeom, rounding_precision=-1 )
+            else: 
+                inner_joined['geometry']  = nyGeom
+            inner_joined['segmentlengde'] = shapely.length( nyGeom )
+            inner_joined['startposisjon'] = nyFrapos
+            inner_joined['sluttposisjon'] = nyTilpos
 
     if klippvegsystemreferanse and kanKlippeVegreferanse:
-        inner_joined[col_ferdig_vegsystemreferanse] = inner_joined.apply( lambda x : vegsystemreferanseoverlapp( x[col_vrefA], x[col_vrefB]  ), axis=1 )
+        # Samme datatype som vegsystemreferansene i dfA, også når inner join er tom 
+        inner_joined[col_ferdig_vegsystemreferanse] = pd.Series( [ vegsystemreferanseoverlapp( vrefA, vrefB ) for vrefA, vrefB in zip( inner_joined[col_vrefA], inner_joined[col_vrefB] ) ], 
+                                                                 index=inner_joined.index, dtype=inner_joined[col_vrefA].dtype )
 
     if join == 'INNER':
         if not debug: 
@@ -326,7 +312,7 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
                     inner_joined.drop( columns=slettcolumn, inplace=True )
 
         if returner_GeoDataFrame: 
-            if isinstance( inner_joined.iloc[0]['geometry'], str): 
+            if len( inner_joined ) > 0 and isinstance( inner_joined.iloc[0]['geometry'], str): 
                 inner_joined['geometry'] = inner_joined['geometry'].apply( wkt.loads )
             inner_joined = gpd.GeoDataFrame( inner_joined, geometry='geometry', crs=crs )
 
@@ -334,7 +320,7 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
 
     elif join == 'LEFT':
         returdata = [ inner_joined ] # Liste med dataFrames som skal returneres
-        outer_ytterst = dfA[  ~dfA[temp_indexdfA_SLETT].isin( list( inner_joined[temp_indexdfA_SLETT].unique() )) ].copy()
+        outer_ytterst = dfA.iloc[ np.setdiff1d( np.arange( len( dfA ) ), indeksA ) ].copy()
         if len( outer_ytterst ) > 0: 
 
             # Vegsystemreferanse
@@ -343,58 +329,74 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
 
             returdata.append( outer_ytterst ) # Dette er de radene i dFa med veglenkesekvenser  som overhodet ikke finnes i dfB
             
-        # Så det komplekse: Finne de bitene av vegnettet som delvis er klippet (forminsket) i innerjoin-datasettet. 
-        # Finner først de delene av innerjoin-datasettet med delvis overlapp
-        delvisOverlapp =  inner_joined[ ( inner_joined[col_startA] != inner_joined[col_backup_fraposisjon] ) | \
-                                        ( inner_joined[col_sluttA] != inner_joined[col_backup_tilposisjon] ) ]
-
-        # Itererer per rad i ORGINAL-datasettet (dfA), det er her indeksen temp_indexdfA_SLETT kommer inn 
-        # Nye og orginale veglenkeposisjoner legges i lister med tuple=(fra,til)
-        antioverlapp_liste = [] # Liste med dictionaries => ny dataframe med delvis (anti)overlapp-bitene
-        delvisOverlappRader = list( delvisOverlapp[temp_indexdfA_SLETT].unique() )
-        for ii in delvisOverlappRader: 
-            orginal = dfA[ dfA[temp_indexdfA_SLETT] == ii].iloc[0].to_dict()
-            df = delvisOverlapp[ delvisOverlapp[temp_indexdfA_SLETT] == ii]
-            nyeVposListe = []
-            # Dictionary som gir oss oppslag mellom veglenkeposisjon og meterverdi 
-            vegsystemreferanser = { 'vrefRot'           : splittvegsystemreferanse( orginal[col_vrefA] )[0],   
-                                    orginal[col_startA] : splittvegsystemreferanse( orginal[col_vrefA] )[1],   
-                                    orginal[col_sluttA] : splittvegsystemreferanse( orginal[col_vrefA] )[2]  } 
-
-            # Dictionary som gir oss punktgeometri for veglenkeposisjoner, dvs det første og siste punktet på segmentet
-            geomPunktVpos = { orginal[col_startA] : Point( wkt.loads( orginal[col_geomA]).coords[ 0]  ),
-                              orginal[col_sluttA] : Point( wkt.loads( orginal[col_geomA]).coords[-1]  ) }
-
-            for junk, row in df.iterrows(): 
-                nyeVposListe.append( ( row[col_startA], row[col_sluttA] ) )
-                vegsystemreferanser[ row[col_startA] ]  = splittvegsystemreferanse( row[col_ferdig_vegsystemreferanse] )[1]
-                vegsystemreferanser[ row[col_sluttA] ]  = splittvegsystemreferanse( row[col_ferdig_vegsystemreferanse] )[2]
-                geomPunktVpos[       row[col_startA] ]  = Point( wkt.loads( row[col_geomA] ).coords[ 0]  ) 
-                geomPunktVpos[       row[col_sluttA] ]  = Point( wkt.loads( row[col_geomA] ).coords[-1]  ) 
-
-            aa = antioverlapp(  [( orginal[col_backup_fraposisjon], orginal[col_backup_tilposisjon] ) ], nyeVposListe, debug=debug )
-            if debug: 
-                print( f"Orginal=({orginal[col_startA]},{orginal[col_sluttA]}), overlapp={nyeVposListe} => Antioverlapp: {aa}")
-            for nyeVposisjoner in aa: 
-                nyttSeg = deepcopy( orginal )
-                orginalVposisjoner = (orginal[col_startA], orginal[col_sluttA])
-                try: 
-                    nyttSeg[col_geomA]                      = klippgeometriVeglenkepos( orginal[col_geomA], orginalVposisjoner, nyeVposisjoner, geomPunktVpos, debug=debug  )
-                except IndexError: 
-                    print( f"\nDegenerert tilfelle: veglenkesekvensID={orginal[col_vlinkA]} \n\tOrginal=({orginal[col_startA]},{orginal[col_sluttA]}), overlapp={nyeVposListe} => Antioverlapp: {nyeVposisjoner}")
-                    print( f"\t{vegsystemreferanser['vrefRot']}m{str( vegsystemreferanser[nyeVposisjoner[0]] )}-{str( vegsystemreferanser[nyeVposisjoner[1]] )} ")
-                    print( f"\t{geomPunktVpos[nyeVposisjoner[0]].wkt} - {geomPunktVpos[nyeVposisjoner[1]].wkt}")
+        # Så det komplekse: Finne de bitene av vegnettet som er klippet vekk i innerjoin-datasettet, dvs det som er til overs 
+        # av hver rad i ORGINAL-datasettet (dfA) når vi trekker fra samlet utstrekning av alle radene i innerjoin-datasettet 
+        # som hører til denne raden. Radnummer i dfA for hver rad i innerjoin-datasettet har vi fra finnoverlappindekser. 
+        # Antioverlapp for alle radene på en gang med finnantioverlapp
+        raderA = np.unique( indeksA )
+        iRest, restStart, restSlutt = finnantioverlapp( dfA[col_startA].values[raderA], dfA[col_sluttA].values[raderA], 
+                                                        np.searchsorted( raderA, indeksA ), 
+                                                        inner_joined[col_startA].values, inner_joined[col_sluttA].values )
+        radRest = raderA[iRest]
+        if debug: 
+            print( f"Fant {len( radRest )} biter av {len( np.unique( radRest ) )} rader i dfA som er til overs etter overlapp (antioverlapp)" )
+
+        if len( radRest ) > 0: 
+            antioverlapp_df = dfA.iloc[radRest].reset_index( drop=True )
+            antioverlapp_df[col_startA] = restStart 
+            antioverlapp_df[col_sluttA] = restSlutt 
+
+            # Oppslag mellom veglenkeposisjon og hhv meter langs orginalgeometrien og meterverdi for vegsystemreferansen. 
+            # Alle start- og sluttposisjoner for antioverlapp-bitene er enten start/slutt på raden i dfA eller start/slutt på 
+            # en rad i innerjoin-datasettet. Vi tar kun med rader i innerjoin-datasettet som hører til rader i dfA med antioverlapp 
+            iInner = np.flatnonzero( np.isin( indeksA, radRest ) )
+            raderRest = np.unique( radRest )
+            oppslagRad = np.concatenate( [ raderRest, raderRest, indeksA[iInner], indeksA[iInner] ] ) 
+            oppslagPos = np.concatenate( [ dfA[col_startA].values[raderRest], dfA[col_sluttA].values[raderRest], 
+                                           inner_joined[col_startA].values[iInner], inner_joined[col_sluttA].values[iInner] ] ).astype( float ) 
+            oppslag = pd.MultiIndex.from_arrays( [ oppslagRad, oppslagPos ] )
+            unik = ~oppslag.duplicated() # Start og slutt på raden i dfA har forrang 
+            oppslag = oppslag[unik]
+            iStart = oppslag.get_indexer( pd.MultiIndex.from_arrays( [ radRest, restStart ] ) )
+            iSlutt = oppslag.get_indexer( pd.MultiIndex.from_arrays( [ radRest, restSlutt ] ) )
+
+            if col_geomA in dfA.columns: 
+                geomA = lesgeometrier( dfA[col_geomA].values[raderRest] )
+                lengdeA = shapely.length( geomA )
+                geomInner = lesgeometrier( inner_joined[col_geomA].values[iInner] ) 
+                geomRad = np.searchsorted( raderRest, indeksA[iInner] )
+                avstand = np.concatenate( [ np.zeros( len( raderRest ) ), lengdeA, 
+                                            shapely.line_locate_point( geomA[geomRad], shapely.get_point( geomInner, 0 ) ), 
+                                            shapely.line_locate_point( geomA[geomRad], shapely.get_point( geomInner, -1 ) ) ] )[unik]
+
+                nrRest = np.searchsorted( raderRest, radRest )
+                nyGeom = geomA[nrRest]
+                fra = avstand[iStart] 
+                til = np.maximum( avstand[iSlutt], fra )
+                klipp = ( ( fra > 0 ) | ( til < lengdeA[nrRest] ) ) & np.isin( shapely.get_type_id( nyGeom ), [1, 2] ) & ( lengdeA[nrRest] > 0 ) 
+                if klipp.any(): 
+                    nyGeom[klipp] = klipplinjer( nyGeom[klipp], fra[klipp], til[klipp] )
+                if geometriSomTekst: 
+                    antioverlapp_df[col_geomA] = shapely.to_wkt( nyGeom, rounding_precision=-1 )
                 else: 
-                    # nyttSeg[col_ferdig_vegsystemreferanse]  = estimerVegreferanse(      orginal[col_vrefA], orginalVposisjoner, nyeVposisjoner )
-                    nyttSeg[col_ferdig_vegsystemreferanse]  = vegsystemreferanser['vrefRot'] + \
-                                                            'm' + str( vegsystemreferanser[nyeVposisjoner[0]] ) + \
-                                                            '-' + str( vegsystemreferanser[nyeVposisjoner[1]] )
-                    nyttSeg[col_startA] = nyeVposisjoner[0]
-                    nyttSeg[col_sluttA] = nyeVposisjoner[1]
-                    antioverlapp_liste.append( nyttSeg )
-
-        if len( antioverlapp_liste ) > 0: 
-            returdata.append(  pd.DataFrame( antioverlapp_liste ) )
+                    antioverlapp_df[col_geomA] = nyGeom 
+                if 'segmentlengde' in inner_joined.columns: 
+                    antioverlapp_df['segmentlengde'] = shapely.length( nyGeom )
+
+            if col_ferdig_vegsystemreferanse in inner_joined.columns: 
+                vrefrot, frameterA, tilmeterA = splittvegsystemreferanser( dfA[col_vrefA].values[raderRest] )
+                junk, frameterInner, tilmeterInner = splittvegsystemreferanser( inner_joined[col_ferdig_vegsystemreferanse].values[iInner] )
+                meter = np.concatenate( [ frameterA, tilmeterA, frameterInner, tilmeterInner ] )[unik]
+                vrefrot = vrefrot[ np.searchsorted( raderRest, radRest ) ]
+                frameter = meter[iStart]
+                tilmeter = meter[iSlutt]
+                gyldig = pd.notna( vrefrot ) & ~np.isnan( frameter + tilmeter ) 
+                nyVref = antioverlapp_df[col_vrefA].to_numpy( dtype=object, copy=True )
+                nyVref[gyldig] = vrefrot[gyldig] + 'm' + frameter[gyldig].astype( np.int64 ).astype( str ).astype( object ) + \
+                                 '-' + tilmeter[gyldig].astype( np.int64 ).astype( str ).astype( object )
+                antioverlapp_df[col_ferdig_vegsystemreferanse] = nyVref 
+
+            returdata.append( antioverlapp_df )
 
         retval = pd.concat( returdata, axis=0, ignore_index=True )
 
@@ -407,7 +409,7 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
                     retval.drop( columns=slettcolumn, inplace=True )
 
         if returner_GeoDataFrame: 
-            if isinstance( retval.iloc[0]['geometry'], str): 
+            if len( retval ) > 0 and isinstance( retval.iloc[0]['geometry'], str): 
                 retval['geometry'] = retval['geometry'].apply( wkt.loads )
             retval = gpd.GeoDataFrame( retval, geometry='geometry', crs=crs )
 
@@ -419,6 +421,540 @@ def finnoverlapp( dfA, dfB, prefixA=None, prefixB=None, join='inner', klippgeome
     else: 
         raise ValueError(f"Ukjent join type {join}, og tro meg - THIS REALLY SHOLD NOT HAPPEN, vi sjekket for {join} in {jointypes} ved oppstart!" )
 
+def finnoverlapp_multi( dfA, dfBliste, prefixA=None, prefixB=None, join='inner', klippgeometri=True, klippvegsystemreferanse=True, debug=False, crs=5973 ): 
+    """
+    Finner overlapp langs vegnettet mellom dfA og flere (geo)dataframes på en gang, i stedet for å kjede sammen finnoverlapp
+
+    Gir samme rader som å kjede sammen finnoverlapp (resultat1 = finnoverlapp( dfA, dfB1 ), resultat2 = finnoverlapp( resultat1, dfB2 ) osv),
+    men uten at vi kopierer det voksende mellomresultatet, legger til prefiks og finner overlapp på nytt for hvert ledd. 
+    Vi jobber kun med radnummer og veglenkeposisjoner: For hver dfB finner vi overlapp mellom bitene så langt og radene 
+    i dfB med finnoverlappindekser, og for LEFT join det som er til overs med finnantioverlapp. Hvis flere rader i samme dfB 
+    overlapper samme bit får vi én rad per kombinasjon, akkurat som med finnoverlapp. Til slutt henter vi kolonnene fra 
+    dfA, dfB1, dfB2... én gang. Tidsbruken vokser lineært med antall dataframes i dfBliste. 
+
+    Geometrien i dfA klippes én gang per bit. Start og slutt på hver bit er enten start/slutt på raden i dfA eller 
+    start/slutt på en rad i dfB, og vi finner riktig sted på geometrien i dfA med line_locate_point for endepunktet av 
+    geometrien i dfB (evt forholdsmessig ut fra veglenkeposisjon, hvis dfB mangler geometri). Meterverdier for 
+    vegsystemreferansen finner vi på samme måte. 
+
+    ARGUMENTS
+        dfA - Pandas dataframe eller Geopandas geodataframe. Returverdi blir samme type som dfA. 
+
+        dfBliste - Liste med pandas dataframes eller Geopandas geodataframes 
+
+    KEYWORDS
+        prefixA=None Valgfri tekststreng med det prefikset som skal føyes til navn i dfA, se finnoverlapp 
+
+        prefixB=None Valgfri liste med prefiks for hver av dataframene i dfBliste. Prefiks som mangler (None) komponerer vi ut fra 
+                     objektTypeID, for eksempel "t67_" for 67 Tunnelløp. Prefiksene må være unike. 
+
+        join = 'INNER' (biter som overlapper med alle dataframene i dfBliste) eller 'LEFT' join er støttet.  
+
+        klippgeometri = True (default) | False. Klipper geometri slik at den får riktig utstrekning ihht overlapp på veglenkeposisjoner.
+
+        klippvegsystemreferanse = True (default) | False. Endrer kolonnen med vegsystemreferanse slik at meterverdiene får riktig utstrekning 
+
+        debug = False (default) | True . Printer ut mer detaljer om hva som skjer underveis
+
+        crs = 5973 Koordinatsystem, se finnoverlapp 
+
+    RETURNS
+        Pandas DataFrame, eller Geopandas Geodataframe, avhengig av hva dfA er for slag. 
+    """
+
+    # Sjekker at vi har gyldige data
+    assert isinstance(dfA, pd.core.frame.DataFrame), "Argument dfA må være av type pandas eller geopandas (Geo)DataFrame"
+    assert isinstance( dfBliste, (list, tuple)) and len( dfBliste ) > 0, "Argument dfBliste må være en liste med pandas eller geopandas (Geo)DataFrame"
+    for dfB in dfBliste: 
+        assert isinstance(dfB, pd.core.frame.DataFrame), "Alle elementene i dfBliste må være av type pandas eller geopandas (Geo)DataFrame"
+    jointypes = ['LEFT', 'INNER']
+    assert isinstance( join, str), f"Join type må være tekststreng med en av verdiene {jointypes} "
+    join = join.upper()
+    assert join in jointypes, f"Ukjent join type {join}, må være en av tekstveridene {jointypes}"
+    if prefixB is None: 
+        prefixB = [ None ] * len( dfBliste )
+    assert len( prefixB ) == len( dfBliste ), f"finnoverlapp_multi: Fikk {len(prefixB)} prefiks for {len(dfBliste)} dataframes" 
+
+    if crs != 5973: 
+        print( f"Advarsel - CRS={crs} avviker fra 5973, som er det vi vanligvis bruker. Sikker på at det er riktig?")
+
+    # Jobber med DataFrame internt, returnerer GeodataFrame hvis dfA er GDF
+    returner_GeoDataFrame = False 
+    if isinstance( dfA, gpd.geodataframe.GeoDataFrame): 
+        if isinstance( dfA.crs, pyproj.crs.crs.CRS) and dfA.crs != crs:
+            print( f"Endrer angitt CRS={crs} => {dfA.crs} hentet fra første GeoDataFrame-argument dfA") 
+            crs = dfA.crs 
+        returner_GeoDataFrame = True  
+    dfA = pd.DataFrame( dfA ).reset_index( drop=True )
+
+    if prefixA: 
+        if len( [ x for x in list( dfA.columns ) if prefixA in x ]  ) == 0: 
+            dfA = dfA.add_prefix( prefixA )
+    else: 
+        prefixA = ''
+
+    col_vlinkA  = prefixA + 'veglenkesekvensid'
+    col_startA  = prefixA + 'startposisjon'
+    col_sluttA  = prefixA + 'sluttposisjon'
+    col_geomA   = prefixA + 'geometry'
+    col_lengdeA = prefixA + 'segmentlengde'
+    col_stedfestingA = prefixA + 'stedfesting'
+
+    if not col_vlinkA in dfA.columns and col_stedfestingA in dfA.columns and '-' in dfA.iloc[0][col_stedfestingA]: 
+        tmp = dfA[col_stedfestingA].apply( splittstedfesting ) 
+        dfA[col_startA] = tmp[0]
+        dfA[col_sluttA] = tmp[1]
+        dfA[col_vlinkA] = tmp[2]
+
+    assert col_vlinkA in dfA.columns, f"finnoverlapp_multi: Fant ikke kolonne {col_vlinkA} i dfA {dfA.columns} "
+    assert col_startA in dfA.columns and col_sluttA in dfA.columns, "Håndtering av punktobjekt ikke støttet, må ha strekningsobjekt som inngangsdata"
+
+    col_vrefA = None 
+    for kol in [ prefixA + 'vref', prefixA + 'vegsystemreferanse' ]: 
+        if kol in dfA.columns: 
+            col_vrefA = kol 
+            break 
+    if not col_vrefA: 
+        print( 'Fant ikke kolonner for vegreferanser i datasett A')
+
+    # Klargjør dfB1, dfB2... med prefiks, og finner par av rader som overlapper med dfA
+    vlinkA = dfA[col_vlinkA].values 
+    startA = np.asarray( dfA[col_startA], dtype=float )
+    sluttA = np.asarray( dfA[col_sluttA], dtype=float )
+    geomA  = lesgeometrier( dfA[col_geomA] ) if col_geomA in dfA.columns else None 
+
+    dataB = [] # Liste med dictionaries, én per dfB 
+    for dfB, prefiks in zip( dfBliste, prefixB ): 
+        dfB = pd.DataFrame( dfB ).reset_index( drop=True )
+        if not prefiks: 
+            temp = [x for x in list( dfB.columns ) if 'objekttype' in x ]
+            assert len(temp) == 1, f"finnoverlapp_multi: Lette etter en kolonne kalt objekttype i dfB, fant {len(temp)} stk: {temp} "
+            temp2 = list( dfB[temp[0]].unique() )
+            assert len(temp2) == 1, f"finnoverlapp_multi: Lette etter unik objekttype i dfB kolonne {temp[0]}, fant {len(temp2)} stk: {temp2} "
+            prefiks = 't' + str( temp2[0] )  + '_'
+        assert not prefiks in [ x['prefiks'] for x in dataB ], f"finnoverlapp_multi: Prefiks {prefiks} er brukt for flere dataframes, angi unike prefiks med nøkkelord prefixB"
+
+        if len( [ x for x in list( dfB.columns ) if prefiks in x ]  ) == 0: 
+            dfB = dfB.add_prefix( prefiks )
+
+        kol = { navn : prefiks + navn for navn in [ 'veglenkesekvensid', 'startposisjon', 'sluttposisjon', 'geometry', 'stedfesting', 'vref', 'vegsystemreferanse' ] } 
+        if not kol['veglenkesekvensid'] in dfB.columns and kol['stedfesting'] in dfB.columns and '-' in dfB.iloc[0][kol['stedfesting']]: 
+            tmp = dfB[kol['stedfesting']].apply( splittstedfesting )
+            dfB[kol['startposisjon']] = tmp[0]
+            dfB[kol['sluttposisjon']] = tmp[1]
+            dfB[kol['veglenkesekvensid']] = tmp[2]
+        assert kol['veglenkesekvensid'] in dfB.columns, f"finnoverlapp_multi: Fant ikke kolonne {kol['veglenkesekvensid']} i dfB {dfB.columns} "
+        assert kol['startposisjon'] in dfB.columns and kol['sluttposisjon'] in dfB.columns, "Håndtering av punktobjekt ikke støttet, må ha strekningsobjekt som inngangsdata"
+
+        startB = np.asarray( dfB[kol['startposisjon']], dtype=float )
+        sluttB = np.asarray( dfB[kol['sluttposisjon']], dtype=float )
+        indeksA, indeksB = finnoverlappindekser( vlinkA, startA, sluttA, dfB[kol['veglenkesekvensid']].values, startB, sluttB )
+        if debug: 
+            print( f"Fant {len( indeksA )} overlappende par av rader i dfA og dfB med prefiks {prefiks}" )
+
+        col_vrefB = kol['vref'] if kol['vref'] in dfB.columns else kol['vegsystemreferanse'] if kol['vegsystemreferanse'] in dfB.columns else None 
+        dataB.append( { 'df' : dfB, 'prefiks' : prefiks, 'start' : startB, 'slutt' : sluttB, 'indeksA' : indeksA, 'indeksB' : indeksB, 
+                        'geom' : lesgeometrier( dfB[kol['geometry']] ) if kol['geometry'] in dfB.columns else None, 
+                        'vref' : splittvegsystemreferanser( dfB[col_vrefB] ) if col_vrefB and klippvegsystemreferanse else None, 
+                        'slettekolonner' : [ k for k in kol.values() if k in dfB.columns ] } ) 
+
+    # Meterverdier fra vegsystemreferansene, pr rad i dfA og dfB 
+    kanKlippeVegreferanse = klippvegsystemreferanse and col_vrefA is not None 
+    if kanKlippeVegreferanse: 
+        vrefrotA, frameterA, tilmeterA = splittvegsystemreferanser( dfA[col_vrefA] )
+        rotA = pd.Series( vrefrotA ).str.lower().str.strip().values 
+
+    # Bruddpunkt: Start og slutt for hver (gyldig) rad i dfA, pluss start og slutt for overlappende rader i dfB1, dfB2... 
+    # som ligger innafor raden i dfA. For hvert bruddpunkt tar vi vare på radnummer i dfA, veglenkeposisjon, 
+    # avstand (meter) langs geometrien i dfA og meterverdi for vegsystemreferansen
+    gyldigA = np.flatnonzero( ~( pd.isna( vlinkA ) | np.isnan( startA ) | np.isnan( sluttA ) ) )
+    lengdeA = shapely.length( geomA ) if geomA is not None else np.full( len( dfA ), np.nan )
+    bruddRad    = [ gyldigA, gyldigA ]
+    bruddPos    = [ startA[gyldigA], sluttA[gyldigA] ]
+    bruddAvstand = [ np.zeros( len( gyldigA ) ), lengdeA[gyldigA] ]
+    bruddMeter  = [ frameterA[gyldigA], tilmeterA[gyldigA] ] if kanKlippeVegreferanse else [] 
+
+    for data in dataB: 
+        iA, iB = data['indeksA'], data['indeksB']
+        if kanKlippeVegreferanse and data['vref'] is not None: 
+            rotB = pd.Series( data['vref'][0][iB] ).str.lower().str.strip().values 
+            sammeRot = pd.notna( rotB ) & ( rotB == rotA[iA] )
+        for ende, posisjon, punktnr in [ (1, data['start'], 0), (2, data['slutt'], -1) ]: 
+            pos = posisjon[iB]
+            innafor = ( pos > startA[iA] ) & ( pos < sluttA[iA] ) 
+            bruddRad.append( iA[innafor] )
+            bruddPos.append( pos[innafor] )
+            if geomA is not None and data['geom'] is not None and innafor.any(): 
+                avstand = shapely.line_locate_point( geomA[iA[innafor]], shapely.get_point( data['geom'][iB[innafor]], punktnr ) )
+            else: 
+                avstand = np.full( innafor.sum(), np.nan )
+            bruddAvstand.append( avstand )
+            if kanKlippeVegreferanse: 
+                meter = np.full( innafor.sum(), np.nan )
+                if data['vref'] is not None: 
+                    meter = np.where( sammeRot, data['vref'][ende][iB], np.nan )[innafor]
+                bruddMeter.append( meter )
+
+    bruddRad = np.concatenate( bruddRad )
+    bruddPos = np.concatenate( bruddPos )
+    bruddAvstand = np.concatenate( bruddAvstand ).astype( float )
+    rekkefolge = np.lexsort( ( bruddPos, bruddRad ) ) # Stabil sortering, start og slutt for dfA kommer først ved like posisjoner 
+    bruddRad = bruddRad[rekkefolge]
+    bruddPos = bruddPos[rekkefolge]
+    bruddAvstand = bruddAvstand[rekkefolge]
+    unik = np.ones( len( bruddRad ), dtype=bool )
+    unik[1:] = ( bruddRad[1:] != bruddRad[:-1] ) | ( bruddPos[1:] != bruddPos[:-1] )
+    bruddRad = bruddRad[unik]
+    bruddPos = bruddPos[unik]
+    bruddAvstand = bruddAvstand[unik]
+    if kanKlippeVegreferanse: 
+        bruddMeter = np.concatenate( bruddMeter )[rekkefolge][unik]
+
+    # Bruddpunkt som mangler avstand langs geometrien (fordi dfB mangler geometri) plasseres forholdsmessig 
+    mangler = np.isnan( bruddAvstand )
+    bruddAvstand[mangler] = lengdeA[bruddRad[mangler]] * ( bruddPos[mangler] - startA[bruddRad[mangler]] ) / \
+                            ( sluttA[bruddRad[mangler]] - startA[bruddRad[mangler]] )
+
+    # Biter av radene i dfA. Vi starter med radene i dfA, og for hver dfB i dfBliste finner vi nye biter som er felles 
+    # utstrekning for en bit og en overlappende rad i dfB. For LEFT join tar vi i tillegg med det som er til overs av 
+    # hver bit (antioverlapp, se finnantioverlapp). Samme logikk som finnoverlapp, men vi jobber kun med radnummer og posisjoner
+    bitRad, bitStart, bitSlutt = gyldigA, startA[gyldigA], sluttA[gyldigA]
+    bitB = [] # Radnummer i dfB1, dfB2... for hver bit, -1 = ingen overlapp 
+    for data in dataB: 
+        iBit, iB = finnoverlappindekser( vlinkA[bitRad], bitStart, bitSlutt, 
+                                         data['df'][data['prefiks'] + 'veglenkesekvensid'].values, data['start'], data['slutt'] )
+        nyRad   = [ bitRad[iBit] ]
+        nyStart = [ np.maximum( bitStart[iBit], data['start'][iB] ) ]
+        nySlutt = [ np.minimum( bitSlutt[iBit], data['slutt'][iB] ) ]
+        nyB     = [ [ x[iBit] for x in bitB ] + [ iB ] ]
+        if join == 'LEFT': 
+            iRest, restStart, restSlutt = finnantioverlapp( bitStart, bitSlutt, iBit, nyStart[0], nySlutt[0] )
+            nyRad.append( bitRad[iRest] )
+            nyStart.append( restStart )
+            nySlutt.append( restSlutt )
+            nyB.append( [ x[iRest] for x in bitB ] + [ np.full( len( iRest ), -1, dtype=np.int64 ) ] )
+
+        bitRad   = np.concatenate( nyRad )
+        bitStart = np.concatenate( nyStart )
+        bitSlutt = np.concatenate( nySlutt )
+        bitB     = [ np.concatenate( [ x[nr] for x in nyB ] ) for nr in range( len( bitB ) + 1 ) ]
+        if debug: 
+            print( f"{len( bitRad )} biter etter overlapp med dfB med prefiks {data['prefiks']}" )
+
+    # Sorterer etter rad i dfA og posisjon 
+    rekkefolge = np.lexsort( ( bitSlutt, bitStart, bitRad ) )
+    bitRad, bitStart, bitSlutt = bitRad[rekkefolge], bitStart[rekkefolge], bitSlutt[rekkefolge]
+    bitB = [ x[rekkefolge] for x in bitB ]
+
+    deler = [ dfA.iloc[bitRad].reset_index( drop=True ) ]
+    for radnr, data in zip( bitB, dataB ): 
+        deler.append( data['df'].drop( columns=data['slettekolonner'] ).reindex( radnr ).reset_index( drop=True ) ) 
+    retval = pd.concat( deler, axis=1 )
+    retval[col_startA] = bitStart
+    retval[col_sluttA] = bitSlutt
+
+    # Slår opp bruddpunktene for start og slutt av hver bit 
+    bruddpunkt = pd.MultiIndex.from_arrays( [ bruddRad, bruddPos ] )
+    bruddStart = bruddpunkt.get_indexer( pd.MultiIndex.from_arrays( [ bitRad, bitStart ] ) )
+    bruddSlutt = bruddpunkt.get_indexer( pd.MultiIndex.from_arrays( [ bitRad, bitSlutt ] ) )
+
+    if klippgeometri and geomA is not None: 
+        nyGeom = geomA[bitRad]
+        fra = bruddAvstand[bruddStart]
+        til = np.maximum( bruddAvstand[bruddSlutt], fra )
+        # Klipper kun biter som er kortere enn raden i dfA, og har gyldig linjegeometri 
+        klipp = ( ( fra > 0 ) | ( til < lengdeA[bitRad] ) ) & np.isin( shapely.get_type_id( nyGeom ), [1, 2] ) & ( lengdeA[bitRad] > 0 ) 
+        if klipp.any(): 
+            nyGeom[klipp] = klipplinjer( nyGeom[klipp], fra[klipp], til[klipp] )
+        if isinstance( dfA.iloc[0][col_geomA], str ): 
+            retval[col_geomA] = shapely.to_wkt( nyGeom, rounding_precision=-1 )
+        else: 
+            retval[col_geomA] = nyGeom 
+        retval[col_lengdeA] = shapely.length( nyGeom )
+
+    if kanKlippeVegreferanse: 
+        # Meterverdi for bruddpunkt som mangler (pga ulik vegsystemreferanse) interpoleres ut fra raden i dfA 
+        mangler = np.isnan( bruddMeter )
+        bruddMeter[mangler] = frameterA[bruddRad[mangler]] + ( tilmeterA[bruddRad[mangler]] - frameterA[bruddRad[mangler]] ) * \
+                              ( bruddPos[mangler] - startA[bruddRad[mangler]] ) / ( sluttA[bruddRad[mangler]] - startA[bruddRad[mangler]] ) 
+        frameter = bruddMeter[bruddStart]
+        tilmeter = bruddMeter[bruddSlutt]
+        vrefrot = vrefrotA[bitRad]
+        gyldig = pd.notna( vrefrot ) & ~np.isnan( frameter + tilmeter )
+        nyVref = retval[col_vrefA].to_numpy( dtype=object, copy=True )
+        nyVref[gyldig] = vrefrot[gyldig] + 'm' + np.round( frameter[gyldig] ).astype( np.int64 ).astype( str ).astype( object ) + \
+                         '-' + np.round( tilmeter[gyldig] ).astype( np.int64 ).astype( str ).astype( object )
+        retval[col_vrefA] = nyVref 
+
+    if join == 'LEFT': 
+        # Rader i dfA som mangler veglenkesekvens eller posisjon tar vi med uten endringer 
+        ugyldig = np.setdiff1d( np.arange( len( dfA ) ), gyldigA )
+        if len( ugyldig ) > 0: 
+            retval = pd.concat( [ retval, dfA.iloc[ugyldig] ], axis=0, ignore_index=True )
+
+    if returner_GeoDataFrame and col_geomA in retval.columns: 
+        if len( retval ) > 0 and isinstance( retval.iloc[0][col_geomA], str): 
+            retval[col_geomA] = shapely.from_wkt( retval[col_geomA].values )
+        retval = gpd.GeoDataFrame( retval, geometry=col_geomA, crs=crs )
+
+    return retval 
+
+def finnoverlapp_parallell( dfA, dfB, antallDeler=None, prosesser=None, utmappe=None, lagA=None, lagB=None, **kwargs ): 
+    """
+    Finner overlapp med finnoverlapp i flere prosesser samtidig, ved å dele dataene opp etter veglenkesekvens 
+
+    Overlapp finnes kun innafor samme veglenkesekvens. Vi deler derfor både dfA og dfB opp i antallDeler biter ut fra 
+    veglenkesekvensid modulo antallDeler, slik at samme veglenkesekvens havner i samme del for både dfA og dfB. Hver del 
+    behandles med finnoverlapp i en egen prosess (concurrent.futures.ProcessPoolExecutor). Rader som mangler veglenkesekvensid 
+    havner i del nr 0. Resultatet sorteres på veglenkesekvensid, start- og sluttposisjon (stabil sortering), og blir det samme 
+    uansett antall deler og prosesser. 
+
+    dfA og dfB kan også være filnavn til GeoPackage (.gpkg) eller (Geo)Parquet (alle andre filnavn). Da leser hver prosess 
+    kun sin egen del av filen (filter på kolonnen veglenkesekvensid), så vi trenger aldri ha hele datasettet i minnet. Med 
+    utmappe skriver hver prosess resultatet for sin del til en egen Parquet-fil, i stedet for å sende det tilbake. 
+
+    ARGUMENTS
+        dfA, dfB - Pandas dataframe, Geopandas geodataframe eller filnavn (.gpkg eller .parquet), se finnoverlapp. 
+                   Filer må ha kolonnen veglenkesekvensid (uten prefiks)
+
+    KEYWORDS
+        antallDeler = None (default) eller heltall. Antall deler vi deler dataene opp i. Default er 4 deler per prosess 
+
+        prosesser = None (default) eller heltall. Antall prosesser. Default er antall prosessorkjerner (os.cpu_count()). 
+                    Med prosesser=1 kjører vi alle delene etter hverandre i samme prosess 
+
+        utmappe = None (default) eller navn på mappe. Resultatet for del nr 0, 1, ... skrives til filene del00000.parquet, 
+                  del00001.parquet ... i denne mappa (deler uten resultat får ingen fil). Les inn igjen med 
+                  geopandas.read_parquet( utmappe ) eller pandas.read_parquet( utmappe ). Eksisterende filer slettes ikke. 
+
+        lagA, lagB = None (default) eller navn på kartlag i GeoPackage-filer 
+
+        Øvrige nøkkelord (prefixA, prefixB, join, klippgeometri, klippvegsystemreferanse, debug, crs) sendes videre til finnoverlapp 
+
+    RETURNS
+        Pandas DataFrame eller Geopandas Geodataframe (som finnoverlapp), eller navnet på utmappe hvis den er angitt. 
+    """
+
+    if not prosesser: 
+        prosesser = os.cpu_count() or 1 
+    if not antallDeler: 
+        antallDeler = 4 * prosesser 
+
+    # Prefiks for dfB må være det samme for alle delene, også for deler der dfB ikke har data 
+    if not kwargs.get( 'prefixB' ): 
+        if isinstance( dfB, pd.DataFrame ): 
+            temp = [x for x in list( dfB.columns ) if 'objekttype' in x ]
+            assert len(temp) == 1, f"finnoverlapp_parallell: Lette etter en kolonne kalt objekttype i dfB, fant {len(temp)} stk: {temp} "
+            temp2 = list( dfB[temp[0]].unique() )
+        else: 
+            temp2 = list( _lesdel( dfB, lagB, kolonner=['objekttype'] )['objekttype'].unique() )
+        assert len(temp2) == 1, f"finnoverlapp_parallell: Lette etter unik objekttype i dfB, fant {len(temp2)} stk: {temp2} "
+        kwargs['prefixB'] = 't' + str( temp2[0] )  + '_'
+
+    prefixA = kwargs.get( 'prefixA' ) or ''
+    delerA = _delopp( dfA, prefixA, antallDeler )
+    delerB = _delopp( dfB, kwargs['prefixB'], antallDeler )
+
+    if utmappe: 
+        os.makedirs( utmappe, exist_ok=True )
+
+    oppgaver = [ ( delerA[nr], lagA, delerB[nr], lagB, antallDeler, nr, utmappe, kwargs ) for nr in range( antallDeler ) ]
+    if prosesser == 1: 
+        resultater = [ _finnoverlappdel( *oppgave ) for oppgave in oppgaver ]
+    else: 
+        with ProcessPoolExecutor( max_workers=prosesser ) as pool: 
+            framtid = [ pool.submit( _finnoverlappdel, *oppgave ) for oppgave in oppgaver ]
+            # Henter resultatene i samme rekkefølge som delene, uansett hvilken prosess som blir ferdig først 
+            resultater = [ f.result() for f in framtid ]
+
+    if utmappe: 
+        return utmappe 
+
+    # Uten treff i det hele tatt returnerer vi en tom del, som har samme type, kolonner og CRS som fra finnoverlapp 
+    ikketomme = [ r for r in resultater if len( r ) > 0 ]
+    if len( ikketomme ) == 0: 
+        return resultater[0]
+
+    retval = pd.concat( ikketomme, ignore_index=True )
+    return _sorterresultat( retval, prefixA )
+
+def _delopp( df, prefix, antallDeler ): 
+    """
+    Deler dataframe opp i antallDeler biter ut fra veglenkesekvensid modulo antallDeler. Filnavn deles ikke opp her, 
+    men leses del for del av _lesdel 
+    """
+    if not isinstance( df, pd.DataFrame ): 
+        return [ df ] * antallDeler 
+
+    col_vlink = prefix + 'veglenkesekvensid'
+    if not col_vlink in df.columns: 
+        col_vlink = 'veglenkesekvensid'
+    assert col_vlink in df.columns, f"finnoverlapp_parallell: Fant ikke kolonne {prefix + 'veglenkesekvensid'} i {df.columns} "
+
+    delnr = pd.to_numeric( df[col_vlink] ).fillna( 0 ).astype( 'int64' ).values % antallDeler 
+    return [ df[ delnr == nr ] for nr in range( antallDeler ) ]
+
+def _lesdel( filnavn, lag=None, antallDeler=None, nr=None, kolonner=None ): 
+    """
+    Leser én del av en GeoPackage (.gpkg) eller (Geo)Parquet-fil, dvs de radene der veglenkesekvensid modulo antallDeler = nr 
+
+    Med antallDeler=None leser vi hele filen, evt bare de angitte kolonnene
+    """
+    filnavn = str( filnavn )
+    if filnavn.lower().endswith( '.gpkg' ): 
+        utvalg = None 
+        if antallDeler: 
+            utvalg = f"veglenkesekvensid % {antallDeler} = {nr}"
+            if nr == 0: 
+                utvalg += " OR veglenkesekvensid IS NULL"
+        if kolonner: 
+            return gpd.read_file( filnavn, layer=lag, where=utvalg, columns=kolonner, ignore_geometry=True )
+        return gpd.read_file( filnavn, layer=lag, where=utvalg )
+
+    import pyarrow.compute as pc 
+    utvalg = None 
+    if antallDeler: 
+        utvalg = pc.equal( pc.modulo( pc.field( 'veglenkesekvensid' ), antallDeler ), nr )
+        if nr == 0: 
+            utvalg = utvalg | pc.field( 'veglenkesekvensid' ).is_null() 
+    if kolonner: 
+        return pd.read_parquet( filnavn, columns=kolonner, filters=utvalg )
+    try: 
+        return gpd.read_parquet( filnavn, filters=utvalg )
+    except ValueError: 
+        # Vanlig parquet-fil uten geometri-metadata, f.eks med geometri som WKT
+        return pd.read_parquet( filnavn, filters=utvalg )
+
+def _sorterresultat( df, prefixA ): 
+    """
+    Stabil sortering av resultat fra finnoverlapp på veglenkesekvensid, start- og sluttposisjon 
+    """
+    kolonner = [ ]
+    for col in [ 'veglenkesekvensid', 'startposisjon', 'sluttposisjon' ]: 
+        if prefixA + col in df.columns: 
+            kolonner.append( prefixA + col )
+        elif col in df.columns: 
+            kolonner.append( col )
+    if len( kolonner ) == 0: 
+        return df 
+    return df.sort_values( kolonner, kind='mergesort', ignore_index=True )
+
+def _finnoverlappdel( dfA, lagA, dfB, lagB, antallDeler, nr, utmappe, kwargs ): 
+    """
+    Kjører finnoverlapp for del nr av dataene, brukes av finnoverlapp_parallell. Må ligge på modulnivå for at 
+    ProcessPoolExecutor skal kunne sende den til andre prosesser. 
+
+    Returnerer sortert resultat (evt tomt, men med alle kolonner), eller filnavn (evt None hvis resultatet er tomt) 
+    hvis utmappe er angitt
+    """
+    if not isinstance( dfA, pd.DataFrame ): 
+        dfA = _lesdel( dfA, lagA, antallDeler, nr )
+    if not isinstance( dfB, pd.DataFrame ): 
+        dfB = _lesdel( dfB, lagB, antallDeler, nr )
+
+    resultat = finnoverlapp( dfA, dfB, **kwargs )
+    resultat = _sorterresultat( resultat, kwargs.get( 'prefixA' ) or '' )
+
+    if utmappe: 
+        if len( resultat ) == 0: 
+            return None 
+        filnavn = os.path.join( utmappe, f"del{nr:05d}.parquet" )
+        resultat.to_parquet( filnavn )
+        return filnavn 
+    return resultat 
+
+def finnoverlappindekser( vlinkA, startA, sluttA, vlinkB, startB, sluttB ): 
+    """
+    Finner alle par av rader i A og B som overlapper langs samme veglenkesekvens, dvs der 
+    vlinkA = vlinkB og startA < sluttB og sluttA > startB 
+
+    Erstatter SQL-spørringen (INNER JOIN) vi tidligere brukte i finnoverlapp. Vi sorterer B etter veglenkesekvens og 
+    startposisjon og finner kandidatene for hver rad i A med binærsøk (numpy.searchsorted). Kandidatene er de radene i B på 
+    samme veglenkesekvens som starter før A slutter, og ikke tidligere enn at de kan nå fram til starten av A (ut fra 
+    lengste segment i B på denne veglenkesekvensen). Deretter sjekker vi overlapp eksakt. Rader som mangler veglenkesekvens 
+    eller posisjon overlapper ikke med noe. 
+
+    ARGUMENTS
+        vlinkA, startA, sluttA : Veglenkesekvens-ID, start- og sluttposisjon for A (pandas Series, numpy array eller liste)
+
+        vlinkB, startB, sluttB : Tilsvarende for B 
+
+    KEYWORDS 
+        N/A 
+
+    RETURNS 
+        (indeksA, indeksB) : Tuple med to numpy array med radnummer (posisjon, ikke pandas indeks) i A og B, 
+                             sortert etter radnummer i A og deretter B 
+    """
+    vlinkA = np.asarray( vlinkA )
+    vlinkB = np.asarray( vlinkB )
+    startA = np.asarray( startA, dtype=float )
+    sluttA = np.asarray( sluttA, dtype=float )
+    startB = np.asarray( startB, dtype=float )
+    sluttB = np.asarray( sluttB, dtype=float )
+
+    tom = ( np.zeros( 0, dtype=np.int64 ), np.zeros( 0, dtype=np.int64 ) )
+    if len( vlinkA ) == 0 or len( vlinkB ) == 0: 
+        return tom 
+
+    # Veglenkesekvens-ID => løpenummer 0, 1, 2... felles for A og B, og kun for gyldige rader 
+    gyldigA = np.flatnonzero( ~( pd.isna( vlinkA ) | np.isnan( startA ) | np.isnan( sluttA ) ) )
+    gyldigB = np.flatnonzero( ~( pd.isna( vlinkB ) | np.isnan( startB ) | np.isnan( sluttB ) ) )
+    if len( gyldigA ) == 0 or len( gyldigB ) == 0: 
+        return tom 
+    koder = pd.factorize( np.concatenate( [ vlinkA[gyldigA], vlinkB[gyldigB] ] ) )[0]
+    kodeA = koder[:len( gyldigA )]
+    kodeB = koder[len( gyldigA ):]
+
+    # Sorterer B etter (veglenkesekvens, startposisjon). Siden posisjonene ligger mellom 0 og 1 kan vi bruke 
+    # 2 * løpenummer + posisjon som sorteringsnøkkel. Avrundingsfeil her gir bare noen flere kandidater, 
+    # den eksakte sjekken kommer til slutt 
+    nokkelB = 2.0 * kodeB + startB[gyldigB]
+    rekkefolge = np.argsort( nokkelB, kind='stable' )
+    nokkelB = nokkelB[rekkefolge]
+    radB = gyldigB[rekkefolge]
+
+    # Lengste segment i B per veglenkesekvens 
+    maksLengde = np.zeros( koder.max() + 1 )
+    np.maximum.at( maksLengde, kodeB, np.abs( sluttB[gyldigB] - startB[gyldigB] ) )
+
+    margin = 1e-9 
+    fra = np.searchsorted( nokkelB, 2.0 * kodeA + startA[gyldigA] - maksLengde[kodeA] - margin, side='left' )
+    til = np.searchsorted( nokkelB, 2.0 * kodeA + sluttA[gyldigA] + margin, side='right' )
+    antall = np.maximum( til - fra, 0 )
+
+    # Ett element per kandidat-par 
+    kandidatA = np.repeat( gyldigA, antall )
+    forskyvning = np.arange( antall.sum() ) - np.repeat( np.cumsum( antall ) - antall, antall )
+    kandidatB = radB[ np.repeat( fra, antall ) + forskyvning ]
+
+    overlapp = ( vlinkA[kandidatA] == vlinkB[kandidatB] ) & \
+               ( startA[kandidatA] < sluttB[kandidatB] ) & ( sluttA[kandidatA] > startB[kandidatB] )
+    indeksA = kandidatA[overlapp]
+    indeksB = kandidatB[overlapp]
+
+    rekkefolge = np.lexsort( ( indeksB, indeksA ) )
+    return indeksA[rekkefolge].astype( np.int64 ), indeksB[rekkefolge].astype( np.int64 )
+
+def lesgeometri( geom ): 
+    """
+    Returnerer shapely-objekt for geom, som kan være shapely-objekt eller Well Known Text (WKT)
+    """
+    if isinstance( geom, str ): 
+        return wkt.loads( geom )
+    return geom 
+
+def lesgeometrier( geometrier ): 
+    """
+    Returnerer numpy array med shapely-objekter for geometrier, som kan være shapely-objekter eller Well Known Text (WKT) 
+    (pandas Series, GeoSeries, numpy array eller liste). Vektorisert utgave av lesgeometri 
+    """
+    geometrier = np.array( geometrier, dtype=object )
+    tekst = ~shapely.is_geometry( geometrier ) & ~pd.isna( geometrier )
+    if tekst.any(): 
+        geometrier[tekst] = shapely.from_wkt( geometrier[tekst] )
+    return geometrier 
+
 def klippgeometriVeglenkepos( mygeom:LineString, orginalpos:tuple, nyepos:type, geomPunktVpos:dict, debug=False ): 
     """
     Klipper en geometri basert på dimmensjonsløse veglenkeposisjoner samt dictionary med presis punkt-geometri for de aktuelle posisjonene
@@ -621,6 +1157,29 @@ def splittvegsystemreferanse( vegsystemreferanse:string, debug=False ):
 
     return (vrefrot, frameter, tilmeter )
 
+def splittvegsystemreferanser( vegsystemreferanser ): 
+    """
+    Vektorisert utgave av splittvegsystemreferanse, deler mange vegsystemreferanser opp i rot, fra-meter og tilmeter på en gang 
+
+    ARGUMENTS: 
+        vegsystemreferanser - pandas Series, numpy array eller liste med tekst 
+
+    KEYWORDS: 
+        N/A
+
+    RETURNS
+        (vegsystemreferanserot, frameter, tilmeter) : Tuple med numpy array. Rot er tekst (NaN hvis vi ikke finner meterverdier), 
+                                                      fra- og tilmeter er flyttall (NaN hvis de mangler)
+
+    Eksempel: 
+        ( ['EV6 K S78D1 '], [0.0], [674.0] ) = splittvegsystemreferanser( ['EV6 K S78D1 m0-674'] )
+    """
+    deler = pd.Series( vegsystemreferanser, dtype=object ).str.extract( r'^(.*)[mM](\d+)(?:-(\d+))?\s*$' )
+    frameter = deler[1].astype( float ).values 
+    tilmeter = deler[2].astype( float ).values 
+    tilmeter = np.where( np.isnan( tilmeter ), frameter, tilmeter )
+    return deler[0].values.astype( object ), frameter, tilmeter 
+
 def vegsystemreferanseoverlapp( vref1:string, vref2:string ): 
     """
     Finner felles overlapp (hvis det finnes) for to vegsystemreferanesr 
@@ -648,7 +1207,7 @@ def vegsystemreferanseoverlapp( vref1:string, vref2:string ):
 
         # Sjekk for at vi har fått numeriske verdier for fra- og til meter 
         # Det hender vi ikke får komplett vegsystemreferanse med meter, kun vegkategori+fase+vegnummer
-        if fra1 and fra2 and til1 and til2: 
+        if fra1 is not None and fra2 is not None and til1 is not None and til2 is not None: 
 
             # Sjekk dataintegritet - det SKAL være overlapp på meterverdier, fordi det er jo overlapp på vegnettet
             if fra1 <= til2 and fra2 <= til1: 
@@ -771,7 +1330,7 @@ def shapelycut( line, distance, debug=False ):
         if pd == distance: # --------- Angitt punkt matcher eksakt med et punkt langs linja, trenger ikke interpolere 
 
             if debug: 
-                pdb.set_trace()
+                breakpoint()
 
             return [
                 LineString(coords[:i+1]),
@@ -779,7 +1338,7 @@ def shapelycut( line, distance, debug=False ):
         if pd > distance:  # ---------------- Må interpolere! Vi er kommet til koordinatpunkt like bortforbi vårt punkt
 
             if debug: 
-                pdb.set_trace()
+                breakpoint()
           
             cp = line.interpolate(distance)
             if line.has_z: # -------------------------------- 3D koordinater
@@ -922,6 +1481,63 @@ def antioverlapp( listeA:list, listeB:list, debug=False ):
 
 
 
+def finnantioverlapp( start, slutt, indeks, fra, til ): 
+    """
+    Vektorisert antioverlapp: Finner de delene av intervallene (start, slutt) som IKKE dekkes av en samling delintervaller
+
+    Delintervallene (fra, til) hører til intervallet med radnummer indeks. Vi sorterer delintervallene etter indeks og fra, 
+    og finner samlet dekning (løpende maksimum av til) for hvert intervall med pandas groupby. Det som er til overs er 
+    hullene mellom sammenhengende dekning, pluss evt det som ligger foran første og bak siste delintervall. 
+    Intervaller uten delintervaller blir med i sin helhet. Samme logikk som antioverlapp, men for alle intervallene på en gang. 
+
+    ARGUMENTS
+        start, slutt : Start og slutt for intervallene (f.eks veglenkeposisjoner), numpy array eller pandas Series 
+
+        indeks : Radnummer (posisjon i start og slutt) for hvert delintervall 
+
+        fra, til : Start og slutt for hvert delintervall. Forutsetter fra <= til 
+
+    KEYWORDS
+        N/A 
+
+    RETURNS
+        (indeks, fra, til) : Tuple med numpy array med radnummer (posisjon i start og slutt) og start og slutt for 
+                             hver bit som er til overs, sortert etter radnummer og start 
+    """
+    start = np.asarray( start, dtype=float )
+    slutt = np.asarray( slutt, dtype=float )
+    indeks = np.asarray( indeks, dtype=np.int64 )
+    fra = np.asarray( fra, dtype=float )
+    til = np.asarray( til, dtype=float )
+
+    rekkefolge = np.lexsort( ( fra, indeks ) )
+    indeks, fra, til = indeks[rekkefolge], fra[rekkefolge], til[rekkefolge]
+
+    # Samlet dekning fram til og med hvert delintervall 
+    dekket = pd.Series( til ).groupby( indeks ).cummax().values 
+    forste = np.ones( len( indeks ), dtype=bool )
+    forste[1:] = indeks[1:] != indeks[:-1]
+    siste = np.ones( len( indeks ), dtype=bool )
+    siste[:-1] = forste[1:]
+
+    # Hull foran hvert delintervall, dvs mellom dekningen så langt (evt starten av intervallet) og starten på delintervallet 
+    forrige = start[indeks] 
+    forrige[~forste] = np.maximum( dekket[:-1][~forste[1:]], start[indeks[~forste]] )
+    hull = fra > forrige 
+
+    # Det som er til overs bak siste delintervall 
+    bak = siste & ( slutt[indeks] > dekket )
+
+    # Intervaller uten delintervaller 
+    uten = np.setdiff1d( np.arange( len( start ) ), indeks )
+
+    nyIndeks = np.concatenate( [ indeks[hull], indeks[bak], uten ] )
+    nyFra    = np.concatenate( [ forrige[hull], dekket[bak], start[uten] ] )
+    nyTil    = np.concatenate( [ fra[hull], slutt[indeks[bak]], slutt[uten] ] )
+
+    rekkefolge = np.lexsort( ( nyFra, nyIndeks ) )
+    return nyIndeks[rekkefolge], nyFra[rekkefolge], nyTil[rekkefolge]
+
 def finnoverlappgeometri( geom1:LineString, geom2:LineString, frapos1:float, tilpos1:float, frapos2:float, tilpos2:float, debug=False ): 
     """
     Tar to LineString-geometrier og "klipper til" felles geometrisk overlapp basert på dimmensjonsløse lineære posisjoner. 
@@ -1018,3 +1634,167 @@ def finnoverlappgeometri( geom1:LineString, geom2:LineString, frapos1:float, til
     elif len( geomliste ) == 2: 
         return geomliste[geomindex],  max(frapos1, frapos2), min( tilpos1, tilpos2) 
 
+
+def finnoverlappgeometrier( geomA, geomB, fraA, tilA, fraB, tilB ): 
+    """
+    Vektorisert utgave av finnoverlappgeometri, finner felles geometrisk overlapp for mange par av LineString-geometrier på en gang 
+
+    Samme regler som finnoverlappgeometri: Vi tar den korteste geometrien i hvert par. Hvis den ene utstrekningen er et 
+    subsett av den andre returnerer vi den korteste geometrien, hvis ikke så kutter vi den korteste geometrien der den 
+    lengste starter (eller slutter). I stedet for å behandle ett og ett par regner vi på hele kolonner med shapely sine 
+    array-funksjoner (shapely.length, shapely.get_point, shapely.line_locate_point), og klipper alle geometriene 
+    samtidig med funksjonen klipplinjer. 
+
+    Hvis en av geometriene er None, tom eller har null lengde så returneres den andre geometrien og tilhørende veglenkeposisjoner
+
+    OBS! Krever shapely 2.0.0 eller nyere 
+
+    ARGUMENTS
+        geomA, geomB : Shapely LineString - objekter eller Well Known Text (WKT), som pandas Series, GeoSeries, numpy array eller liste
+
+        fraA, tilA, fraB, tilB : Lineære posisjoner (veglenkeposisjoner) for geomA og geomB 
+
+    KEYWORDS
+        N/A 
+
+    RETURNS 
+        (nyGeom, nyFrapos, nyTilpos) : Tuple med numpy array med shapely-objekter og nye lineære posisjoner. 
+                                       Par uten overlapp får tom geometri (LineString uten koordinater) og NaN 
+    """
+    assert int( version( 'shapely' ).split('.')[0] ) >= 2, f"Krever shapely-versjon >=2.0.0, du har versjon { version( 'shapely' )}"
+
+    geomA = lesgeometrier( geomA )
+    geomB = lesgeometrier( geomB )
+    fraA = np.asarray( fraA, dtype=float )
+    tilA = np.asarray( tilA, dtype=float )
+    fraB = np.asarray( fraB, dtype=float )
+    tilB = np.asarray( tilB, dtype=float )
+
+    lengdeA = shapely.length( geomA )
+    lengdeB = shapely.length( geomB )
+    # LineString og LinearRing (type 1 og 2) med lengde > 0 
+    linjeA = np.isin( shapely.get_type_id( geomA ), [1, 2] ) & ( lengdeA > 0 )
+    linjeB = np.isin( shapely.get_type_id( geomB ), [1, 2] ) & ( lengdeB > 0 )
+
+    # Ugyldig geomA => geomB, ugyldig geomB => geomA 
+    nyGeom   = np.where( linjeA, geomA, geomB )
+    nyFrapos = np.where( linjeA, fraA, fraB )
+    nyTilpos = np.where( linjeA, tilA, tilB )
+
+    begge = linjeA & linjeB 
+    kortA = lengdeA < lengdeB 
+    overlapp = ( fraA < tilB ) & ( tilA > fraB )
+
+    ingen = begge & ~overlapp 
+    if ingen.any(): 
+        print( f"nvdbgeotricks.finnoverlappgeometrier: Ingen overlapp på lineærposisjonene for {ingen.sum()} par av geometrier")
+        nyGeom[ingen]   = LineString()
+        nyFrapos[ingen] = np.nan 
+        nyTilpos[ingen] = np.nan 
+
+    # Overlapp => den korteste geometrien og felles utstrekning, som vi evt kutter under 
+    gyldig = begge & overlapp 
+    nyGeom[gyldig]   = np.where( kortA, geomA, geomB )[gyldig]
+    nyFrapos[gyldig] = np.maximum( fraA, fraB )[gyldig]
+    nyTilpos[gyldig] = np.minimum( tilA, tilB )[gyldig]
+
+    # Delvis overlapp, dvs ingen av utstrekningene er subsett av den andre. Den korteste geometrien må kuttes 
+    helt = ( ( fraA >= fraB ) & ( tilA <= tilB ) ) | ( ( fraB >= fraA ) & ( tilB <= tilA ) )
+    delvis = np.flatnonzero( gyldig & ~helt )
+    if len( delvis ) == 0: 
+        return nyGeom, nyFrapos, nyTilpos 
+
+    kortA      = kortA[delvis]
+    kortgeom   = nyGeom[delvis]
+    kortlengde = np.where( kortA, lengdeA[delvis], lengdeB[delvis] )
+    langgeom   = np.where( kortA, geomB[delvis], geomA[delvis] )
+    kort_frapos = np.where( kortA, fraA[delvis], fraB[delvis] )
+    lang_frapos = np.where( kortA, fraB[delvis], fraA[delvis] )
+
+    # Ligger den korteste geometrien på starten av den lengste så kutter vi der den lengste starter, og tar vare på 
+    # den siste biten. Hvis ikke kutter vi der den lengste slutter, og tar vare på den første biten
+    paaStarten = kort_frapos < lang_frapos 
+    kuttpunkt = shapely.get_point( langgeom, np.where( paaStarten, 0, -1 ) )
+    ny_lengde = shapely.line_locate_point( kortgeom, kuttpunkt )
+
+    # Kuttpunkt i enden av (eller utafor) den korte geometrien => ingenting å kutte 
+    kutt = ( ny_lengde > 0 ) & ( ny_lengde < kortlengde )
+    if kutt.any(): 
+        nyGeom[delvis[kutt]] = klipplinjer( kortgeom[kutt], 
+                                           np.where( paaStarten, ny_lengde, 0 )[kutt], 
+                                           np.where( paaStarten, kortlengde, ny_lengde )[kutt] )
+
+    return nyGeom, nyFrapos, nyTilpos 
+
+def klipplinjer( linjer, fra, til ): 
+    """
+    Klipper ut biten mellom fra og til meter (dvs koordinatsystem-enheter) langs hver av linjene, for mange linjer på en gang 
+
+    Gir samme resultat som å kutte hver linje to ganger med shapelycut, men vi gjør hele jobben med numpy på 
+    koordinatene til alle linjene samtidig. Kuttpunkt som ligger mindre enn en mikrometer fra et eksisterende 
+    koordinatpunkt havner eksakt på koordinatpunktet, så vi unngår nesten-duplikate punkt. Avstand regnes i 2D (kartplan), 
+    Z-koordinater blir interpolert. Se shapelycut. 
+
+    ARGUMENTS
+        linjer : Shapely LineString - objekter med lengde > 0, som numpy array, GeoSeries eller liste 
+
+        fra, til : Avstand fra starten av hver linje til start og slutt på biten vi skal ta vare på (fra < til). 
+                   Verdier utafor linja blir 0 eller linjas lengde 
+
+    KEYWORDS
+        N/A 
+
+    RETURNS 
+        numpy array med nye shapely LineString - objekter 
+    """
+    linjer = np.asarray( linjer, dtype=object )
+    resultat = np.empty( len( linjer ), dtype=object )
+    if len( linjer ) == 0: 
+        return resultat 
+
+    toleranse = 1e-6 
+    xyz, nr = shapely.get_coordinates( linjer, include_z=True, return_index=True )
+    antall = np.bincount( nr, minlength=len( linjer ) )
+    forste = np.cumsum( antall ) - antall 
+    siste = forste + antall - 1 
+
+    # Lengde på hvert linjestykke (fram til punktet) og avstand fra starten av linja til hvert punkt 
+    steg = np.zeros( len( xyz ) )
+    steg[1:] = np.hypot( np.diff( xyz[:,0] ), np.diff( xyz[:,1] ) )
+    steg[forste] = 0 
+    # Summerer for hver linje for seg, så resultatet ikke avhenger av hvilke andre linjer som er med 
+    avstand = pd.Series( steg ).groupby( nr ).cumsum().values 
+
+    lengde = avstand[siste]
+    fra = np.clip( np.asarray( fra, dtype=float ), 0, lengde )
+    til = np.clip( np.asarray( til, dtype=float ), 0, lengde )
+
+    # Siste punkt før (eller på) fra, og første punkt etter (eller på) til 
+    s = forste + np.bincount( nr, weights=avstand <= fra[nr] + toleranse, minlength=len( linjer ) ).astype( np.int64 ) - 1 
+    s = np.minimum( s, siste - 1 )
+    e = forste + np.bincount( nr, weights=avstand < til[nr] - toleranse, minlength=len( linjer ) ).astype( np.int64 )
+    e = np.clip( e, s + 1, siste )
+
+    # Nye start- og sluttpunkt, interpolert langs linjestykket (s, s+1) og (e-1, e) 
+    t = np.where( steg[s+1] > 0, ( fra - avstand[s] ) / np.where( steg[s+1] > 0, steg[s+1], 1 ), 0 )
+    startpunkt = np.where( ( fra - avstand[s] <= toleranse )[:,None], xyz[s], xyz[s] + t[:,None] * ( xyz[s+1] - xyz[s] ) )
+    t = np.where( steg[e] > 0, ( til - avstand[e-1] ) / np.where( steg[e] > 0, steg[e], 1 ), 1 )
+    sluttpunkt = np.where( ( avstand[e] - til <= toleranse )[:,None], xyz[e], xyz[e-1] + t[:,None] * ( xyz[e] - xyz[e-1] ) )
+
+    # Koordinatpunktene s, s+1, ... e for hver linje, der første og siste punkt byttes med nytt start- og sluttpunkt 
+    nyttAntall = e - s + 1 
+    nyNr = np.repeat( np.arange( len( linjer ) ), nyttAntall )
+    nyForste = np.cumsum( nyttAntall ) - nyttAntall 
+    punkt = np.repeat( s, nyttAntall ) + np.arange( nyttAntall.sum() ) - np.repeat( nyForste, nyttAntall )
+    nyXyz = xyz[punkt]
+    nyXyz[nyForste] = startpunkt 
+    nyXyz[nyForste + nyttAntall - 1] = sluttpunkt 
+
+    # 2D og 3D hver for seg 
+    harZ = shapely.has_z( linjer )
+    for utvalg, dimensjon in [ ( np.flatnonzero( harZ ), 3 ), ( np.flatnonzero( ~harZ ), 2 ) ]: 
+        if len( utvalg ) > 0: 
+            rader = np.isin( nyNr, utvalg )
+            resultat[utvalg] = shapely.linestrings( nyXyz[rader, :dimensjon], indices=np.searchsorted( utvalg, nyNr[rader] ) )
+
+    return resultat 
@@ -24,6 +24,7 @@ import numpy as np
 import nvdbapiv3
 from nvdbapiv3 import apiforbindelse
 import nvdbgeotricks
+import overlapp
 
 def splitBruksklasse_vekt( bruksklasse ): 
     """
@@ -182,36 +183,14 @@ def brutusBKoverlapp( mittfilter=None, offisiell=False, kunEnTypeBK=None ):
     bruprefix = 'bru_'
     bruer = bruer.add_prefix( bruprefix )
     brucol_nvdbId = bruprefix + 'nvdbId'
-    sluttresultat = None 
-    # Overlapp bruer - normaltransport 
-    if kunEnTypeBK == None or kunEnTypeBK == 'normal': 
-        mellomresultat2 = nvdbgeotricks.finnoverlapp( bruer,           normal, prefixA=bruprefix, prefixB=normalprefiks, join='left')
-        mellomresultat2.drop( columns=[ normalprefiks+'veglenkesekvensid', normalprefiks+'startposisjon', normalprefiks+'sluttposisjon' ], inplace=True )
-        sluttresultat = mellomresultat2.copy()
-    else: 
-        mellomresultat2 = bruer
-        
-    # Overlapp bruer - spesial 
-    if kunEnTypeBK == None or kunEnTypeBK == 'spesial': 
-        mellomresultat4 = nvdbgeotricks.finnoverlapp( mellomresultat2, spesial, prefixA=bruprefix, prefixB=spesialprefix, join='left')
-        mellomresultat4.drop( columns=[ spesialprefix+'veglenkesekvensid', spesialprefix+'startposisjon', spesialprefix+'sluttposisjon' ], inplace=True )
-        sluttresultat = mellomresultat4.copy()
-    else: 
-        mellomresultat4 = bruer
-    
-    # Overlapp bruer - 12/65
-    if kunEnTypeBK == None or kunEnTypeBK == 'tolv65': 
-        mellomresultat6 = nvdbgeotricks.finnoverlapp( mellomresultat4, tolv65,  prefixA=bruprefix, prefixB=tolv65prefix, join='left')
-        mellomresultat6.drop( columns=[ tolv65prefix+'veglenkesekvensid', tolv65prefix+'startposisjon', tolv65prefix+'sluttposisjon' ], inplace=True )
-        sluttresultat = mellomresultat6.copy()
-    else: 
-        mellomresultat6 = bruer
-    
-    # Overlapp bruer - 12/100
-    if kunEnTypeBK == None or kunEnTypeBK == 'tolv100': 
-        mellomresultat8 = nvdbgeotricks.finnoverlapp( mellomresultat6, tolv100, prefixA=bruprefix, prefixB=tolv100prefix, join='left')
-        mellomresultat8.drop( columns=[ tolv100prefix+'veglenkesekvensid', tolv100prefix+'startposisjon', tolv100prefix+'sluttposisjon' ], inplace=True )
-        sluttresultat = mellomresultat8.copy()
+    # Overlapp bruer - normaltransport, spesialtransport, 12/65 og 12/100 i én operasjon
+    bkdata = [ ( 'normal',  normal,  normalprefiks ), 
+               ( 'spesial', spesial, spesialprefix ), 
+               ( 'tolv65',  tolv65,  tolv65prefix  ), 
+               ( 'tolv100', tolv100, tolv100prefix ) ]
+    bkdata = [ x for x in bkdata if kunEnTypeBK == None or kunEnTypeBK == x[0] ]
+    sluttresultat = overlapp.finnoverlapp_multi( bruer, [ x[1] for x in bkdata ], prefixA=bruprefix, 
+                                                 prefixB=[ x[2] for x in bkdata ], join='left' )
 
 
     # Lager geodataframe 
@@ -43,7 +43,7 @@ def hentvegnett( vegnettfilter={}, filnavn=None, forb=None ):
             data = r.json()
 
             for lenke in data['veglenker']: 
-                enLenke = nvdbapiv3.flatutvegnettsegment( lenke, kvalitetsparametre=True ) 
+                enLenke = nvdbapiv3.flatutvegnettsegment( lenke, kvalitetsparametre=True, kopier=False ) 
                 enLenke['låst_lengde'] = data['låst_lengde']
                 enLenke['lengde_lenkesekvens'] = data['lengde']
                 enLenke['porter'] =  { x['id'] : x for x in data['porter']}
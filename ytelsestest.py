@@ -0,0 +1,368 @@
+"""
+Ytelsestest for nvdbapiv3, overlapp og segmentering med syntetiske data
+
+Måler tidsbruk for de mest brukte (og mest tidkrevende) rutinene i biblioteket på syntetiske data i
+ulik skala ( 1k, 100k og 1M datarader ), og skriver resultatet til JSON-fil. Ved å kjøre samme test
+på ulike versjoner av koden og sammenligne JSON-filene ser vi om noe har blitt tregere.
+
+Hva vi måler:
+    - nvdbfagdata2records, med og uten vegsegmenter
+    - flatutvegnettsegment
+    - overlapp.finnoverlapp, INNER og LEFT join
+    - overlapp.finnoverlapp_multi, LEFT join mot tre datasett med fagdata
+    - overlapp.finnoverlapp_parallell, LEFT join fordelt på flere prosesser
+    - segmentering.segmenter
+    - nvdbgeotricks.records2gpkg
+    - Paginert nedlasting med nvdbFagdata og nvdbVegnett mot lokal erstatning for NVDB api (nvdbapiv3.lokalserver)
+
+Syntetiske data lages av lagveglenkesekvenser, lagfagdata og lagvegsegmenter. Samme argumenter gir alltid
+samme data. Vegobjekter og vegnett har samme format som NVDB api LES, se nvdbapiv3/lokalserver.py.
+
+Fra kommandolinja:
+
+    python ytelsestest.py --skala 1k,100k --utfil ytelse_ny.json
+    python ytelsestest.py --skala 1k --test finnoverlapp_inner,segmenter --sammenlign ytelse_forrige.json
+
+Noen av testene (segmentering) bruker svært lang tid på store datamengder. Disse hopper vi over
+når antall datarader er større enn angitt i GRENSER, med mindre du bruker --ingengrense
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from shapely import wkt
+from shapely.ops import substring
+import pandas as pd
+import geopandas as gpd
+
+import nvdbapiv3
+from nvdbapiv3 import lokalserver
+import overlapp
+import segmentering
+import nvdbgeotricks
+
+SKALA = { '1k' : 1000, '100k' : 100000, '1M' : 1000000 }
+
+# Største antall datarader for tester som ellers tar urimelig lang tid
+GRENSER = { 'segmenter' : 1000 }
+
+BOLK = 10000  # Syntetiske vegobjekter og vegnett lages og behandles i bolker av denne størrelsen, for å spare minne
+
+def lagveglenkesekvenser( antall, start=0, punkter=5 ):
+    """
+    Lager liste med syntetiske vegnettsegmenter, samme format som /vegnett/veglenkesekvenser/segmentert
+
+    ARGUMENTS
+        antall : int, antall vegnettsegmenter (ett segment per veglenkesekvens)
+
+    KEYWORDS
+        start : int, løpenummer for første segment. Default 0
+
+        punkter : int, antall punkt per geometri. Default 5
+
+    RETURNS
+        liste med dictionaries
+    """
+    return [ lokalserver.lagvegnettsegment( ii, punkter=punkter ) for ii in range( start, start+antall ) ]
+
+def lagfagdata( antall, start=0, objekttypeid=45, punkter=5, antallSegmenter=1 ):
+    """
+    Lager liste med syntetiske vegobjekter, samme format som /vegobjekter/<objekttypeid>?inkluder=alle
+
+    ARGUMENTS
+        antall : int, antall vegobjekter
+
+    KEYWORDS
+        start : int, løpenummer for første objekt. Default 0
+
+        objekttypeid : int, objekttype. Default 45
+
+        punkter : int, antall punkt per geometri. Default 5
+
+        antallSegmenter : int, antall vegsegmenter per vegobjekt. Default 1
+
+    RETURNS
+        liste med dictionaries
+    """
+    return [ lokalserver.lagvegobjekt( ii, objekttypeid=objekttypeid, punkter=punkter, antallSegmenter=antallSegmenter )
+                for ii in range( start, start+antall ) ]
+
+def lagvegsegmenter( antall, objekttype=None, oppdeling=2, punkter=5 ):
+    """
+    Lager GeoDataFrame med syntetiske vegsegmenter, slik som fra nvdbgeotricks.nvdbsok2GDF, til bruk i finnoverlapp og segmenter
+
+    Uten objekttype får du vegnett, dvs ett segment som dekker hele veglenkesekvensen (0-1) for veglenkesekvens 1..antall.
+    Med objekttype får du fagdata: Hver veglenkesekvens er dekket av inntil "oppdeling" biter som er forskjøvet ift
+    start og slutt på veglenkesekvensen, slik at vi får både hel og delvis overlapp mot vegnettet.
+
+    ARGUMENTS
+        antall : int, antall veglenkesekvenser. Antall datarader blir antall * oppdeling for fagdata
+
+    KEYWORDS
+        objekttype : None (default) = vegnett, eller heltall = fagdata for denne objekttypen
+
+        oppdeling : int, antall biter fagdata per veglenkesekvens. Default 2
+
+        punkter : int, antall punkt per geometri. Default 5
+
+    RETURNS
+        GeoDataFrame med kolonnene veglenkesekvensid, startposisjon, sluttposisjon, vref, geometry,
+        og for fagdata i tillegg objekttype, nvdbId og egenskapen Bredde
+    """
+    data = []
+    for ii in range( antall ):
+        seg = lokalserver.lagvegnettsegment( ii, punkter=punkter )
+        geom = wkt.loads( seg['geometri']['wkt'] )
+        vrefRot = seg['vegsystemreferanse']['kortform'].split( 'm' )[0]
+        frameter = seg['vegsystemreferanse']['strekning']['fra_meter']
+        if objekttype is None:
+            posisjoner = [ ( 0.0, 1.0 ) ]
+        else:
+            # Første og siste bit er forskjøvet inn fra endene av veglenkesekvensen
+            steg = 0.8 / oppdeling
+            posisjoner = [ ( round( 0.1 + nr * steg, 8 ), round( 0.1 + (nr+1) * steg, 8 ) ) for nr in range( oppdeling ) ]
+
+        for nr, (frapos, tilpos) in enumerate( posisjoner ):
+            rad = { 'veglenkesekvensid' : seg['veglenkesekvensid'], 'startposisjon' : frapos, 'sluttposisjon' : tilpos,
+                    'vref' : vrefRot + 'm' + str( round( frameter + frapos * seg['lengde'] ) ) + '-' + str( round( frameter + tilpos * seg['lengde'] ) ),
+                    'kommune' : seg['kommune'],
+                    'geometry' : geom if objekttype is None else substring( geom, frapos, tilpos, normalized=True ) }
+            if objekttype is not None:
+                rad['objekttype'] = objekttype
+                rad['nvdbId']     = objekttype * lokalserver.IDFAKTOR + ii * oppdeling + nr + 1
+                rad['Bredde']     = 2.5 + ( ii % 10 ) / 4
+            data.append( rad )
+
+    return gpd.GeoDataFrame( data, geometry='geometry', crs=5973 )
+
+def mal( navn, antall, kjor, gjentak=3 ):
+    """
+    Måler tidsbruk for funksjonen kjor, som skal behandle antall datarader.
+
+    ARGUMENTS
+        navn : Tekst, navn på testen
+
+        antall : int, antall datarader
+
+        kjor : Funksjon uten argumenter som gjør jobben. Hvis den returnerer et tall så er dette den tidsbruken (sekunder)
+               vi skal bruke, i stedet for total kjøretid. Nyttig når kjor også gjør forarbeid (f.eks lager syntetiske data)
+               som ikke skal være med i målingen.
+
+    KEYWORDS
+        gjentak : int, antall gjentakelser. Default 3
+
+    RETURNS
+        dictionary med resultat
+    """
+    tider = []
+    for ii in range( gjentak ):
+        gc.collect()
+        t0 = time.perf_counter()
+        tid = kjor()
+        if not isinstance( tid, ( int, float ) ):
+            tid = time.perf_counter() - t0
+        tider.append( tid )
+
+    resultat = { 'test' : navn, 'antall' : antall, 'gjentak' : gjentak,
+                 'sekunder' : round( min( tider ), 6 ), 'median' : round( statistics.median( tider ), 6 ),
+                 'maks' : round( max( tider ), 6 ),
+                 'perSekund' : round( antall / min( tider ), 1 ) if min( tider ) > 0 else None  }
+    print( f"{navn:<34} {antall:>9} rader {resultat['sekunder']:>10.3f} s {resultat['perSekund'] or 0:>12.1f} rader/s" )
+    return resultat
+
+def bolkvis( antall, lagdata, behandle ):
+    """
+    Lager syntetiske data bolkvis med lagdata( antall, start ) og måler kun tidsbruken til behandle( data ).
+    Returnerer samlet tidsbruk i sekunder
+    """
+    tid = 0
+    for start in range( 0, antall, BOLK ):
+        data = lagdata( min( BOLK, antall-start ), start )
+        t0 = time.perf_counter()
+        behandle( data )
+        tid += time.perf_counter() - t0
+    return tid
+
+def test_fagdata2records( antall, gjentak ):
+    resultat = []
+    for vegsegmenter in [ True, False ]:
+        kjor = lambda : bolkvis( antall, lambda n, start : lagfagdata( n, start=start, antallSegmenter=2 ),
+                                lambda data : nvdbapiv3.nvdbfagdata2records( data, vegsegmenter=vegsegmenter ) )
+        resultat.append( mal( 'nvdbfagdata2records' + ( '' if vegsegmenter else '_utensegmenter' ), antall, kjor, gjentak=gjentak ) )
+    return resultat
+
+def test_flatutvegnettsegment( antall, gjentak ):
+    kjor = lambda : bolkvis( antall, lambda n, start : lagveglenkesekvenser( n, start=start ),
+                            lambda data : [ nvdbapiv3.flatutvegnettsegment( seg ) for seg in data ] )
+    return [ mal( 'flatutvegnettsegment', antall, kjor, gjentak=gjentak ) ]
+
+def test_finnoverlapp( antall, gjentak, joins=( 'inner', 'left' ) ):
+    veg = lagvegsegmenter( antall )
+    fagdata = lagvegsegmenter( antall, objekttype=5 )
+    resultat = []
+    for join in joins:
+        resultat.append( mal( 'finnoverlapp_' + join, antall, lambda : overlapp.finnoverlapp( veg, fagdata, join=join ), gjentak=gjentak ) )
+    return resultat
+
+def test_finnoverlapp_multi( antall, gjentak ):
+    veg = lagvegsegmenter( antall )
+    fagdata = [ lagvegsegmenter( antall, objekttype=objekttype, oppdeling=oppdeling ) for objekttype, oppdeling in [ (5, 2), (105, 3), (540, 4) ] ]
+    return [ mal( 'finnoverlapp_multi', antall, lambda : overlapp.finnoverlapp_multi( veg, fagdata, join='left' ), gjentak=gjentak ) ]
+
+def test_finnoverlapp_parallell( antall, gjentak ):
+    veg = lagvegsegmenter( antall )
+    fagdata = lagvegsegmenter( antall, objekttype=5 )
+    return [ mal( 'finnoverlapp_parallell', antall, lambda : overlapp.finnoverlapp_parallell( veg, fagdata, join='left' ), gjentak=gjentak ) ]
+
+def test_segmenter( antall, gjentak ):
+    veg = lagvegsegmenter( antall )
+    fagdata = [ lagvegsegmenter( antall, objekttype=5 ), lagvegsegmenter( antall, objekttype=105, oppdeling=3 ) ]
+    return [ mal( 'segmenter', antall, lambda : segmentering.segmenter( veg, fagdata ), gjentak=gjentak ) ]
+
+def test_records2gpkg( antall, gjentak ):
+    data = []
+    for start in range( 0, antall, BOLK ):
+        data.extend( nvdbapiv3.nvdbfagdata2records( lagfagdata( min( BOLK, antall-start ), start=start ) ) )
+
+    with tempfile.TemporaryDirectory() as katalog:
+        filnavn = os.path.join( katalog, 'ytelsestest.gpkg' )
+        def kjor():
+            if os.path.exists( filnavn ):
+                os.remove( filnavn )
+            nvdbgeotricks.records2gpkg( data, filnavn, 'bomstasjoner' )
+        return [ mal( 'records2gpkg', antall, kjor, gjentak=gjentak ) ]
+
+def test_paginering( antall, gjentak ):
+    resultat = []
+    with lokalserver.lokalserver( antall=antall ) as tjener:
+        def fagdata():
+            sok = nvdbapiv3.nvdbFagdata( 45, miljo=tjener.url )
+            teller = sum( 1 for _ in sok )
+            assert teller == antall, f"Paginering: Fikk {teller} vegobjekter, forventet {antall}"
+
+        def vegnett():
+            sok = nvdbapiv3.nvdbVegnett( miljo=tjener.url )
+            teller = sum( 1 for _ in sok )
+            assert teller == antall, f"Paginering: Fikk {teller} vegnettsegmenter, forventet {antall}"
+
+        resultat.append( mal( 'paginering_fagdata', antall, fagdata, gjentak=gjentak ) )
+        resultat.append( mal( 'paginering_vegnett', antall, vegnett, gjentak=gjentak ) )
+    return resultat
+
+# Testnavn => ( funksjon, navn på delresultatene testen gir oss )
+TESTER = { 'fagdata2records'      : ( test_fagdata2records,      [ 'nvdbfagdata2records', 'nvdbfagdata2records_utensegmenter' ] ),
+           'flatutvegnettsegment' : ( test_flatutvegnettsegment, [ 'flatutvegnettsegment' ] ),
+           'finnoverlapp_inner'   : ( lambda n, g : test_finnoverlapp( n, g, joins=['inner'] ), [ 'finnoverlapp_inner' ] ),
+           'finnoverlapp_left'    : ( lambda n, g : test_finnoverlapp( n, g, joins=['left'] ),  [ 'finnoverlapp_left' ] ),
+           'finnoverlapp_multi'   : ( test_finnoverlapp_multi,   [ 'finnoverlapp_multi' ] ),
+           'finnoverlapp_parallell' : ( test_finnoverlapp_parallell, [ 'finnoverlapp_parallell' ] ),
+           'segmenter'            : ( test_segmenter,            [ 'segmenter' ] ),
+           'records2gpkg'         : ( test_records2gpkg,         [ 'records2gpkg' ] ),
+           'paginering'           : ( test_paginering,           [ 'paginering_fagdata', 'paginering_vegnett' ] )
+        }
+
+def kjortester( skala=[ '1k' ], tester=None, gjentak=3, ingengrense=False ):
+    """
+    Kjører ytelsestester
+
+    KEYWORDS
+        skala : Liste med datamengder, en eller flere av '1k', '100k', '1M' (eller heltall). Default [ '1k' ]
+
+        tester : Liste med navn på tester, se TESTER. Default None = alle
+
+        gjentak : int, antall gjentakelser per test. Vi rapporterer beste (korteste) tid og median. Default 3
+
+        ingengrense : bool, default False. Sett til True for å kjøre alle tester uansett datamengde (se GRENSER)
+
+    RETURNS
+        dictionary med metadata og liste med resultater
+    """
+    if not tester:
+        tester = list( TESTER.keys() )
+
+    ukjente = [ x for x in tester if not x in TESTER ]
+    if ukjente:
+        raise ValueError( f"Ukjente tester {ukjente}, lovlige valg: {list( TESTER.keys() )}" )
+
+    resultat = { 'tidspunkt'  : datetime.now().isoformat( timespec='seconds' ),
+                 'python'     : platform.python_version(),
+                 'plattform'  : platform.platform(),
+                 'prosessor'  : platform.processor(),
+                 'pakker'     : { 'pandas' : pd.__version__, 'geopandas' : gpd.__version__ },
+                 'jsondekoder' : nvdbapiv3.jsondekoder.dekoder,
+                 'gjentak'    : gjentak,
+                 'resultater' : [] }
+
+    for skalanavn in skala:
+        antall = SKALA[skalanavn] if skalanavn in SKALA else int( skalanavn )
+        for testnavn in tester:
+            if not ingengrense and testnavn in GRENSER and antall > GRENSER[testnavn]:
+                print( f"{testnavn:<34} {antall:>9} rader - hopper over, grense={GRENSER[testnavn]} (se --ingengrense)")
+                resultat['resultater'].extend( [ { 'test' : x, 'antall' : antall, 'hoppetOver' : True } for x in TESTER[testnavn][1] ] )
+                continue
+
+            # Store datamengder tar lang tid, gjentar kun en gang
+            resultat['resultater'].extend( TESTER[testnavn][0]( antall, gjentak if antall <= 100000 else 1 ) )
+
+    return resultat
+
+def sammenlign( ny, forrige, terskel=1.2 ):
+    """
+    Sammenligner to resultater fra kjortester, og skriver ut tester som har blitt tregere (eller raskere)
+
+    ARGUMENTS
+        ny, forrige : dictionary fra kjortester, eller filnavn til JSON-fil med slikt resultat
+
+    KEYWORDS
+        terskel : float, vi rapporterer endringer større enn denne faktoren. Default 1.2 (20%)
+
+    RETURNS
+        liste med dictionaries for de testene som finnes i begge resultater, med tidsbruk og faktor=ny/forrige
+    """
+    if isinstance( ny, str ):
+        with open( ny ) as f:
+            ny = json.load( f )
+    if isinstance( forrige, str ):
+        with open( forrige ) as f:
+            forrige = json.load( f )
+
+    forrigeTider = { ( x['test'], x['antall'] ) : x['sekunder'] for x in forrige['resultater'] if 'sekunder' in x }
+    endringer = []
+    for res in ny['resultater']:
+        nokkel = ( res['test'], res['antall'] )
+        if 'sekunder' in res and nokkel in forrigeTider and forrigeTider[nokkel] > 0:
+            faktor = res['sekunder'] / forrigeTider[nokkel]
+            endringer.append( { 'test' : res['test'], 'antall' : res['antall'], 'sekunder' : res['sekunder'],
+                                'forrige' : forrigeTider[nokkel], 'faktor' : round( faktor, 3 ) } )
+            if faktor > terskel:
+                print( f"TREGERE  {res['test']:<34} {res['antall']:>9} rader {forrigeTider[nokkel]:.3f} s => {res['sekunder']:.3f} s (faktor {faktor:.2f})")
+            elif faktor < 1 / terskel:
+                print( f"RASKERE  {res['test']:<34} {res['antall']:>9} rader {forrigeTider[nokkel]:.3f} s => {res['sekunder']:.3f} s (faktor {faktor:.2f})")
+
+    return endringer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Ytelsestest for nvdbapiv3, overlapp og segmentering med syntetiske data' )
+    parser.add_argument( '--skala', default='1k', help='Kommaseparert liste med datamengder, f.eks 1k,100k,1M. Default 1k' )
+    parser.add_argument( '--test', default=None, help='Kommaseparert liste med tester: ' + ', '.join( TESTER.keys() ) + '. Default alle' )
+    parser.add_argument( '--gjentak', type=int, default=3, help='Antall gjentakelser per test. Default 3' )
+    parser.add_argument( '--ingengrense', action='store_true', help='Kjør alle tester uansett datamengde' )
+    parser.add_argument( '--utfil', default='ytelsestest.json', help='JSON-fil med resultatet. Default ytelsestest.json' )
+    parser.add_argument( '--sammenlign', default=None, help='JSON-fil med tidligere resultat som vi sammenligner med' )
+    args = parser.parse_args()
+
+    resultat = kjortester( skala=args.skala.split( ',' ), tester=args.test.split( ',' ) if args.test else None,
+                           gjentak=args.gjentak, ingengrense=args.ingengrense )
+
+    if args.sammenlign:
+        resultat['sammenligning'] = { 'fil' : args.sammenlign, 'endringer' : sammenlign( resultat, args.sammenlign ) }
+
+    with open( args.utfil, 'w', encoding='utf-8' ) as f:
+        json.dump( resultat, f, indent=4, ensure_ascii=False )
+    print( f"Skrev resultat til {args.utfil}" )